@@ -2,21 +2,39 @@
 管理后台 API 路由
 提供访问数据查询、统计分析等功能
 """
-from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi import APIRouter, Depends, Query, HTTPException, Request
 from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, desc
+from sqlalchemy import select, func, and_, desc, cast, case, Integer
+from sqlalchemy.orm import undefer_group
 from app.core.database import get_db
-from app.models.visit import Visit
+from app.models.visit import Visit, VisitPayload
+from app.crud import device as device_crud
+from app.crud import visit as visit_crud
+from app.crud import event as event_crud
+from app.services.similarity import find_similar_devices, find_device_clusters
 from app.schemas.visit import VisitDetail
 from app.api.v1.auth import get_current_admin
+from app.utils.referrer import CHANNEL_OTHER, channel_display_name
+from app.utils.tz import COUNTRY_TIMEZONE_MAP, timezone_offset_minutes
+from app.utils.trajectory import load_points, point_count, to_json, to_packed
+from app.services.live import live_hub, format_sse
+from app.services.realtime import realtime_stats
+from app.services.journal import ingest_journal
+from app.migrations import migration_runner
+from app.services.scoring import scoring_engine
+from app.services.ratelimit import rate_limiter
+from app.services.response_cache import cached_response, response_cache
+from app.services.purge import purge_manager, PurgeFilter, VACUUM_NONE, VACUUM_MODES
+from app.services.distinct import distinct_counter, METRIC_IP, METRIC_FINGERPRINT, METRIC_CANVAS
+from app.core.metrics import export_rows, export_duration
+from app.config import settings
 from typing import List, Optional
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone as dt_timezone
 import csv
 import json
 import io
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill
+import time
 
 router = APIRouter(
     prefix="/admin",
@@ -33,6 +51,11 @@ async def get_visits(
     min_score: Optional[float] = Query(None, ge=0, le=100, description="最低评分"),
     start_date: Optional[str] = Query(None, description="开始日期 YYYY-MM-DD"),
     end_date: Optional[str] = Query(None, description="结束日期 YYYY-MM-DD"),
+    min_mouse_points: Optional[int] = Query(None, ge=0, description="最少鼠标轨迹点数"),
+    min_straightness: Optional[float] = Query(None, ge=0, le=1, description="最低轨迹直线度"),
+    max_straightness: Optional[float] = Query(None, ge=0, le=1, description="最高轨迹直线度"),
+    max_speed_cv: Optional[float] = Query(None, ge=0, description="最高速度变异系数"),
+    max_interval_entropy: Optional[float] = Query(None, ge=0, le=1, description="最高采样间隔熵"),
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -42,6 +65,8 @@ async def get_visits(
     - device_type: 设备类型（pc/mobile/tablet/bot）
     - min_score: 最低真实性评分
     - start_date/end_date: 时间范围
+    - 鼠标轨迹特征：点数、直线度、速度变异系数、采样间隔熵
+      （直线度接近 1、速度和采样间隔过于均匀的轨迹通常由脚本生成）
     """
     # 构建查询条件
     conditions = []
@@ -52,6 +77,21 @@ async def get_visits(
     if min_score is not None:
         conditions.append(Visit.authenticity_score >= min_score)
 
+    if min_mouse_points is not None:
+        conditions.append(Visit.mouse_points >= min_mouse_points)
+
+    if min_straightness is not None:
+        conditions.append(Visit.mouse_straightness >= min_straightness)
+
+    if max_straightness is not None:
+        conditions.append(Visit.mouse_straightness <= max_straightness)
+
+    if max_speed_cv is not None:
+        conditions.append(Visit.mouse_speed_cv <= max_speed_cv)
+
+    if max_interval_entropy is not None:
+        conditions.append(Visit.mouse_interval_entropy <= max_interval_entropy)
+
     if start_date:
         try:
             start_dt = datetime.fromisoformat(start_date)
@@ -101,6 +141,9 @@ async def get_visits(
                 "scroll_depth": v.scroll_depth,
                 "is_bot": v.is_bot,
                 "authenticity_score": v.authenticity_score,
+                "mouse_points": v.mouse_points,
+                "mouse_straightness": v.mouse_straightness,
+                "mouse_speed_cv": v.mouse_speed_cv,
             }
             for v in visits
         ],
@@ -116,16 +159,32 @@ async def get_visits(
 @router.get("/visits/{visit_id}", summary="获取访问详情")
 async def get_visit_detail(
     visit_id: str,
+    include_trajectory: bool = Query(False, description="是否解码并返回鼠标轨迹"),
     db: AsyncSession = Depends(get_db)
 ):
-    """获取单个访问记录的详细信息"""
-    stmt = select(Visit).where(Visit.visit_id == visit_id)
+    """
+    获取单个访问记录的详细信息
+
+    鼠标轨迹默认只返回点数，include_trajectory=true 时才解码为 JSON
+    """
+    stmt = select(Visit).where(Visit.visit_id == visit_id).options(undefer_group("text"))
     result = await db.execute(stmt)
     visit = result.scalar_one_or_none()
 
     if not visit:
         raise HTTPException(status_code=404, detail="访问记录不存在")
 
+    # 鼠标轨迹（主键查询）
+    payload = await db.get(VisitPayload, visit.id)
+    trajectory = payload.mouse_trajectory if payload else None
+    movements = payload.mouse_movements if payload else None
+
+    # 同一设备的访问统计（主键查询）
+    device = await device_crud.get_device(db, visit.device_id) if visit.device_id else None
+
+    # 页面上报的自定义事件
+    events = await event_crud.get_visit_events(db, visit.visit_id)
+
     return {
         "success": True,
         "data": {
@@ -145,6 +204,8 @@ async def get_visit_detail(
             # 请求信息
             "user_agent": visit.user_agent,
             "referrer": visit.referrer,
+            "referrer_domain": visit.referrer_domain,
+            "referrer_channel": visit.referrer_channel,
             "page_url": visit.page_url,
 
             # 设备信息
@@ -233,17 +294,153 @@ async def get_visit_detail(
             # 行为数据
             "stay_duration": visit.stay_duration,
             "scroll_depth": visit.scroll_depth,
-            "mouse_movements": visit.mouse_movements,
+            "mouse_point_count": (
+                point_count(trajectory) if trajectory
+                else len(load_points(None, movements))
+            ),
+            "mouse_movements": (
+                to_json(load_points(trajectory, movements))
+                if include_trajectory else None
+            ),
+            "mouse_features": {
+                "points": visit.mouse_points,
+                "speed_mean": visit.mouse_speed_mean,
+                "speed_cv": visit.mouse_speed_cv,
+                "accel_mean": visit.mouse_accel_mean,
+                "curvature": visit.mouse_curvature,
+                "straightness": visit.mouse_straightness,
+                "interval_entropy": visit.mouse_interval_entropy,
+                "direction_entropy": visit.mouse_direction_entropy,
+                "pause_count": visit.mouse_pause_count,
+                "analyzed_at": visit.mouse_analyzed_at.isoformat() if visit.mouse_analyzed_at else None,
+            },
 
             # 分析字段
             "is_bot": visit.is_bot,
             "authenticity_score": visit.authenticity_score,
             "fingerprint_hash": visit.fingerprint_hash,
+
+            # 设备身份
+            "device_id": visit.device_id,
+            "device_visit_count": device.visit_count if device else None,
+            "device_distinct_ip_count": device.distinct_ip_count if device else None,
+            "device_first_seen": device.first_seen.isoformat() if device and device.first_seen else None,
+
+            # 自定义事件
+            "events": [event.to_dict() for event in events],
+        }
+    }
+
+
+@router.get("/devices", summary="获取重复访问设备列表")
+async def get_devices(
+    min_visits: int = Query(2, ge=1, description="最少访问次数"),
+    min_ips: int = Query(1, ge=1, description="最少不同 IP 数"),
+    order_by: str = Query("visit_count", description="排序字段：visit_count / distinct_ip_count / last_seen"),
+    page: int = Query(1, ge=1, description="页码"),
+    page_size: int = Query(50, ge=1, le=500, description="每页数量"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    获取重复访问的设备（按与 IP 无关的设备标识聚合）
+
+    - min_visits: 共享同一指纹的访问次数下限
+    - min_ips: 使用过的不同 IP 数下限（轮换代理的设备通常很高）
+    """
+    devices = await device_crud.get_repeat_devices(
+        db,
+        min_visits=min_visits,
+        min_ips=min_ips,
+        order_by=order_by,
+        limit=page_size,
+        offset=(page - 1) * page_size
+    )
+
+    return {
+        "success": True,
+        "data": [device.to_dict() for device in devices],
+        "pagination": {
+            "page": page,
+            "page_size": page_size
+        }
+    }
+
+
+@router.get("/devices/clusters", summary="获取近似重复设备簇")
+async def get_device_clusters(
+    days: int = Query(7, ge=1, le=90, description="统计天数"),
+    threshold: float = Query(0.7, ge=0.5, le=1.0, description="相似度阈值（指纹组件集合的 Jaccard 相似度）"),
+    min_size: int = Query(2, ge=2, description="簇内最少设备数"),
+    limit: int = Query(50, ge=1, le=500, description="返回的簇数量"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    获取指纹组件高度重合的设备簇
+
+    只随机化部分指纹组件（Canvas、音频、字体等）的伪装设备
+    综合指纹不同，但大部分组件相同，会被归入同一个簇
+    """
+    clusters = await find_device_clusters(
+        db,
+        days=days,
+        threshold=threshold,
+        min_size=min_size,
+        limit=limit
+    )
+
+    return {
+        "success": True,
+        "data": clusters
+    }
+
+
+@router.get("/devices/{device_id}/similar", summary="获取近似重复设备")
+async def get_similar_devices(
+    device_id: str,
+    threshold: float = Query(0.7, ge=0.5, le=1.0, description="相似度阈值"),
+    limit: int = Query(50, ge=1, le=500, description="返回数量"),
+    db: AsyncSession = Depends(get_db)
+):
+    """获取与指定设备指纹组件高度重合的其他设备"""
+    similar = await find_similar_devices(db, device_id, threshold=threshold, limit=limit)
+
+    if similar is None:
+        raise HTTPException(status_code=404, detail="设备不存在或尚未建立索引")
+
+    return {
+        "success": True,
+        "data": similar
+    }
+
+
+@router.get("/devices/{device_id}", summary="获取设备详情")
+async def get_device_detail(
+    device_id: str,
+    limit: int = Query(20, ge=1, le=200, description="返回的最近访问数量"),
+    db: AsyncSession = Depends(get_db)
+):
+    """获取设备统计及其最近的访问记录"""
+    device = await device_crud.get_device(db, device_id)
+
+    if not device:
+        raise HTTPException(status_code=404, detail="设备不存在")
+
+    stmt = select(Visit).where(
+        Visit.device_id == device_id
+    ).order_by(desc(Visit.timestamp)).limit(limit)
+    result = await db.execute(stmt)
+
+    return {
+        "success": True,
+        "data": {
+            **device.to_dict(),
+            "recent_visits": [v.to_dict() for v in result.scalars().all()]
         }
     }
 
 
 @router.get("/stats/summary", summary="获取统计摘要")
+@cached_response
 async def get_stats_summary(
     days: int = Query(7, ge=1, le=90, description="统计天数"),
     db: AsyncSession = Depends(get_db)
@@ -258,6 +455,7 @@ async def get_stats_summary(
     - 平均真实性评分
     - 设备类型分布
     - 机器人访问占比
+    - 独立 IP / 设备数（近似值）
     """
     now = datetime.now()
     today_start = datetime(now.year, now.month, now.day)
@@ -312,6 +510,9 @@ async def get_stats_summary(
     bot_result = await db.execute(bot_stmt)
     bot_visits = bot_result.scalar_one()
 
+    # 周期内独立 IP / 设备数（HyperLogLog 近似值）
+    unique = await distinct_counter.estimate(db, datetime.utcnow() - timedelta(days=days))
+
     return {
         "success": True,
         "data": {
@@ -324,11 +525,40 @@ async def get_stats_summary(
             "device_distribution": device_distribution,
             "bot_visits": bot_visits,
             "bot_rate": round(bot_visits / period_visits * 100, 2) if period_visits > 0 else 0,
+            "unique_ips": unique[METRIC_IP],
+            "unique_devices": unique[METRIC_FINGERPRINT],
+        }
+    }
+
+
+@router.get("/stats/unique", summary="获取独立访客统计")
+@cached_response
+async def get_unique_stats(
+    days: int = Query(7, ge=1, le=365, description="统计天数"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    获取独立 IP、独立指纹、独立 Canvas 指纹数量
+
+    基于按小时存储的 HyperLogLog 草图合并估算，
+    耗时只与时间范围内的小时数有关，与访问记录数量无关
+    """
+    unique = await distinct_counter.estimate(db, datetime.utcnow() - timedelta(days=days))
+
+    return {
+        "success": True,
+        "data": {
+            "period_days": days,
+            "unique_ips": unique[METRIC_IP],
+            "unique_fingerprints": unique[METRIC_FINGERPRINT],
+            "unique_canvas": unique[METRIC_CANVAS],
+            "standard_error": round(distinct_counter.standard_error, 4),
         }
     }
 
 
 @router.get("/stats/trend", summary="获取访问趋势")
+@cached_response
 async def get_stats_trend(
     days: int = Query(7, ge=1, le=90, description="统计天数"),
     db: AsyncSession = Depends(get_db)
@@ -366,6 +596,7 @@ async def get_stats_trend(
 
 
 @router.get("/stats/devices", summary="获取设备统计")
+@cached_response
 async def get_device_stats(
     days: int = Query(7, ge=1, le=90, description="统计天数"),
     db: AsyncSession = Depends(get_db)
@@ -387,7 +618,7 @@ async def get_device_stats(
     ).where(
         and_(
             Visit.timestamp >= period_start,
-            Visit.browser != None
+            Visit.browser.isnot(None)
         )
     ).group_by(Visit.browser).order_by(desc('count')).limit(10)
     browser_result = await db.execute(browser_stmt)
@@ -399,7 +630,7 @@ async def get_device_stats(
     ).where(
         and_(
             Visit.timestamp >= period_start,
-            Visit.os != None
+            Visit.os.isnot(None)
         )
     ).group_by(Visit.os).order_by(desc('count')).limit(10)
     os_result = await db.execute(os_stmt)
@@ -424,6 +655,7 @@ async def get_device_stats(
 
 
 @router.get("/stats/locations", summary="获取地理位置统计")
+@cached_response
 async def get_location_stats(
     days: int = Query(7, ge=1, le=90, description="统计天数"),
     db: AsyncSession = Depends(get_db)
@@ -438,7 +670,7 @@ async def get_location_stats(
     ).where(
         and_(
             Visit.timestamp >= period_start,
-            Visit.ip_country != None
+            Visit.ip_country.isnot(None)
         )
     ).group_by(Visit.ip_country).order_by(desc('count')).limit(15)
     country_result = await db.execute(country_stmt)
@@ -451,7 +683,7 @@ async def get_location_stats(
     ).where(
         and_(
             Visit.timestamp >= period_start,
-            Visit.ip_city != None
+            Visit.ip_city.isnot(None)
         )
     ).group_by(Visit.ip_country, Visit.ip_city).order_by(desc('count')).limit(15)
     city_result = await db.execute(city_stmt)
@@ -471,103 +703,62 @@ async def get_location_stats(
     }
 
 
+# 来源统计中每个渠道单独列出的域名数
+REFERRER_DOMAINS_PER_CHANNEL = 20
+
+
 @router.get("/stats/referrers", summary="获取来源渠道统计")
+@cached_response
 async def get_referrer_stats(
     days: int = Query(7, ge=1, le=90, description="统计天数"),
     db: AsyncSession = Depends(get_db)
 ):
-    """获取来源渠道/平台统计"""
-    from urllib.parse import urlparse
+    """
+    获取来源渠道/平台统计
 
+    渠道和域名在写入时已分类，这里只做一次分组统计：
+    已知平台按渠道合并，其他来源按域名统计；每个渠道只列出访问最多的
+    REFERRER_DOMAINS_PER_CHANNEL 个域名，其余域名合并计入该渠道，渠道合计不变
+    """
     period_start = datetime.now() - timedelta(days=days)
 
-    # 来源统计 - 对referrer进行分类处理
-    referrer_stmt = select(
-        Visit.referrer,
-        func.count(Visit.id).label('count')
+    domain_key = case(
+        (Visit.referrer_channel == CHANNEL_OTHER, Visit.referrer_domain),
+        else_=None
+    )
+    grouped = select(
+        Visit.referrer_channel,
+        domain_key.label('domain'),
+        func.count(Visit.id).label('count'),
+        func.row_number().over(
+            partition_by=Visit.referrer_channel,
+            order_by=desc(func.count(Visit.id))
+        ).label('domain_rank')
     ).where(
         Visit.timestamp >= period_start
-    ).group_by(Visit.referrer).order_by(desc('count')).limit(20)
+    ).group_by(
+        Visit.referrer_channel, domain_key
+    ).subquery()
+
+    kept_domain = case(
+        (grouped.c.domain_rank <= REFERRER_DOMAINS_PER_CHANNEL, grouped.c.domain),
+        else_=None
+    )
+    referrer_stmt = select(
+        grouped.c.referrer_channel,
+        kept_domain.label('domain'),
+        func.sum(grouped.c.count).label('count')
+    ).group_by(
+        grouped.c.referrer_channel, kept_domain
+    )
 
     referrer_result = await db.execute(referrer_stmt)
-    referrers_raw = [(row[0], row[1]) for row in referrer_result]
 
-    # 分类处理来源
     categorized = {}
-    direct_count = 0
+    for channel, domain, count in referrer_result:
+        name = channel_display_name(channel, domain)
+        categorized[name] = categorized.get(name, 0) + count
 
-    for referrer, count in referrers_raw:
-        if not referrer or referrer == "" or referrer == "null" or referrer == "None":
-            direct_count += count
-        else:
-            # 简单的域名提取和分类
-            try:
-                parsed = urlparse(referrer)
-                domain = parsed.netloc.lower() if parsed.netloc else ""
-
-                # 如果没有域名，归入直接访问
-                if not domain:
-                    direct_count += count
-                    continue
-
-                # 去除www前缀
-                if domain.startswith('www.'):
-                    domain = domain[4:]
-
-                # 分类主要平台
-                if 'google' in domain:
-                    category = 'Google'
-                elif 'bing' in domain or 'microsoft' in domain:
-                    category = 'Bing'
-                elif 'baidu' in domain:
-                    category = '百度'
-                elif 'tiktok' in domain or 'douyin' in domain:
-                    category = 'TikTok/抖音'
-                elif 'facebook' in domain or 'fb.com' in domain:
-                    category = 'Facebook'
-                elif 'twitter' in domain or 'x.com' in domain:
-                    category = 'Twitter/X'
-                elif 'youtube' in domain:
-                    category = 'YouTube'
-                elif 'instagram' in domain:
-                    category = 'Instagram'
-                elif 'weibo' in domain:
-                    category = '微博'
-                elif 'wechat' in domain or 'weixin' in domain:
-                    category = '微信'
-                elif 'linkedin' in domain:
-                    category = 'LinkedIn'
-                elif 'reddit' in domain:
-                    category = 'Reddit'
-                else:
-                    # 其他来源使用域名
-                    category = domain if len(domain) < 30 else domain[:27] + '...'
-
-                if category in categorized:
-                    categorized[category] += count
-                else:
-                    categorized[category] = count
-            except Exception as e:
-                # 解析失败的归入其他
-                if '其他' in categorized:
-                    categorized['其他'] += count
-                else:
-                    categorized['其他'] = count
-
-    # 添加直接访问
-    if direct_count > 0:
-        categorized['直接访问'] = direct_count
-
-    # 如果没有任何数据，返回空列表
-    if not categorized:
-        return {
-            "success": True,
-            "data": {
-                "referrers": []
-            }
-        }
-
-    # 转换为列表并排序
     referrers_list = [
         {"name": name, "count": count}
         for name, count in sorted(categorized.items(), key=lambda x: x[1], reverse=True)
@@ -581,71 +772,112 @@ async def get_referrer_stats(
     }
 
 
+def _is_sqlite(db: AsyncSession) -> bool:
+    """判断当前会话是否连接 SQLite"""
+    return db.get_bind().dialect.name == "sqlite"
+
+
+def _minute_expr(db: AsyncSession):
+    """按分钟截断的 UTC 时间字符串（YYYY-MM-DD HH:MM）"""
+    if _is_sqlite(db):
+        return func.strftime('%Y-%m-%d %H:%M', Visit.timestamp)
+    return func.to_char(func.timezone('UTC', Visit.timestamp), 'YYYY-MM-DD HH24:MI')
+
+
+def _quarter_of_day_expr(db: AsyncSession):
+    """UTC 一天内的第几个 15 分钟（0-95），所有真实时区偏移都是 15 分钟的整数倍"""
+    if _is_sqlite(db):
+        minutes = (
+            cast(func.strftime('%H', Visit.timestamp), Integer) * 60
+            + cast(func.strftime('%M', Visit.timestamp), Integer)
+        )
+        return minutes // 15
+    utc_ts = func.timezone('UTC', Visit.timestamp)
+    return cast(func.floor((func.extract('hour', utc_ts) * 60 + func.extract('minute', utc_ts)) / 15), Integer)
+
+
 @router.get("/stats/hourly-admin", summary="获取管理员本地时间访问分布")
-async def get_hourly_admin_stats(db: AsyncSession = Depends(get_db)):
+@cached_response
+async def get_hourly_admin_stats(
+    tz_offset: int = Query(0, ge=-720, le=840, description="管理员时区相对 UTC 的偏移（分钟，东正西负，如 UTC+8 为 480）"),
+    interval: int = Query(60, description="时间粒度（分钟）：5/15/30/60"),
+    db: AsyncSession = Depends(get_db)
+):
     """
     获取最近24小时的访问分布（管理员本地时间）
-    返回原始时间戳，由前端转换为浏览器本地时间
+
+    数据库按分钟聚合，服务端再按管理员本地时间对齐的时间段分桶，
+    只返回每个时间段的标签和访问次数
     """
-    # 获取最近24小时的访问记录
-    time_24h_ago = datetime.utcnow() - timedelta(hours=24)
+    if interval not in (5, 15, 30, 60):
+        raise HTTPException(status_code=400, detail="无效的时间粒度")
 
-    stmt = select(Visit.timestamp).where(
-        Visit.timestamp >= time_24h_ago
-    ).order_by(Visit.timestamp)
+    offset = timedelta(minutes=tz_offset)
+    total_slots = (24 * 60) // interval
+
+    # 以管理员本地时间对齐时间段边界
+    now_local = datetime.utcnow().replace(second=0, microsecond=0) + offset
+    current_slot_start = now_local - timedelta(minutes=(now_local.hour * 60 + now_local.minute) % interval)
+    first_slot_start = current_slot_start - timedelta(minutes=(total_slots - 1) * interval)
+    window_start = first_slot_start - offset
+
+    minute = _minute_expr(db)
+    stmt = select(
+        minute.label('minute'),
+        func.count(Visit.id).label('count')
+    ).where(
+        Visit.timestamp >= window_start
+    ).group_by(minute)
 
     result = await db.execute(stmt)
-    timestamps = [row[0] for row in result]
 
-    # 将datetime对象转换为ISO格式字符串
-    timestamps_iso = [ts.isoformat() if ts else None for ts in timestamps]
+    counts = [0] * total_slots
+    for minute_str, count in result:
+        if not minute_str:
+            continue
+        visit_minute = datetime.strptime(minute_str, '%Y-%m-%d %H:%M')
+        slot = int((visit_minute - window_start).total_seconds() // 60) // interval
+        if 0 <= slot < total_slots:
+            counts[slot] += count
+
+    labels = [
+        (first_slot_start + timedelta(minutes=i * interval)).strftime('%H:%M')
+        for i in range(total_slots)
+    ]
 
     return {
         "success": True,
         "data": {
-            "timestamps": timestamps_iso
+            "interval_minutes": interval,
+            "labels": labels,
+            "counts": counts,
+            "total": sum(counts)
         }
     }
 
 
 @router.get("/stats/hourly-visitor", summary="获取访问者本地时间访问分布")
+@cached_response
 async def get_hourly_visitor_stats(
     country: Optional[str] = Query(None, description="国家代码筛选"),
     db: AsyncSession = Depends(get_db)
 ):
     """
     获取最近24小时的访问分布（访问者本地时间）
-    根据访问者的timezone和country推算其本地时间
-    """
-    try:
-        from zoneinfo import ZoneInfo
-    except ImportError:
-        # Python 3.8 fallback
-        from backports.zoneinfo import ZoneInfo
-
-    # 国家到时区的映射（主要时区）
-    country_timezone_map = {
-        'US': 'America/New_York',
-        'CN': 'Asia/Shanghai',
-        'JP': 'Asia/Tokyo',
-        'KR': 'Asia/Seoul',
-        'GB': 'Europe/London',
-        'FR': 'Europe/Paris',
-        'DE': 'Europe/Berlin',
-        'AU': 'Australia/Sydney',
-        'CA': 'America/Toronto',
-        'IN': 'Asia/Kolkata',
-        'BR': 'America/Sao_Paulo',
-        'RU': 'Europe/Moscow',
-        'SG': 'Asia/Singapore',
-        'HK': 'Asia/Hong_Kong',
-        'TW': 'Asia/Taipei',
-    }
 
-    # 获取最近24小时的访问记录
-    time_24h_ago = datetime.utcnow() - timedelta(hours=24)
+    数据库按 timezone/国家/UTC 15 分钟段聚合，
+    每个时区只换算一次偏移，返回按访问者本地小时（0-23）统计的直方图
+    """
+    now_utc = datetime.now(dt_timezone.utc)
+    time_24h_ago = now_utc.replace(tzinfo=None) - timedelta(hours=24)
 
-    stmt = select(Visit.timestamp, Visit.timezone, Visit.ip_country).where(
+    quarter = _quarter_of_day_expr(db)
+    stmt = select(
+        Visit.timezone,
+        Visit.ip_country,
+        quarter.label('quarter'),
+        func.count(Visit.id).label('count')
+    ).where(
         Visit.timestamp >= time_24h_ago
     )
 
@@ -653,81 +885,304 @@ async def get_hourly_visitor_stats(
     if country:
         stmt = stmt.where(Visit.ip_country == country)
 
-    stmt = stmt.order_by(Visit.timestamp)
+    stmt = stmt.group_by(Visit.timezone, Visit.ip_country, quarter)
 
     result = await db.execute(stmt)
-    records = [(row[0], row[1], row[2]) for row in result]
 
-    # 转换为访问者本地时间
-    local_timestamps = []
-    for timestamp, visitor_tz, ip_country in records:
-        if not timestamp:
+    counts = [0] * 24
+    offset_memo = {}
+    for visitor_tz, ip_country, utc_quarter, count in result:
+        if utc_quarter is None:
             continue
 
-        try:
-            # 优先使用访问者的timezone字段
-            if visitor_tz:
-                # 尝试解析timezone字符串（如 "Asia/Shanghai"）
-                try:
-                    tz = ZoneInfo(visitor_tz)
-                    # 假设timestamp是aware datetime (UTC)
-                    if timestamp.tzinfo is None:
-                        timestamp = timestamp.replace(tzinfo=ZoneInfo('UTC'))
-                    local_time = timestamp.astimezone(tz)
-                    local_timestamps.append(local_time.isoformat())
-                    continue
-                except:
-                    pass
-
-            # 如果没有timezone字段，使用国家映射
-            if ip_country and ip_country in country_timezone_map:
-                tz = ZoneInfo(country_timezone_map[ip_country])
-                if timestamp.tzinfo is None:
-                    timestamp = timestamp.replace(tzinfo=ZoneInfo('UTC'))
-                local_time = timestamp.astimezone(tz)
-                local_timestamps.append(local_time.isoformat())
-            else:
-                # 无法确定时区，使用UTC
-                local_timestamps.append(timestamp.isoformat())
-        except Exception as e:
-            # 出错时使用原始时间
-            local_timestamps.append(timestamp.isoformat() if timestamp else None)
+        # 优先使用访问者的 timezone 字段，其次使用国家映射，都无法确定时使用 UTC
+        offset = None
+        if visitor_tz:
+            offset = timezone_offset_minutes(visitor_tz, now_utc, offset_memo)
+        if offset is None and ip_country in COUNTRY_TIMEZONE_MAP:
+            offset = timezone_offset_minutes(COUNTRY_TIMEZONE_MAP[ip_country], now_utc, offset_memo)
+        if offset is None:
+            offset = 0
+
+        local_quarter = (int(utc_quarter) + offset // 15) % 96
+        counts[local_quarter // 4] += count
 
     return {
         "success": True,
         "data": {
-            "timestamps": local_timestamps,
+            "counts": counts,
+            "total": sum(counts),
             "country": country
         }
     }
 
 
-@router.post("/clear-visits", summary="清空所有访问记录")
-async def clear_all_visits(db: AsyncSession = Depends(get_db)):
+@router.get("/stats/realtime", summary="获取实时指标")
+async def get_realtime_stats():
     """
-    清空所有访问记录
+    获取实时指标（内存滑动窗口，不访问数据库）
 
-    警告：此操作不可逆！
+    包含：
+    - 当前在线访问数（按最后一次心跳）
+    - 最近 1/5/15/60 分钟访问量
+    - 最近 60 分钟机器人访问数和占比
+    - 最近 60 分钟每分钟访问量序列
     """
-    try:
-        # 获取删除前的记录数
-        count_stmt = select(func.count(Visit.id))
-        result = await db.execute(count_stmt)
-        total_count = result.scalar()
-
-        # 删除所有记录
-        delete_stmt = Visit.__table__.delete()
-        await db.execute(delete_stmt)
-        await db.commit()
-
-        return {
-            "success": True,
-            "message": f"已清空所有访问记录",
-            "deleted_count": total_count
+    return {
+        "success": True,
+        "data": realtime_stats.snapshot()
+    }
+
+
+@router.get("/stats/journal", summary="获取写入日志状态")
+async def get_journal_stats():
+    """
+    获取写入日志（INGEST_JOURNAL）状态
+
+    包含待加载的分段数和字节数、已接收 / 已写入 / 跳过 / 转存的记录数、最近一次加载时间和错误
+    """
+    return {
+        "success": True,
+        "data": ingest_journal.stats()
+    }
+
+
+@router.get("/stats/migrations", summary="获取数据库迁移状态")
+async def get_migration_stats():
+    """
+    获取数据库迁移状态
+
+    包含各版本的状态（pending / expanded / done）和后台操作进度、正在执行的操作及其处理进度、最近一次错误
+    """
+    return {
+        "success": True,
+        "data": await migration_runner.stats()
+    }
+
+
+@router.get("/stats/cache", summary="获取统计接口响应缓存状态")
+async def get_response_cache_stats():
+    """
+    获取统计接口响应缓存状态
+
+    包含缓存条目数、当前数据版本、命中 / 未命中次数和返回 304 的次数
+    """
+    return {
+        "success": True,
+        "data": response_cache.stats()
+    }
+
+
+@router.get("/stats/ratelimit", summary="获取追踪接口限流统计")
+async def get_ratelimit_stats(
+    top: int = Query(10, ge=1, le=100, description="返回被拒绝最多的键数")
+):
+    """
+    获取追踪接口限流统计
+
+    包含每条规则（ip / visit）的限额、当前跟踪的键数、放行和拒绝的请求数，
+    最近一小时每分钟的拒绝数、被拒绝最多的键，以及多进程共享计数的同步状态
+    """
+    return {
+        "success": True,
+        "data": rate_limiter.stats(top=top)
+    }
+
+
+def _live_counters() -> dict:
+    """实时推送中的计数器事件内容"""
+    return {
+        **live_hub.get_stats(),
+        **realtime_stats.snapshot(include_series=False),
+    }
+
+
+@router.get("/live", summary="实时访问推送（SSE）")
+async def live_feed(request: Request):
+    """
+    实时访问推送（Server-Sent Events）
+
+    事件类型：
+    - visit: 新访问记录
+    - behavior: 行为数据更新
+    - counters: 无事件时定期推送的实时指标（兼作心跳）
+
+    每个连接的发送队列有上限，消费过慢的连接会被服务端断开，
+    客户端应在断开后重新连接
+    """
+    subscriber = live_hub.subscribe()
+
+    async def event_stream():
+        try:
+            yield format_sse("counters", _live_counters())
+
+            while True:
+                message = await subscriber.next_message(settings.LIVE_HEARTBEAT_SECONDS)
+
+                if message is None:
+                    # 被推送中心踢出（消费过慢）
+                    yield format_sse("dropped", {"reason": "slow consumer"})
+                    break
+
+                if await request.is_disconnected():
+                    break
+
+                yield message or format_sse("counters", _live_counters())
+        finally:
+            live_hub.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
         }
+    )
+
+
+@router.post("/rescore", summary="重新计算真实性评分")
+async def rescore_visits(
+    batch_size: int = Query(2000, ge=100, le=20000, description="每批处理的记录数"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    按当前评分规则重新计算全部访问记录的真实性评分
+
+    评分规则调整后调用；按批向量化计算，只写回分数有变化的记录
+    """
+    try:
+        stats = await scoring_engine.rescore_all(db, batch_size=batch_size)
     except Exception as e:
         await db.rollback()
-        raise HTTPException(status_code=500, detail=f"清空失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"重新评分失败: {str(e)}")
+
+    return {
+        "success": True,
+        "data": stats
+    }
+
+
+def _purge_filter(
+    start_date: Optional[str],
+    end_date: Optional[str],
+    device_type: Optional[str] = None,
+    is_bot: Optional[bool] = None,
+    min_score: Optional[float] = None,
+    max_score: Optional[float] = None
+) -> PurgeFilter:
+    start_dt = end_dt = None
+    if start_date:
+        try:
+            start_dt = datetime.fromisoformat(start_date)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="无效的开始日期格式")
+
+    if end_date:
+        try:
+            end_dt = datetime.fromisoformat(end_date) + timedelta(days=1)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="无效的结束日期格式")
+
+    return PurgeFilter(
+        start=start_dt,
+        end=end_dt,
+        device_type=device_type,
+        is_bot=is_bot,
+        min_score=min_score,
+        max_score=max_score,
+    )
+
+
+def _start_purge(filters: PurgeFilter, vacuum: str):
+    if vacuum not in VACUUM_MODES:
+        raise HTTPException(status_code=400, detail=f"无效的空间回收方式，可选: {', '.join(VACUUM_MODES)}")
+    try:
+        return purge_manager.start(filters, vacuum)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.post("/purge", summary="按条件清理访问记录")
+async def start_purge(
+    start_date: Optional[str] = Query(None, description="开始日期 YYYY-MM-DD"),
+    end_date: Optional[str] = Query(None, description="结束日期 YYYY-MM-DD（含当天）"),
+    device_type: Optional[str] = Query(None, description="设备类型"),
+    is_bot: Optional[bool] = Query(None, description="是否机器人"),
+    min_score: Optional[float] = Query(None, ge=0, le=100, description="最低评分"),
+    max_score: Optional[float] = Query(None, ge=0, le=100, description="最高评分"),
+    vacuum: str = Query(VACUUM_NONE, description="删除后回收空间: none / incremental / full"),
+):
+    """
+    按条件在后台分批删除访问记录（连同鼠标轨迹、原始数据和自定义事件）
+
+    条件全部为空时清理全部记录；返回任务信息，进度通过 GET /admin/purge/{job_id} 查询
+
+    警告：此操作不可逆！
+    """
+    filters = _purge_filter(start_date, end_date, device_type, is_bot, min_score, max_score)
+    job = _start_purge(filters, vacuum)
+
+    return {
+        "success": True,
+        "data": job.to_dict()
+    }
+
+
+@router.get("/purge", summary="获取清理任务列表")
+async def list_purge_jobs():
+    """获取最近的清理任务（新的在前）"""
+    return {
+        "success": True,
+        "data": purge_manager.list()
+    }
+
+
+@router.get("/purge/{job_id}", summary="获取清理任务进度")
+async def get_purge_job(job_id: str):
+    """
+    获取清理任务进度
+
+    包含状态（counting / deleting / vacuum / done / cancelled / failed）、待删除总数、已删除数和回收的空间
+    """
+    job = purge_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="清理任务不存在")
+
+    return {
+        "success": True,
+        "data": job.to_dict()
+    }
+
+
+@router.post("/purge/{job_id}/cancel", summary="取消清理任务")
+async def cancel_purge_job(job_id: str):
+    """取消清理任务（当前批次完成后停止，已删除的记录不会恢复）"""
+    if not purge_manager.cancel(job_id):
+        raise HTTPException(status_code=404, detail="清理任务不存在或已结束")
+
+    return {
+        "success": True,
+        "message": "已请求取消清理任务"
+    }
+
+
+@router.post("/clear-visits", summary="清空所有访问记录")
+async def clear_all_visits(
+    vacuum: str = Query(VACUUM_NONE, description="删除后回收空间: none / incremental / full"),
+):
+    """
+    清空所有访问记录（后台分批删除，进度通过 GET /admin/purge/{job_id} 查询）
+
+    警告：此操作不可逆！
+    """
+    job = _start_purge(PurgeFilter(), vacuum)
+
+    return {
+        "success": True,
+        "message": "已开始清空所有访问记录",
+        "data": job.to_dict()
+    }
 
 
 @router.delete("/visits/{visit_id}", summary="删除访问记录")
@@ -735,23 +1190,22 @@ async def delete_visit(
     visit_id: str,
     db: AsyncSession = Depends(get_db)
 ):
-    """删除单个访问记录"""
-    stmt = select(Visit).where(Visit.visit_id == visit_id)
-    result = await db.execute(stmt)
-    visit = result.scalar_one_or_none()
-
-    if not visit:
+    """删除单个访问记录（连同鼠标轨迹、原始数据和自定义事件）"""
+    if not await visit_crud.delete_visit(db, visit_id):
         raise HTTPException(status_code=404, detail="访问记录不存在")
 
-    await db.delete(visit)
-    await db.commit()
-
     return {
         "success": True,
         "message": "访问记录已删除"
     }
 
 
+def _record_export(fmt: str, rows: int, started: float):
+    """导出指标：行数和生成耗时（两者的速率之比即导出吞吐量）"""
+    export_rows.labels(fmt).inc(rows)
+    export_duration.labels(fmt).observe(time.perf_counter() - started)
+
+
 @router.get("/export/csv", summary="导出 CSV")
 async def export_csv(
     device_type: Optional[str] = Query(None, description="设备类型筛选"),
@@ -766,6 +1220,8 @@ async def export_csv(
 
     支持与访问列表相同的筛选条件
     """
+    started = time.perf_counter()
+
     # 构建查询条件（与 get_visits 相同）
     conditions = []
 
@@ -789,13 +1245,19 @@ async def export_csv(
         except ValueError:
             raise HTTPException(status_code=400, detail="无效的结束日期格式")
 
-    # 查询数据
-    stmt = select(Visit).order_by(desc(Visit.timestamp)).limit(limit)
+    # 查询数据（连同 User-Agent、来源页面和鼠标轨迹）
+    stmt = (
+        select(Visit, VisitPayload.mouse_trajectory, VisitPayload.mouse_movements)
+        .outerjoin(VisitPayload, VisitPayload.visit_pk == Visit.id)
+        .options(undefer_group("text"))
+        .order_by(desc(Visit.timestamp))
+        .limit(limit)
+    )
     if conditions:
         stmt = stmt.where(and_(*conditions))
 
     result = await db.execute(stmt)
-    visits = result.scalars().all()
+    visits = result.all()
 
     # 创建 CSV
     output = io.StringIO()
@@ -828,14 +1290,14 @@ async def export_csv(
         # 地理位置
         '浏览器纬度', '浏览器经度', '位置精度(米)',
         # 行为数据
-        '停留时间(秒)', '滚动深度(%)', '鼠标移动',
+        '停留时间(秒)', '滚动深度(%)', '鼠标轨迹(紧凑编码)',
         # 分析
         '是否机器人', '是否代理', '真实性评分', '指纹哈希',
         '页面URL', '来源'
     ])
 
     # 写入数据
-    for v in visits:
+    for v, trajectory, movements in visits:
         writer.writerow([
             v.id,
             v.timestamp.isoformat() if v.timestamp else '',
@@ -907,7 +1369,7 @@ async def export_csv(
             # 行为数据
             v.stay_duration or 0,
             v.scroll_depth or 0,
-            v.mouse_movements or '',
+            to_packed(trajectory, movements),
             # 分析
             '是' if v.is_bot else '否',
             '是' if v.is_proxy else '否',
@@ -919,6 +1381,7 @@ async def export_csv(
 
     # 返回 CSV 文件
     output.seek(0)
+    _record_export("csv", len(visits), started)
     return StreamingResponse(
         iter([output.getvalue()]),
         media_type="text/csv",
@@ -942,6 +1405,8 @@ async def export_json(
 
     支持与访问列表相同的筛选条件
     """
+    started = time.perf_counter()
+
     # 构建查询条件（与 get_visits 相同）
     conditions = []
 
@@ -965,17 +1430,23 @@ async def export_json(
         except ValueError:
             raise HTTPException(status_code=400, detail="无效的结束日期格式")
 
-    # 查询数据
-    stmt = select(Visit).order_by(desc(Visit.timestamp)).limit(limit)
+    # 查询数据（连同 User-Agent、来源页面和鼠标轨迹）
+    stmt = (
+        select(Visit, VisitPayload.mouse_trajectory, VisitPayload.mouse_movements)
+        .outerjoin(VisitPayload, VisitPayload.visit_pk == Visit.id)
+        .options(undefer_group("text"))
+        .order_by(desc(Visit.timestamp))
+        .limit(limit)
+    )
     if conditions:
         stmt = stmt.where(and_(*conditions))
 
     result = await db.execute(stmt)
-    visits = result.scalars().all()
+    visits = result.all()
 
     # 构建 JSON 数据
     data = []
-    for v in visits:
+    for v, trajectory, movements in visits:
         data.append({
             'id': v.id,
             'visit_id': v.visit_id,
@@ -1054,7 +1525,7 @@ async def export_json(
             # 行为数据
             'stay_duration': v.stay_duration,
             'scroll_depth': v.scroll_depth,
-            'mouse_movements': v.mouse_movements,
+            'mouse_trajectory': to_packed(trajectory, movements) or None,
             'is_bot': v.is_bot,
             'is_proxy': v.is_proxy,
             'authenticity_score': v.authenticity_score,
@@ -1066,6 +1537,7 @@ async def export_json(
 
     # 返回 JSON 文件
     json_str = json.dumps(data, ensure_ascii=False, indent=2)
+    _record_export("json", len(visits), started)
     return StreamingResponse(
         iter([json_str]),
         media_type="application/json",
@@ -1089,6 +1561,8 @@ async def export_excel(
 
     支持与访问列表相同的筛选条件
     """
+    started = time.perf_counter()
+
     # 构建查询条件（与 get_visits 相同）
     conditions = []
 
@@ -1112,15 +1586,24 @@ async def export_excel(
         except ValueError:
             raise HTTPException(status_code=400, detail="无效的结束日期格式")
 
-    # 查询数据
-    stmt = select(Visit).order_by(desc(Visit.timestamp)).limit(limit)
+    # 查询数据（连同 User-Agent、来源页面和鼠标轨迹）
+    stmt = (
+        select(Visit, VisitPayload.mouse_trajectory, VisitPayload.mouse_movements)
+        .outerjoin(VisitPayload, VisitPayload.visit_pk == Visit.id)
+        .options(undefer_group("text"))
+        .order_by(desc(Visit.timestamp))
+        .limit(limit)
+    )
     if conditions:
         stmt = stmt.where(and_(*conditions))
 
     result = await db.execute(stmt)
-    visits = result.scalars().all()
+    visits = result.all()
+
+    # 创建 Excel 工作簿（openpyxl 只在导出时导入，不拖慢进程启动）
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, Alignment, PatternFill
 
-    # 创建 Excel 工作簿
     wb = Workbook()
     ws = wb.active
     ws.title = "访问记录"
@@ -1157,7 +1640,7 @@ async def export_excel(
         # 地理位置
         '浏览器纬度', '浏览器经度', '位置精度(米)',
         # 行为数据
-        '停留时间(秒)', '滚动深度(%)', '鼠标移动',
+        '停留时间(秒)', '滚动深度(%)', '鼠标轨迹(紧凑编码)',
         # 分析
         '是否机器人', '是否代理', '真实性评分', '指纹哈希',
         '页面URL', '来源'
@@ -1171,7 +1654,7 @@ async def export_excel(
         cell.alignment = header_alignment
 
     # 写入数据
-    for row_num, v in enumerate(visits, 2):
+    for row_num, (v, trajectory, movements) in enumerate(visits, 2):
         col = 1
         for value in [
             v.id,
@@ -1244,7 +1727,7 @@ async def export_excel(
             # 行为数据
             v.stay_duration or 0,
             v.scroll_depth or 0,
-            v.mouse_movements or '',
+            to_packed(trajectory, movements),
             # 分析
             '是' if v.is_bot else '否',
             '是' if v.is_proxy else '否',
@@ -1273,6 +1756,7 @@ async def export_excel(
     output = io.BytesIO()
     wb.save(output)
     output.seek(0)
+    _record_export("excel", len(visits), started)
 
     # 返回 Excel 文件
     return StreamingResponse(
@@ -2,20 +2,101 @@
 追踪 API 路由
 处理访问记录和行为数据的追踪
 """
-from fastapi import APIRouter, Depends, Request, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, Request, HTTPException
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_db
-from app.schemas.visit import VisitCreate, BehaviorUpdate, VisitResponse
+from app.models.visit import Visit
+from app.schemas.visit import VisitCreate, BehaviorData, BehaviorUpdate, VisitResponse
+from app.schemas.event import batch_events_adapter
 from app.crud import visit as visit_crud
+from app.crud import event as event_crud
 from app.utils.ip import get_client_ip
+from app.services.ingest import after_visit, after_behavior, after_custom_event, preview_visit
+from app.services import journal
+from app.services.journal import ingest_journal
+from app.services.ratelimit import rate_limiter, RULE_IP
+from typing import List, Type, Union
+from datetime import datetime
+import math
+import uuid
 
 router = APIRouter(prefix="/track", tags=["tracker"])
 
 
-@router.post("/", response_model=VisitResponse, summary="记录访问")
+# 追踪接口是高频写入路径，请求体不经过 FastAPI 的 Body 参数解析：
+# 直接读取原始字节交给模型预编译的 pydantic-core 校验器（JSON 解析和校验一次完成），
+# 响应直接构造 ORJSONResponse，跳过 response_model 的二次校验和 jsonable_encoder。
+# Schema 仍是接口契约，OpenAPI 文档中的请求体由 _json_body 从 Schema 生成
+
+def _json_body(model: Type[BaseModel]) -> dict:
+    """生成 openapi_extra 中的请求体描述"""
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": model.model_json_schema()}},
+        }
+    }
+
+
+async def _parse_body(request: Request, validator: Union[Type[BaseModel], TypeAdapter]):
+    """
+    读取并校验请求体
+
+    Raises:
+        RequestValidationError: 校验失败（与 FastAPI 自带校验的 422 响应格式一致）
+    """
+    body = await request.body()
+    try:
+        if isinstance(validator, TypeAdapter):
+            return validator.validate_json(body)
+        return validator.model_validate_json(body)
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)]
+        )
+
+
+def _too_many_requests(wait: float) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail="请求过于频繁，请稍后重试",
+        headers={"Retry-After": str(max(1, math.ceil(wait)))}
+    )
+
+
+async def rate_limit(request: Request):
+    """
+    按客户端 IP 限流（追踪写入接口的依赖，在读取请求体之前执行）
+
+    Raises:
+        HTTPException: 429，Retry-After 为建议的重试等待秒数
+    """
+    wait = rate_limiter.check(RULE_IP, get_client_ip(request))
+    if wait:
+        raise _too_many_requests(wait)
+
+
+def _limit_visits(*visit_ids):
+    """按 visit_id 限流（请求体校验之后）"""
+    wait, _ = rate_limiter.check_visits(visit_ids)
+    if wait:
+        raise _too_many_requests(wait)
+
+
+@router.post(
+    "/",
+    response_model=VisitResponse,
+    summary="记录访问",
+    dependencies=[Depends(rate_limit)],
+    openapi_extra=_json_body(VisitCreate)
+)
 async def track_visit(
-    visit_data: VisitCreate,
     request: Request,
+    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -32,26 +113,50 @@ async def track_visit(
     - ip_address: 客户端 IP 地址
     - device_type: 设备类型
     - authenticity_score: 初始真实性评分
+
+    写入日志模式下只追加到本地日志就返回（评分不含 IP 地理位置相关的项）
     """
+    visit_data = await _parse_body(request, VisitCreate)
+
     # 获取客户端真实 IP
     ip_address = get_client_ip(request)
 
+    if ingest_journal.running:
+        visit_id = str(uuid.uuid4())
+        ingest_journal.append([journal.visit_record(visit_id, ip_address, visit_data)])
+        preview = preview_visit(visit_data)
+        return ORJSONResponse({
+            "visit_id": visit_id,
+            "timestamp": datetime.utcnow(),
+            "ip_address": ip_address,
+            "device_type": preview["device_type"],
+            "authenticity_score": preview["authenticity_score"]
+        })
+
     # 创建访问记录
     visit = await visit_crud.create_visit(db, visit_data, ip_address)
 
-    return VisitResponse(
-        visit_id=visit.visit_id,
-        timestamp=visit.timestamp,
-        ip_address=visit.ip_address,
-        device_type=visit.device_type,
-        authenticity_score=visit.authenticity_score
-    )
+    after_visit(visit, background_tasks)
 
+    # 字段与 VisitResponse 一致
+    return ORJSONResponse({
+        "visit_id": visit.visit_id,
+        "timestamp": visit.timestamp,
+        "ip_address": visit.ip_address,
+        "device_type": visit.device_type,
+        "authenticity_score": visit.authenticity_score
+    })
 
-@router.post("/behavior", summary="更新行为数据")
+
+@router.post(
+    "/behavior",
+    summary="更新行为数据",
+    dependencies=[Depends(rate_limit)],
+    openapi_extra=_json_body(BehaviorUpdate)
+)
 async def update_behavior(
-    behavior_data: BehaviorUpdate,
     request: Request,
+    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db)
 ):
     """
@@ -60,25 +165,212 @@ async def update_behavior(
     前端在页面卸载前发送行为数据，包括：
     - 停留时间（秒）
     - 滚动深度（%）
-    - 鼠标移动轨迹（采样）
+    - 鼠标移动轨迹（采样；带 mouse_seq 时为增量上报，
+      响应中的 mouse_ack 为服务端已接收的采样数，客户端下次从该位置开始上报）
 
     这些数据用于评估访问的真实性
     同时检测 IP 是否发生变化
+
+    写入日志模式下只追加到本地日志就返回（不检查访问是否存在，authenticity_score 为空）
     """
+    behavior_data = await _parse_body(request, BehaviorUpdate)
+    _limit_visits(behavior_data.visit_id)
+
     # 获取当前请求的 IP
     current_ip = get_client_ip(request)
 
+    if ingest_journal.running:
+        ingest_journal.append([journal.behavior_record(current_ip, behavior_data)])
+        return ORJSONResponse({
+            "success": True,
+            "message": "行为数据已接收",
+            "visit_id": behavior_data.visit_id,
+            "authenticity_score": None,
+            "mouse_ack": journal.expected_mouse_ack(behavior_data)
+        })
+
     visit = await visit_crud.update_behavior(db, behavior_data, current_ip)
 
     if not visit:
         raise HTTPException(status_code=404, detail="访问记录不存在")
 
-    return {
+    after_behavior(visit, background_tasks)
+
+    return ORJSONResponse({
         "success": True,
         "message": "行为数据已更新",
         "visit_id": visit.visit_id,
-        "authenticity_score": visit.authenticity_score
-    }
+        "authenticity_score": visit.authenticity_score,
+        "mouse_ack": visit.mouse_seq_next or 0
+    })
+
+
+@router.post("/batch", summary="批量上报事件", dependencies=[Depends(rate_limit)])
+async def track_batch(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    批量上报多个事件（一个请求、一次校验、一个事务）
+
+    请求体为事件数组，按顺序处理，每个事件的 type 为：
+    - visit: 创建访问记录（data 与 POST /track/ 的请求体相同），可用 ref 给新访问命名
+    - behavior: 更新行为数据（字段与 POST /track/behavior 相同）
+    - custom: 自定义事件（name、properties、t）
+
+    behavior / custom 事件用 visit_id 指向已有访问，或用 visit_ref 指向同一批中的 visit 事件
+
+    返回与事件一一对应的 results：
+    - visit: visit_id、device_type、authenticity_score
+    - behavior: visit_id、authenticity_score、mouse_ack
+    - 访问记录不存在的事件 status 为 not_found，不影响同批其他事件
+
+    写入日志模式下整批追加到本地日志就返回，status 为 accepted
+    """
+    events = await _parse_body(request, batch_events_adapter)
+    _limit_visits(*(e.visit_id for e in events if e.type != "visit" and not e.visit_ref))
+
+    ip_address = get_client_ip(request)
+
+    if ingest_journal.running:
+        return _journal_batch(events, ip_address)
+
+    # 指向已有访问的自定义事件，一次查询确认访问存在
+    known_ids = await event_crud.existing_visit_ids(
+        db, (e.visit_id for e in events if e.type == "custom" and e.visit_id and not e.visit_ref)
+    )
+
+    refs = {}
+    created = {}
+    updated = {}
+    custom = []
+    results = []
+
+    for event in events:
+        if event.type == "visit":
+            visit = await visit_crud.create_visit(db, event.data, ip_address, commit=False)
+            if event.ref:
+                refs[event.ref] = visit
+            created[visit.id] = visit
+            results.append({"type": "visit", "status": "ok", "ref": event.ref, "visit_id": visit.visit_id})
+            continue
+
+        # 批内引用优先于 visit_id
+        if event.visit_ref:
+            target = refs.get(event.visit_ref)
+            visit_id = target.visit_id if target else None
+        else:
+            visit_id = event.visit_id
+
+        if event.type == "behavior":
+            visit = None
+            if visit_id:
+                behavior = BehaviorUpdate.model_construct(
+                    visit_id=visit_id,
+                    **{field: getattr(event, field) for field in BehaviorData.model_fields}
+                )
+                visit = await visit_crud.update_behavior(db, behavior, ip_address, commit=False)
+            if not visit:
+                results.append({"type": "behavior", "status": "not_found"})
+                continue
+            updated[visit.id] = visit
+            results.append({"type": "behavior", "status": "ok", "visit_id": visit.visit_id})
+        else:
+            if not visit_id or (not event.visit_ref and visit_id not in known_ids):
+                results.append({"type": "custom", "status": "not_found"})
+                continue
+            custom.append(event_crud.add_custom_event(db, visit_id, event.name, event.properties, event.t))
+            results.append({"type": "custom", "status": "ok", "visit_id": visit_id})
+
+    await db.commit()
+
+    # 重新加载数据库生成的字段（时间戳等），一次查询
+    touched = {**created, **updated}
+    if touched:
+        await db.execute(
+            select(Visit)
+            .where(Visit.id.in_(list(touched)))
+            .execution_options(populate_existing=True)
+        )
+
+    # 提交后再更新内存指标和推送，事务失败时不会产生副作用
+    for visit in created.values():
+        after_visit(visit, background_tasks)
+    for visit in updated.values():
+        after_behavior(visit, background_tasks)
+    for event in custom:
+        after_custom_event(event)
+
+    by_visit_id = {visit.visit_id: visit for visit in touched.values()}
+    for result in results:
+        visit = by_visit_id.get(result.get("visit_id"))
+        if visit is None or result["type"] == "custom":
+            continue
+        result["authenticity_score"] = visit.authenticity_score
+        if result["type"] == "visit":
+            result["device_type"] = visit.device_type
+        else:
+            result["mouse_ack"] = visit.mouse_seq_next or 0
+
+    return ORJSONResponse({
+        "success": True,
+        "results": results
+    })
+
+
+def _journal_batch(events: List, ip_address: str) -> ORJSONResponse:
+    """写入日志模式：整批记录一次追加，批内引用在接收时解析为预分配的 visit_id"""
+    refs = {}
+    records = []
+    results = []
+
+    for event in events:
+        if event.type == "visit":
+            visit_id = str(uuid.uuid4())
+            if event.ref:
+                refs[event.ref] = visit_id
+            records.append(journal.visit_record(visit_id, ip_address, event.data))
+            preview = preview_visit(event.data)
+            results.append({
+                "type": "visit",
+                "status": "accepted",
+                "ref": event.ref,
+                "visit_id": visit_id,
+                "authenticity_score": preview["authenticity_score"],
+                "device_type": preview["device_type"],
+            })
+            continue
+
+        visit_id = refs.get(event.visit_ref) if event.visit_ref else event.visit_id
+        if not visit_id:
+            results.append({"type": event.type, "status": "not_found"})
+            continue
+
+        if event.type == "behavior":
+            behavior = BehaviorUpdate.model_construct(
+                visit_id=visit_id,
+                **{field: getattr(event, field) for field in BehaviorData.model_fields}
+            )
+            records.append(journal.behavior_record(ip_address, behavior))
+            results.append({
+                "type": "behavior",
+                "status": "accepted",
+                "visit_id": visit_id,
+                "authenticity_score": None,
+                "mouse_ack": journal.expected_mouse_ack(behavior),
+            })
+        else:
+            records.append(journal.custom_record(visit_id, event.name, event.properties, event.t))
+            results.append({"type": "custom", "status": "accepted", "visit_id": visit_id})
+
+    if records:
+        ingest_journal.append(records)
+
+    return ORJSONResponse({
+        "success": True,
+        "results": results
+    })
 
 
 @router.get("/ping", summary="健康检查")
@@ -28,19 +28,82 @@ class Settings(BaseSettings):
     ADMIN_USERNAME: str = "admin"
     ADMIN_PASSWORD: str = "Admin@123"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 1440  # 24小时
+    TOKEN_CACHE_SIZE: int = 256  # 已验证令牌缓存的条目数（0 关闭缓存）
 
     # CORS 配置
     ALLOWED_ORIGINS: str = "*"
     ALLOWED_METHODS: str = "GET,POST,PUT,DELETE"
     ALLOWED_HEADERS: str = "*"
 
-    # 限流配置
-    RATE_LIMIT_PER_MINUTE: int = 100
+    # 限流配置（追踪接口，令牌桶）
+    RATE_LIMIT_ENABLED: bool = True  # 是否开启追踪接口限流
+    RATE_LIMIT_PER_MINUTE: int = 100  # 每个 IP 每分钟的请求数
+    RATE_LIMIT_BURST: int = 30  # 每个 IP 的突发请求上限
+    RATE_LIMIT_VISIT_PER_MINUTE: int = 30  # 每个 visit_id 每分钟的请求数（前端每 30 秒上报一次行为数据）
+    RATE_LIMIT_VISIT_BURST: int = 10  # 每个 visit_id 的突发请求上限
+    RATE_LIMIT_EXEMPT_IPS: str = ""  # 不限流的 IP（逗号分隔）
+    RATE_LIMIT_SHARED: bool = False  # 多进程部署时通过数据库共享每分钟计数
+    RATE_LIMIT_SYNC_SECONDS: float = 2.0  # 共享计数的同步间隔
+
+    # 响应压缩配置（br 需要安装 brotli，未安装时只使用 gzip）
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MIN_SIZE: int = 1024  # 小于该字节数的响应不压缩
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4  # 请求时压缩用较低的质量（预压缩静态文件在构建时使用最高质量）
+
+    # 运行指标（GET /metrics，Prometheus 文本格式）
+    METRICS_ENABLED: bool = True
 
     # 缓存配置
-    CACHE_TTL: int = 300
+    CACHE_TTL: int = 300  # 统计接口响应缓存的最长复用秒数（没有新数据时，0 关闭缓存）
+    RESPONSE_CACHE_SIZE: int = 256  # 统计接口响应缓存的条目数
+    UA_CACHE_SIZE: int = 1024  # User-Agent 解析结果缓存的条目数
     MAX_EXPORT_ROWS: int = 10000
 
+    # 实时推送配置
+    LIVE_QUEUE_SIZE: int = 100  # 每个管理后台连接的发送队列上限
+    LIVE_HEARTBEAT_SECONDS: int = 15  # 无事件时推送计数器的间隔
+
+    # 实时指标配置
+    ONLINE_WINDOW_SECONDS: int = 90  # 最后一次心跳在该时间内视为在线（前端每 30 秒发送一次）
+
+    # 去重统计配置（HyperLogLog）
+    HLL_PRECISION: int = 12  # 寄存器数 2^12，标准误差约 1.6%
+    HLL_FLUSH_SECONDS: int = 60  # 内存草图写入数据库的间隔
+
+    # 近似重复设备检测配置（MinHash LSH）
+    LSH_BANDS: int = 16  # 分段数
+    LSH_ROWS: int = 4  # 每段的签名值个数（签名长度 = 分段数 × 每段个数）
+
+    # 鼠标轨迹配置
+    TRAJECTORY_MAX_POINTS: int = 2000  # 每个访问最多保存的轨迹点数
+    TRAJECTORY_BATCH_SIZE: int = 200  # 待分析访问数达到该值时立即批量分析
+    TRAJECTORY_FLUSH_SECONDS: int = 10  # 待分析访问的最长等待时间
+
+    # 批量上报配置
+    TRACK_BATCH_MAX_EVENTS: int = 50  # 单次批量上报最多包含的事件数
+
+    # 写入日志配置（追踪数据先写入本地日志，由后台任务批量写入数据库）
+    INGEST_JOURNAL: bool = False  # 是否开启写入日志模式
+    JOURNAL_DIR: str = "./data/journal"  # 日志目录（加文件锁，只能由一个进程使用）
+    JOURNAL_SEGMENT_BYTES: int = 16 * 1024 * 1024  # 单个分段文件的大小上限
+    JOURNAL_FSYNC_SECONDS: float = 1.0  # fsync 间隔（崩溃时最多丢失这段时间内的记录）
+    JOURNAL_BATCH_SIZE: int = 500  # 每个事务写入的记录数
+    JOURNAL_LOAD_SECONDS: float = 1.0  # 没有新记录时的加载轮询间隔
+
+    # 数据库迁移配置（app/migrations，结构变更在启动时同步执行，回填和建索引在后台执行）
+    MIGRATE_ON_STARTUP: bool = True  # 是否在应用启动时执行迁移（关闭后用 scripts/migrate.py 执行）
+    MIGRATION_BATCH_SIZE: int = 1000  # 后台回填每个事务处理的记录数
+    MIGRATION_BATCH_PAUSE: float = 0.05  # 回填批次之间的暂停秒数（让出写锁给追踪写入）
+    MIGRATION_LOCK_SECONDS: int = 300  # 迁移锁超时未续期视为失效的秒数
+
+    # 启动预热配置（app/services/warmup.py，完成前 /ready 返回 503）
+    WARMUP_GEO_VISITS: int = 2000  # 用最近多少条访问记录填充 IP 地理位置缓存（0 为不填充）
+
+    # 批量清理配置（管理后台按条件删除访问记录）
+    PURGE_BATCH_SIZE: int = 1000  # 每个事务删除的记录数
+    PURGE_BATCH_PAUSE: float = 0.05  # 批次之间的暂停秒数（让出写锁给追踪写入）
+
     # 日志配置
     LOG_LEVEL: str = "INFO"
     LOG_FORMAT: str = "json"
@@ -52,6 +115,11 @@ class Settings(BaseSettings):
             return ["*"]
         return [origin.strip() for origin in self.ALLOWED_ORIGINS.split(",")]
 
+    @property
+    def rate_limit_exempt_ips_list(self) -> List[str]:
+        """解析不限流的 IP 列表"""
+        return [ip.strip() for ip in self.RATE_LIMIT_EXEMPT_IPS.split(",") if ip.strip()]
+
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -0,0 +1,197 @@
+"""
+响应压缩中间件
+按 Accept-Encoding 选择 br（安装了 brotli 时）或 gzip 压缩响应体
+
+- 小于 COMPRESSION_MIN_SIZE 字节的一次性响应不压缩
+- 只压缩文本类内容（JSON、CSV、HTML、JS、CSS 等）；Excel 等本身已压缩的格式、
+  实时推送（text/event-stream，需要逐条立即送达）和已带 Content-Encoding 的响应（预压缩静态文件）原样发送
+- 流式响应（CSV / JSON 导出）逐块压缩并立即刷新，不缓冲整个响应；一次性响应压缩后带准确的 Content-Length
+- 压缩后的 ETag 改为弱 ETag（同一资源不同编码的字节不同）
+"""
+import zlib
+from typing import List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # 可选依赖：未安装时只使用 gzip
+    brotli = None
+
+ENCODING_BR = "br"
+ENCODING_GZIP = "gzip"
+
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+)
+EXCLUDED_TYPES = ("text/event-stream",)
+
+
+def available_encodings() -> List[str]:
+    """当前环境支持的压缩编码（优先级从高到低）"""
+    return [ENCODING_BR, ENCODING_GZIP] if brotli is not None else [ENCODING_GZIP]
+
+
+def choose_encoding(accept_encoding: str, encodings: Optional[List[str]] = None) -> Optional[str]:
+    """
+    按 Accept-Encoding 选择压缩编码（q=0 表示不接受）
+
+    Returns:
+        str: 选中的编码，客户端都不接受时为 None
+    """
+    accepted = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+
+    for encoding in encodings or available_encodings():
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+def is_compressible(content_type: str) -> bool:
+    content_type = content_type.lower()
+    if content_type.startswith(EXCLUDED_TYPES):
+        return False
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class _Compressor:
+    """流式压缩器（gzip / br 统一接口）"""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        if encoding == ENCODING_BR:
+            self._br = brotli.Compressor(quality=brotli_quality)
+            self._gzip = None
+        else:
+            self._br = None
+            self._gzip = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, flush: bool) -> bytes:
+        """压缩一块数据；flush 为 True 时输出目前为止的全部数据（流式响应每块都刷新）"""
+        if self._br is not None:
+            out = self._br.process(data)
+            return out + self._br.flush() if flush else out
+        out = self._gzip.compress(data)
+        return out + self._gzip.flush(zlib.Z_SYNC_FLUSH) if flush else out
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self._br is not None:
+            return self._br.process(data) + self._br.finish()
+        return self._gzip.compress(data) + self._gzip.flush(zlib.Z_FINISH)
+
+
+class CompressionMiddleware:
+    """响应压缩（ASGI 中间件）"""
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(send, encoding, self)
+        await self.app(scope, receive, responder)
+
+
+class _CompressionResponder:
+    """拦截响应：收到第一块响应体后决定是否压缩"""
+
+    def __init__(self, send: Send, encoding: str, middleware: CompressionMiddleware):
+        self.send = send
+        self.encoding = encoding
+        self.middleware = middleware
+
+        self.start: Optional[Message] = None
+        self.compressor: Optional[_Compressor] = None
+        self.passthrough = False
+
+    async def __call__(self, message: Message):
+        if self.passthrough:
+            await self.send(message)
+            return
+
+        if message["type"] == "http.response.start":
+            self.start = message
+            headers = Headers(raw=message["headers"])
+            if (
+                message["status"] in (204, 304)
+                or "content-encoding" in headers
+                or not is_compressible(headers.get("content-type", ""))
+            ):
+                await self._pass(message)
+            return
+
+        if message["type"] != "http.response.body":
+            # 其他扩展消息（如 pathsend）无法压缩，原样发送
+            await self._pass(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None:
+            if not more_body:
+                # 一次性响应：压缩完成后带上准确的 Content-Length
+                if len(body) < self.middleware.minimum_size:
+                    await self._pass(message)
+                    return
+                compressed = self._compressor().finish(body)
+                await self._send_start(content_length=len(compressed))
+                await self.send({"type": "http.response.body", "body": compressed, "more_body": False})
+                return
+            # 流式响应：长度未知，改为分块传输
+            self.compressor = self._compressor()
+            await self._send_start(content_length=None)
+
+        if more_body:
+            chunk = self.compressor.compress(body, flush=True)
+        else:
+            chunk = self.compressor.finish(body)
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+    def _compressor(self) -> _Compressor:
+        return _Compressor(self.encoding, self.middleware.gzip_level, self.middleware.brotli_quality)
+
+    async def _pass(self, message: Message):
+        self.passthrough = True
+        if self.start is not None and message is not self.start:
+            await self.send(self.start)
+        await self.send(message)
+
+    async def _send_start(self, content_length: Optional[int]):
+        headers = MutableHeaders(raw=self.start["headers"])
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = "W/" + etag
+        if content_length is not None:
+            headers["Content-Length"] = str(content_length)
+        elif "content-length" in headers:
+            del headers["content-length"]
+
+        await self.send(self.start)
@@ -5,6 +5,7 @@
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import declarative_base
 from app.config import settings
+from app.core.metrics import instrument_engine
 
 # 创建异步引擎
 # SQLite 不支持连接池参数，需要根据数据库类型配置
@@ -24,6 +25,10 @@ else:
         max_overflow=10,
     )
 
+# 数据库语句耗时指标（/metrics）
+if settings.METRICS_ENABLED:
+    instrument_engine(engine.sync_engine)
+
 # 创建异步会话工厂
 async_session_maker = async_sessionmaker(
     engine,
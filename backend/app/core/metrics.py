@@ -0,0 +1,323 @@
+"""
+运行指标（Prometheus 文本格式，GET /metrics）
+
+- 计数器 / 直方图只在内存中累加：更新都发生在事件循环线程内（请求中间件、数据库事件、
+  地理位置查询），只做整数加法和列表下标运算，不加锁；个别在线程池中执行的更新（启动预热）
+  与事件循环同时写入时最多少计一次，不影响趋势
+- 带标签的指标按标签值缓存子指标，热路径上只有一次字典查找
+- 队列深度、缓存命中率等状态值不在热路径上维护，抓取时由各模块的 stats() 读取
+  （app/services/metrics.py）
+"""
+import re
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# 默认的耗时分桶（秒）
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0, 5.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+
+class _GaugeChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value: float):
+        self.value = value
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # 最后一个为 +Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class _Metric:
+    """指标族（同名、不同标签值的一组子指标）"""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    def clear(self):
+        self._children.clear()
+        if not self.labelnames:
+            self._default = self.labels()
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        self._default.value += amount
+
+    def total(self) -> float:
+        """全部标签值的合计"""
+        return sum(child.value for child in list(self._children.values()))
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default.value = value
+
+    def inc(self, amount: float = 1):
+        self._default.value += amount
+
+    def dec(self, amount: float = 1):
+        self._default.value -= amount
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+    def samples(self):
+        for values, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), list(child.counts)):
+                cumulative += count
+                le = f'le="{_format_value(float(bound))}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}"
+            labels = _format_labels(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {_format_value(child.sum)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class MetricsRegistry:
+    """已注册的指标（按注册顺序输出）"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"指标重复注册: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# 全局指标注册表
+registry = MetricsRegistry()
+
+# ---------- 热路径上更新的指标 ----------
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP 请求耗时（到响应发送完成）", ("method", "route", "status"),
+)
+http_requests_in_progress = registry.gauge("http_requests_in_progress", "正在处理的 HTTP 请求数")
+
+db_query_duration = registry.histogram(
+    "db_query_duration_seconds", "数据库语句耗时（按语句类型和表命名）", ("query",), buckets=DB_BUCKETS,
+)
+
+geolocation_lookups = registry.counter(
+    "geolocation_lookups_total", "IP 地理位置查询（local / hit / miss）", ("result",),
+)
+geolocation_upstream_duration = registry.histogram(
+    "geolocation_upstream_duration_seconds", "地理位置外部接口请求耗时",
+)
+geolocation_upstream_errors = registry.counter(
+    "geolocation_upstream_errors_total", "地理位置外部接口错误（http / api / exception）", ("kind",),
+)
+
+export_rows = registry.counter("export_rows_total", "导出的访问记录行数", ("format",))
+export_duration = registry.histogram(
+    "export_duration_seconds", "导出文件生成耗时（查询 + 序列化）", ("format",),
+)
+
+# ---------- 请求耗时中间件 ----------
+
+# 未匹配任何路由的请求（404 扫描等）合并为一个标签值，避免标签数量无限增长
+ROUTE_UNMATCHED = "unmatched"
+
+
+def route_label(scope: Scope) -> str:
+    """路由模板（/api/v1/admin/visits/{visit_id}）；静态文件按挂载路径"""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    # 挂载的子应用（静态文件）匹配后 root_path 为挂载路径
+    return scope.get("root_path") or ROUTE_UNMATCHED
+
+
+class MetricsMiddleware:
+    """按路由记录 HTTP 请求耗时（ASGI 中间件）"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        http_requests_in_progress.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_progress.dec()
+            http_request_duration.labels(scope["method"], route_label(scope), str(status)).observe(
+                time.perf_counter() - started
+            )
+
+
+# ---------- 数据库语句耗时 ----------
+
+_STATEMENT_TABLE = re.compile(
+    r"^\s*(?:(?P<update>UPDATE)\s+|(?P<verb>\w+)\b.*?\b(?:FROM|INTO|TABLE)\s+)\"?(?P<table>\w+)",
+    re.IGNORECASE | re.DOTALL,
+)
+_QUERY_NAME_CACHE_SIZE = 2048
+_query_names: Dict[str, str] = {}
+
+
+def query_name(statement: str) -> str:
+    """语句名称：类型 + 第一个表（select visits、insert visit_payloads），按语句文本缓存"""
+    name = _query_names.get(statement)
+    if name is None:
+        match = _STATEMENT_TABLE.match(statement)
+        if match:
+            verb = match.group("update") or match.group("verb")
+            name = f"{verb.lower()} {match.group('table').lower()}"
+        else:
+            name = statement.split(None, 1)[0].lower() if statement.strip() else "other"
+        # IN 列表长度不同的语句文本各不相同，缓存满后不再加入
+        if len(_query_names) < _QUERY_NAME_CACHE_SIZE:
+            _query_names[statement] = name
+    return name
+
+
+def instrument_engine(engine: Engine):
+    """在引擎上注册语句耗时事件（异步引擎传入 engine.sync_engine）"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        db_query_duration.labels(query_name(statement)).observe(time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
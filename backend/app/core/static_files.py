@@ -0,0 +1,86 @@
+"""
+静态文件服务
+配合 scripts/build_static.py 的构建结果（frontend/dist）：
+
+- 文件名带内容哈希的资源（manifest.json 中列出）内容永不变化，返回一年的 immutable 缓存头；
+  页面和不带哈希的资源（外部页面可能直接引用 /static/js/tracker/tracker.js）返回 no-cache，
+  浏览器每次用 ETag / Last-Modified 确认，未变化时收到 304
+- 构建时生成的 .br / .gz 预压缩文件按 Accept-Encoding 直接发送，不在请求时压缩
+"""
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional, Set
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+from app.core.compression import ENCODING_BR, ENCODING_GZIP, choose_encoding
+
+MANIFEST_NAME = "manifest.json"
+
+# 预压缩文件的扩展名
+PRECOMPRESSED = {ENCODING_BR: ".br", ENCODING_GZIP: ".gz"}
+
+CACHE_IMMUTABLE = "public, max-age=31536000, immutable"
+CACHE_REVALIDATE = "no-cache"
+
+
+def load_manifest(dist_dir: Path) -> Optional[Dict[str, str]]:
+    """读取构建清单（原路径 -> 带哈希的路径，均相对于 static 目录），未构建时返回 None"""
+    path = dist_dir / MANIFEST_NAME
+    if not path.is_file():
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class AssetStaticFiles(StaticFiles):
+    """
+    静态文件（缓存头 + 预压缩）
+
+    Args:
+        immutable: 带哈希的文件（相对于 directory 的路径），返回 immutable 缓存头
+    """
+
+    def __init__(self, *args, immutable: Optional[Set[str]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.immutable = immutable or set()
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        response = await super().get_response(path, scope)
+        if response.status_code not in (200, 304):
+            return response
+
+        relative = os.path.normpath(path).replace(os.sep, "/")
+        cache_control = CACHE_IMMUTABLE if relative in self.immutable else CACHE_REVALIDATE
+
+        if isinstance(response, FileResponse) and response.status_code == 200:
+            response = self._precompressed(response, scope)
+        response.headers["Cache-Control"] = cache_control
+        return response
+
+    def _precompressed(self, response: FileResponse, scope: Scope) -> Response:
+        """有对应的预压缩文件且客户端接受时改为发送预压缩文件"""
+        variants = [e for e, ext in PRECOMPRESSED.items() if os.path.isfile(str(response.path) + ext)]
+        if not variants:
+            return response
+
+        request_headers = Headers(scope=scope)
+        encoding = choose_encoding(request_headers.get("accept-encoding", ""), variants)
+        if encoding is None:
+            response.headers["Vary"] = "Accept-Encoding"
+            return response
+
+        compressed_path = str(response.path) + PRECOMPRESSED[encoding]
+        compressed = FileResponse(
+            compressed_path,
+            stat_result=os.stat(compressed_path),
+            media_type=response.media_type,
+            headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"},
+        )
+        if self.is_not_modified(compressed.headers, request_headers):
+            return NotModifiedResponse(compressed.headers)
+        return compressed
@@ -0,0 +1,240 @@
+"""
+设备身份 CRUD 操作
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, delete, insert, distinct
+from sqlalchemy.orm import aliased
+from sqlalchemy.dialects import sqlite, postgresql
+from app.models.device import Device, DeviceIP, DeviceSignature, DeviceLSHBucket
+from app.models.visit import Visit
+from app.services.similarity import index_device
+from typing import Optional, List
+
+
+def _insert(db: AsyncSession, table):
+    """按数据库类型返回支持 ON CONFLICT 的 insert 构造"""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
+async def upsert_device(db: AsyncSession, device_id: str, ip_address: str) -> bool:
+    """
+    记录一次设备访问（不提交事务，随访问记录一起提交）
+
+    首次出现时创建设备记录；之后更新最近访问时间、访问次数，
+    遇到新 IP 时增加不同 IP 计数
+
+    Args:
+        db: 数据库会话
+        device_id: 设备标识
+        ip_address: 本次访问的 IP 地址
+
+    Returns:
+        bool: 是否为首次出现的设备
+    """
+    # 先确保设备记录存在（外键依赖）
+    device_stmt = _insert(db, Device).values(
+        device_id=device_id,
+        visit_count=1,
+        distinct_ip_count=0,
+        last_ip=ip_address,
+    )
+    device_stmt = device_stmt.on_conflict_do_update(
+        index_elements=[Device.device_id],
+        set_={
+            "visit_count": Device.visit_count + 1,
+            "last_seen": func.now(),
+            "last_ip": ip_address,
+        }
+    ).returning(Device.visit_count)
+    result = await db.execute(device_stmt)
+    is_new = result.scalar_one() == 1
+
+    # 新 IP 才会插入成功
+    ip_stmt = _insert(db, DeviceIP).values(
+        device_id=device_id,
+        ip_address=ip_address,
+    ).on_conflict_do_nothing()
+    result = await db.execute(ip_stmt)
+
+    if result.rowcount == 1:
+        await db.execute(
+            Device.__table__.update()
+            .where(Device.device_id == device_id)
+            .values(distinct_ip_count=Device.distinct_ip_count + 1)
+        )
+
+    return is_new
+
+
+async def get_device(db: AsyncSession, device_id: str) -> Optional[Device]:
+    """
+    根据设备标识获取设备记录
+
+    Args:
+        db: 数据库会话
+        device_id: 设备标识
+
+    Returns:
+        Optional[Device]: 设备记录，如果未找到则返回 None
+    """
+    stmt = select(Device).where(Device.device_id == device_id)
+    result = await db.execute(stmt)
+    return result.scalar_one_or_none()
+
+
+async def get_repeat_devices(
+    db: AsyncSession,
+    min_visits: int = 2,
+    min_ips: int = 1,
+    order_by: str = "visit_count",
+    limit: int = 50,
+    offset: int = 0
+) -> List[Device]:
+    """
+    获取重复访问的设备列表
+
+    Args:
+        db: 数据库会话
+        min_visits: 最少访问次数
+        min_ips: 最少不同 IP 数
+        order_by: 排序字段（visit_count / distinct_ip_count / last_seen）
+        limit: 返回数量限制
+        offset: 偏移量
+
+    Returns:
+        List[Device]: 设备列表
+    """
+    order_column = {
+        "visit_count": Device.visit_count,
+        "distinct_ip_count": Device.distinct_ip_count,
+        "last_seen": Device.last_seen,
+    }.get(order_by, Device.visit_count)
+
+    stmt = select(Device).where(
+        Device.visit_count >= min_visits,
+        Device.distinct_ip_count >= min_ips
+    ).order_by(order_column.desc()).limit(limit).offset(offset)
+
+    result = await db.execute(stmt)
+    return result.scalars().all()
+
+
+async def get_device_ids_after(db: AsyncSession, after: Optional[str], limit: int) -> List[str]:
+    """
+    按主键顺序分页读取设备标识
+
+    Args:
+        db: 数据库会话
+        after: 上一页最后的设备标识
+        limit: 每页数量
+
+    Returns:
+        List[str]: 设备标识
+    """
+    stmt = select(Device.device_id).order_by(Device.device_id).limit(limit)
+    if after is not None:
+        stmt = stmt.where(Device.device_id > after)
+    result = await db.execute(stmt)
+    return result.scalars().all()
+
+
+async def rebuild_devices(db: AsyncSession, device_ids: List[str], reindex: bool = False) -> int:
+    """
+    由 visits 重新汇总指定设备（删除访问记录后调用，不提交事务）
+
+    访问次数、不同 IP 数、首次 / 最近访问和 device_ips 按剩余访问重新计算；
+    没有剩余访问的设备连同签名和 LSH 分段桶一起删除
+
+    Args:
+        db: 数据库会话
+        device_ids: 设备标识
+        reindex: 是否为没有签名的设备重新写入签名和 LSH 分段桶（设备表清空后重建时）
+
+    Returns:
+        int: 删除的设备数
+    """
+    if not device_ids:
+        return 0
+
+    latest = aliased(Visit)
+    last_ip = (
+        select(latest.ip_address)
+        .where(latest.device_id == Visit.device_id)
+        .order_by(latest.timestamp.desc())
+        .limit(1)
+        .correlate(Visit)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        select(
+            Visit.device_id,
+            func.min(Visit.timestamp),
+            func.max(Visit.timestamp),
+            func.count(),
+            func.count(distinct(Visit.ip_address)),
+            last_ip,
+        )
+        .where(Visit.device_id.in_(device_ids))
+        .group_by(Visit.device_id)
+    )
+    remaining = {
+        device_id: {
+            "device_id": device_id,
+            "first_seen": first_seen,
+            "last_seen": last_seen,
+            "visit_count": visit_count,
+            "distinct_ip_count": distinct_ip_count,
+            "last_ip": ip_address,
+        }
+        for device_id, first_seen, last_seen, visit_count, distinct_ip_count, ip_address in result
+    }
+
+    gone = [device_id for device_id in device_ids if device_id not in remaining]
+    if gone:
+        for model in (DeviceLSHBucket, DeviceSignature, DeviceIP, Device):
+            await db.execute(delete(model).where(model.device_id.in_(gone)))
+
+    if not remaining:
+        return len(gone)
+
+    stmt = _insert(db, Device).values(list(remaining.values()))
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[Device.device_id],
+        set_={
+            "first_seen": stmt.excluded.first_seen,
+            "last_seen": stmt.excluded.last_seen,
+            "visit_count": stmt.excluded.visit_count,
+            "distinct_ip_count": stmt.excluded.distinct_ip_count,
+            "last_ip": stmt.excluded.last_ip,
+        }
+    ))
+
+    ids = list(remaining)
+    await db.execute(delete(DeviceIP).where(DeviceIP.device_id.in_(ids)))
+    await db.execute(insert(DeviceIP).from_select(
+        ["device_id", "ip_address", "first_seen"],
+        select(Visit.device_id, Visit.ip_address, func.min(Visit.timestamp))
+        .where(Visit.device_id.in_(ids), Visit.ip_address.isnot(None))
+        .group_by(Visit.device_id, Visit.ip_address)
+    ))
+
+    if reindex:
+        result = await db.execute(select(DeviceSignature.device_id).where(DeviceSignature.device_id.in_(ids)))
+        indexed = set(result.scalars().all())
+        for device_id in ids:
+            if device_id in indexed:
+                continue
+            first = await db.execute(
+                select(Visit).where(Visit.device_id == device_id).order_by(Visit.timestamp).limit(1)
+            )
+            await index_device(db, device_id, first.scalar_one())
+
+    return len(gone)
+
+
+async def clear_devices(db: AsyncSession):
+    """删除全部设备汇总、签名和 LSH 分段桶（清空访问记录后调用，不提交事务）"""
+    for model in (DeviceLSHBucket, DeviceSignature, DeviceIP, Device):
+        await db.execute(delete(model))
@@ -0,0 +1,100 @@
+"""
+自定义事件 CRUD 操作
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from app.models.event import CustomEvent
+from app.models.visit import Visit
+from typing import Optional, Dict, Any, List, Iterable, Set
+import json
+
+
+async def existing_visit_ids(db: AsyncSession, visit_ids: Iterable[str]) -> Set[str]:
+    """
+    查询哪些 visit_id 存在（一次查询）
+
+    Args:
+        db: 数据库会话
+        visit_ids: 待检查的访问记录 ID
+
+    Returns:
+        Set[str]: 存在的访问记录 ID
+    """
+    visit_ids = set(visit_ids)
+    if not visit_ids:
+        return set()
+    result = await db.execute(select(Visit.visit_id).where(Visit.visit_id.in_(visit_ids)))
+    return set(result.scalars().all())
+
+
+async def existing_event_ids(db: AsyncSession, event_ids: Iterable[str]) -> Set[str]:
+    """
+    查询哪些自定义事件 ID 已写入（一次查询）
+
+    Args:
+        db: 数据库会话
+        event_ids: 待检查的事件 ID
+
+    Returns:
+        Set[str]: 已存在的事件 ID
+    """
+    event_ids = {event_id for event_id in event_ids if event_id}
+    if not event_ids:
+        return set()
+    result = await db.execute(select(CustomEvent.event_id).where(CustomEvent.event_id.in_(event_ids)))
+    return set(result.scalars().all())
+
+
+def add_custom_event(
+    db: AsyncSession,
+    visit_id: str,
+    name: str,
+    properties: Optional[Dict[str, Any]] = None,
+    page_time: Optional[int] = None,
+    event_id: Optional[str] = None
+) -> CustomEvent:
+    """
+    记录一个自定义事件（不提交事务，由调用方统一提交）
+
+    Args:
+        db: 数据库会话
+        visit_id: 所属访问记录 ID
+        name: 事件名称
+        properties: 事件属性
+        page_time: 事件发生时间（相对页面加载的毫秒数）
+        event_id: 事件 ID（写入日志的记录）
+
+    Returns:
+        CustomEvent: 事件记录
+    """
+    event = CustomEvent(
+        event_id=event_id,
+        visit_id=visit_id,
+        name=name,
+        properties=json.dumps(properties, ensure_ascii=False) if properties else None,
+        page_time=page_time
+    )
+    db.add(event)
+    return event
+
+
+async def get_visit_events(db: AsyncSession, visit_id: str, limit: int = 200) -> List[CustomEvent]:
+    """
+    获取访问记录的自定义事件（按发生顺序）
+
+    Args:
+        db: 数据库会话
+        visit_id: 访问记录 ID
+        limit: 返回数量限制
+
+    Returns:
+        List[CustomEvent]: 事件列表
+    """
+    stmt = (
+        select(CustomEvent)
+        .where(CustomEvent.visit_id == visit_id)
+        .order_by(CustomEvent.id)
+        .limit(limit)
+    )
+    result = await db.execute(stmt)
+    return result.scalars().all()
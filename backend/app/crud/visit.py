@@ -2,13 +2,23 @@
 访问记录 CRUD 操作
 """
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
-from app.models.visit import Visit
+from sqlalchemy import select, func, update, delete
+from sqlalchemy.orm.attributes import set_committed_value
+from app.models.visit import Visit, VisitPayload
+from app.models.event import CustomEvent
 from app.schemas.visit import VisitCreate, BehaviorUpdate
-from app.utils.hash import generate_fingerprint_hash, calculate_fingerprint_quality
+from app.utils.hash import generate_fingerprint_hash, generate_device_id
 from app.utils.ua import parse_user_agent
 from app.utils.geolocation import get_ip_geolocation
-from typing import Optional, List
+from app.utils.referrer import classify_referrer
+from app.utils.trajectory import encode_points, load_points, parse_json_points, parse_packed, TrajectoryError
+from app.config import settings
+from app.crud.device import upsert_device
+from app.services.similarity import index_device
+from app.services.scoring import scoring_engine
+from app.services.response_cache import bump_data_version
+from typing import Optional, List, Tuple
+from datetime import datetime
 import uuid
 import json
 
@@ -16,7 +26,10 @@ import json
 async def create_visit(
     db: AsyncSession,
     visit_data: VisitCreate,
-    ip_address: str
+    ip_address: str,
+    commit: bool = True,
+    visit_id: Optional[str] = None,
+    timestamp: Optional[datetime] = None
 ) -> Visit:
     """
     创建访问记录
@@ -25,6 +38,9 @@ async def create_visit(
         db: 数据库会话
         visit_data: 访问数据
         ip_address: 客户端 IP 地址
+        commit: 是否提交事务；批量上报时为 False，只写入会话由调用方统一提交
+        visit_id: 预先分配的访问 ID（写入日志模式下接收时已返回给客户端），默认新生成
+        timestamp: 访问时间（写入日志模式下为接收时间），默认由数据库生成
 
     Returns:
         Visit: 创建的访问记录
@@ -38,6 +54,9 @@ async def create_visit(
     # Temporary logging for debugging geolocation
     print(f"DEBUG: Received IP: {ip_address}, Geolocation Result: {geo_data}")
 
+    # 解析来源域名和渠道
+    referrer_domain, referrer_channel = classify_referrer(visit_data.referrer)
+
     # 生成指纹哈希
     fingerprint_hash = generate_fingerprint_hash(
         visit_data.canvas_fingerprint,
@@ -48,18 +67,8 @@ async def create_visit(
         ip_address
     )
 
-    # 计算指纹质量
-    fingerprint_quality = calculate_fingerprint_quality(
-        canvas=visit_data.canvas_fingerprint,
-        webgl=visit_data.webgl_fingerprint,
-        fonts=visit_data.fonts_hash,
-        screen=visit_data.screen_resolution,
-        timezone=visit_data.timezone,
-        language=visit_data.language
-    )
-
-    # 简单的真实性评分（基于指纹质量）
-    authenticity_score = float(fingerprint_quality)
+    # 生成与 IP 无关的设备标识
+    device_id = generate_device_id(visit_data)
 
     # 提取浏览器地理位置信息（如果用户授权）
     browser_latitude = None
@@ -89,19 +98,17 @@ async def create_visit(
         tcp_time = visit_data.performance_metrics.get('tcp_time')
         ttfb = visit_data.performance_metrics.get('ttfb')
 
-    # 如果检测到 headless 浏览器，调低真实性评分
-    if visit_data.is_headless:
-        authenticity_score = max(0, authenticity_score - 30)
-
     # 创建访问记录
     visit = Visit(
-        visit_id=str(uuid.uuid4()),
+        visit_id=visit_id or str(uuid.uuid4()),
         ip_address=ip_address,
         # IP 地理位置信息
         ip_country=geo_data.get('country_code') if geo_data else None,
         ip_city=geo_data.get('city') if geo_data else None,
         user_agent=visit_data.user_agent,
         referrer=visit_data.referrer,
+        referrer_domain=referrer_domain,
+        referrer_channel=referrer_channel,
         page_url=visit_data.page_url,
         # 设备信息（从 UA 解析）
         device_type=ua_info["device_type"],
@@ -173,22 +180,147 @@ async def create_visit(
         browser_altitude_accuracy=browser_altitude_accuracy,
         # 分析字段
         fingerprint_hash=fingerprint_hash,
-        authenticity_score=authenticity_score,
-        # 元数据
-        raw_data=json.dumps(visit_data.extra_data) if visit_data.extra_data else None
+        device_id=device_id,
     )
 
+    # 未指定时使用数据库默认值（显式赋 None 会写入 NULL）
+    if timestamp is not None:
+        visit.timestamp = timestamp
+
+    # 真实性评分（基于全部采集信号）
+    visit.authenticity_score = scoring_engine.score(visit)
+
     db.add(visit)
+
+    # 更新设备身份（与访问记录同一事务）
+    if device_id:
+        is_new_device = await upsert_device(db, device_id, ip_address)
+
+        # 新设备写入近似重复检测索引
+        if is_new_device:
+            await index_device(db, device_id, visit)
+
+    # 原始数据备份存放在 visit_payloads 表（需要先写入访问记录得到主键）
+    if visit_data.extra_data:
+        await db.flush()
+        db.add(VisitPayload(visit_pk=visit.id, raw_data=json.dumps(visit_data.extra_data)))
+
+    if not commit:
+        await db.flush()
+        return visit
+
     await db.commit()
     await db.refresh(visit)
 
     return visit
 
 
+# 增量轨迹并发写入冲突时的最大重试次数
+_APPEND_RETRIES = 3
+
+
+async def get_payload(db: AsyncSession, visit_pk: int, refresh: bool = False) -> Optional[VisitPayload]:
+    """
+    读取访问记录的大字段（鼠标轨迹、原始数据）
+
+    Args:
+        db: 数据库会话
+        visit_pk: 访问记录主键
+        refresh: 忽略会话中已加载的对象，重新从数据库读取
+    """
+    return await db.get(VisitPayload, visit_pk, populate_existing=refresh)
+
+
+def store_trajectory(db: AsyncSession, visit: Visit, payload: Optional[VisitPayload], points: List):
+    """
+    写入鼠标轨迹到 visit_payloads（覆盖已有轨迹，不提交事务）
+
+    Args:
+        db: 数据库会话
+        visit: 访问记录
+        payload: 已读取的大字段记录，没有时新建
+        points: 完整轨迹
+    """
+    if payload is None:
+        payload = VisitPayload(visit_pk=visit.id)
+        db.add(payload)
+    payload.mouse_trajectory = encode_points(points) if points else None
+    payload.mouse_movements = None
+    return payload
+
+
+def parse_mouse_points(behavior_data: BehaviorUpdate) -> Optional[List]:
+    """解析上报的鼠标轨迹（紧凑格式优先，兼容旧的 JSON 格式），没有上报或格式错误时返回 None"""
+    try:
+        if behavior_data.mouse_packed is not None:
+            return parse_packed(behavior_data.mouse_packed)
+        if behavior_data.mouse_movements is not None:
+            return parse_json_points(behavior_data.mouse_movements)
+    except TrajectoryError as e:
+        print(f"[WARN] 鼠标轨迹格式错误: visit_id={behavior_data.visit_id}, {str(e)}")
+    return None
+
+
+async def append_trajectory(db: AsyncSession, visit: Visit, seq: int, points: List):
+    """
+    追加增量上报的鼠标轨迹（不提交事务）
+
+    mouse_seq_next 记录已接收的采样数，客户端每次从上次确认的位置开始上报：
+    - 已全部接收过的批次（重复或乱序到达的旧批次）直接忽略
+    - 与已接收部分重叠的批次只追加未接收的部分
+    - 序号超过已接收数（客户端缓冲溢出丢弃了部分采样）时接受空缺直接追加；
+      空缺最多按 TRAJECTORY_MAX_POINTS 计，伪造的大序号不会使 mouse_seq_next 超出整数列范围
+
+    写入时以 mouse_seq_next 作为条件，同一访问的并发上报不会重复追加；
+    轨迹达到 TRAJECTORY_MAX_POINTS 后不再追加，但序号照常确认。
+    条件更新成功后才写入 visit_payloads 中的轨迹，两者在同一事务内提交
+
+    Args:
+        db: 数据库会话
+        visit: 访问记录
+        seq: 本批第一个采样的序号
+        points: 本批采样
+    """
+    payload = await get_payload(db, visit.id)
+    for _ in range(_APPEND_RETRIES):
+        received = visit.mouse_seq_next or 0
+        if seq + len(points) <= received:
+            return
+        seq = min(seq, received + settings.TRAJECTORY_MAX_POINTS)
+        end = seq + len(points)
+
+        stored = load_points(payload.mouse_trajectory, payload.mouse_movements) if payload else []
+        room = max(settings.TRAJECTORY_MAX_POINTS - len(stored), 0)
+        merged = stored + points[max(received - seq, 0):][:room]
+
+        result = await db.execute(
+            update(Visit).where(
+                Visit.id == visit.id,
+                func.coalesce(Visit.mouse_seq_next, 0) == received
+            ).values(
+                mouse_seq_next=end,
+                mouse_analyzed_at=None
+            ).execution_options(synchronize_session=False)
+        )
+
+        if result.rowcount == 1:
+            set_committed_value(visit, "mouse_seq_next", end)
+            set_committed_value(visit, "mouse_analyzed_at", None)
+            store_trajectory(db, visit, payload, merged)
+            return
+
+        # 其他请求已先写入，重新读取后重试
+        await db.refresh(visit, attribute_names=["mouse_seq_next"])
+        payload = await get_payload(db, visit.id, refresh=True)
+
+    print(f"[WARN] 鼠标轨迹追加冲突重试失败: visit_id={visit.visit_id}, seq={seq}")
+
+
 async def update_behavior(
     db: AsyncSession,
     behavior_data: BehaviorUpdate,
-    current_ip: str = None
+    current_ip: str = None,
+    commit: bool = True
 ) -> Optional[Visit]:
     """
     更新访问记录的行为数据
@@ -197,6 +329,7 @@ async def update_behavior(
         db: 数据库会话
         behavior_data: 行为数据
         current_ip: 当前请求的 IP 地址（用于检测 IP 变化）
+        commit: 是否提交事务；批量上报时为 False，只写入会话由调用方统一提交
 
     Returns:
         Optional[Visit]: 更新后的访问记录，如果未找到则返回 None
@@ -209,6 +342,11 @@ async def update_behavior(
     if not visit:
         return None
 
+    # 增量上报的鼠标轨迹（条件更新，先于其他字段修改执行）
+    points = parse_mouse_points(behavior_data)
+    if points is not None and behavior_data.mouse_seq is not None:
+        await append_trajectory(db, visit, behavior_data.mouse_seq, points)
+
     # 检测 IP 变化
     if current_ip:
         # 获取原始 IP（初次访问时的 IP）
@@ -233,18 +371,21 @@ async def update_behavior(
     if behavior_data.scroll_depth is not None:
         visit.scroll_depth = behavior_data.scroll_depth
 
-    if behavior_data.mouse_movements is not None:
-        visit.mouse_movements = behavior_data.mouse_movements
+    # 旧协议：每次上报完整轨迹，直接覆盖
+    if points is not None and behavior_data.mouse_seq is None:
+        payload = await get_payload(db, visit.id)
+        store_trajectory(db, visit, payload, points[-settings.TRAJECTORY_MAX_POINTS:])
+        # 已接收的采样数，后台分析队列据此判断是否有轨迹
+        visit.mouse_seq_next = len(points)
+        # 轨迹特征等待后台重新分析
+        visit.mouse_analyzed_at = None
 
-    # 根据行为数据更新真实性评分
-    # 基础评分（指纹质量）+ 行为评分
-    behavior_score = 0
-    if visit.stay_duration > 3:  # 停留超过 3 秒
-        behavior_score += 10
-    if visit.scroll_depth > 10:  # 滚动超过 10%
-        behavior_score += 10
+    # 根据最新数据重新计算真实性评分（完整重算，多次心跳不会累加）
+    visit.authenticity_score = scoring_engine.score(visit)
 
-    visit.authenticity_score = min(100.0, visit.authenticity_score + behavior_score)
+    if not commit:
+        await db.flush()
+        return visit
 
     await db.commit()
     await db.refresh(visit)
@@ -289,6 +430,28 @@ async def get_recent_visits(
     return result.scalars().all()
 
 
+async def recent_ip_locations(db: AsyncSession, since: datetime, limit: int) -> List[Tuple]:
+    """
+    最近的 IP 地理位置（启动预热时填充地理位置缓存）
+
+    Args:
+        db: 数据库会话
+        since: 起始时间（UTC）
+        limit: 返回数量限制
+
+    Returns:
+        List[Tuple]: (ip_address, ip_country, ip_city, timestamp)，按时间倒序
+    """
+    stmt = (
+        select(Visit.ip_address, Visit.ip_country, Visit.ip_city, Visit.timestamp)
+        .where(Visit.timestamp >= since, Visit.ip_country.is_not(None))
+        .order_by(Visit.timestamp.desc())
+        .limit(limit)
+    )
+    result = await db.execute(stmt)
+    return result.all()
+
+
 async def get_total_visits(db: AsyncSession) -> int:
     """
     获取总访问量
@@ -302,3 +465,93 @@ async def get_total_visits(db: AsyncSession) -> int:
     stmt = select(func.count(Visit.id))
     result = await db.execute(stmt)
     return result.scalar_one()
+
+
+async def _delete_rows(db: AsyncSession, rows):
+    """删除访问记录及其大字段和自定义事件（不提交事务）"""
+    pks = [row.id for row in rows]
+    await db.execute(delete(VisitPayload).where(VisitPayload.visit_pk.in_(pks)))
+    await db.execute(delete(CustomEvent).where(CustomEvent.visit_id.in_([row.visit_id for row in rows])))
+    await db.execute(delete(Visit).where(Visit.id.in_(pks)))
+
+
+async def delete_visit(db: AsyncSession, visit_id: str) -> bool:
+    """
+    删除单个访问记录（只查询主键，不加载整行）
+
+    Args:
+        db: 数据库会话
+        visit_id: 访问记录 ID
+
+    Returns:
+        bool: 是否找到并删除
+    """
+    result = await db.execute(select(Visit.id, Visit.visit_id).where(Visit.visit_id == visit_id))
+    rows = result.all()
+    if not rows:
+        return False
+
+    await _delete_rows(db, rows)
+    await db.commit()
+    bump_data_version()
+    return True
+
+
+async def purge_visits_batch(
+    db: AsyncSession,
+    conditions: List,
+    limit: int,
+    after_id: Optional[int] = None
+) -> Tuple[int, Optional[int]]:
+    """
+    按条件删除一批访问记录并提交（批量清理任务调用）
+
+    Args:
+        db: 数据库会话
+        conditions: 筛选条件
+        limit: 每批最多删除的记录数
+        after_id: 按主键顺序删除时上一批最后的主键；为 None 时不排序
+            （有时间范围时由时间索引定位，已删除的记录不会再被读到）
+
+    Returns:
+        Tuple[List, Optional[int]]: (删除的记录 (id, visit_id, timestamp, device_id), 下一批的 after_id)，
+            没有删除记录表示已没有符合条件的记录
+    """
+    stmt = select(Visit.id, Visit.visit_id, Visit.timestamp, Visit.device_id).where(*conditions)
+    if after_id is not None:
+        stmt = stmt.where(Visit.id > after_id).order_by(Visit.id)
+
+    result = await db.execute(stmt.limit(limit))
+    rows = result.all()
+    if not rows:
+        return [], after_id
+
+    await _delete_rows(db, rows)
+    await db.commit()
+    bump_data_version()
+    return rows, (max(row.id for row in rows) if after_id is not None else None)
+
+
+async def get_visit_keys_after(db: AsyncSession, after_id: int) -> List:
+    """
+    主键大于 after_id 的访问的时间和设备（清空访问记录期间新写入的访问）
+
+    Returns:
+        List: (timestamp, device_id) 列表
+    """
+    result = await db.execute(select(Visit.timestamp, Visit.device_id).where(Visit.id > after_id))
+    return result.all()
+
+
+async def get_distinct_values(db: AsyncSession, start: datetime, end: datetime) -> List:
+    """
+    时间范围内访问的 IP、综合指纹和 Canvas 指纹（重建去重草图）
+
+    Returns:
+        List: (ip_address, fingerprint_hash, canvas_fingerprint) 列表
+    """
+    result = await db.execute(
+        select(Visit.ip_address, Visit.fingerprint_hash, Visit.canvas_fingerprint)
+        .where(Visit.timestamp >= start, Visit.timestamp < end)
+    )
+    return result.all()
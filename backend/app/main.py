@@ -1,13 +1,66 @@
 """
 FastAPI 主应用
 """
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
 from pathlib import Path
 from app.config import settings
+from app.core.compression import CompressionMiddleware
+from app.core.metrics import MetricsMiddleware
+from app.core.static_files import AssetStaticFiles, load_manifest
 from app.api.v1 import tracker, admin, auth
+from app.services.journal import ingest_journal
+from app.migrations import migration_runner
+from app.services.purge import purge_manager
+from app.services.ratelimit import rate_limiter
+from app.services.distinct import distinct_counter
+from app.services.mouse_features import trajectory_analyzer
+from app.services.warmup import warmup_manager
+from app.services.metrics import render_metrics
+from app.utils.geolocation import open_http_client, close_http_client
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用启动 / 关闭"""
+    # 登记工作进程（SQLite 独占操作据此确认没有其他工作进程）
+    await ingest_journal.register_process()
+
+    # 数据库迁移：结构变更完成后才开始接收请求，回填和建索引在后台继续
+    if settings.MIGRATE_ON_STARTUP:
+        await migration_runner.start()
+
+    # 写入日志模式：启动时重放上次未写入数据库的记录
+    if settings.INGEST_JOURNAL:
+        await ingest_journal.start()
+    else:
+        # 迁移、清理期间临时暂存、上次未加载完的追踪数据
+        await ingest_journal.replay()
+
+    # 多进程共享限流计数的同步任务、去重草图的定期写入、鼠标轨迹的定期分析
+    rate_limiter.start()
+    distinct_counter.start()
+    trajectory_analyzer.start()
+
+    # 地理位置查询共用的 HTTP 客户端（复用连接）；预热在后台执行，完成后 /ready 返回就绪
+    await open_http_client()
+    warmup_manager.start()
+
+    yield
+
+    await warmup_manager.stop()
+    await rate_limiter.stop()
+    await purge_manager.stop()
+    await migration_runner.stop()
+    await ingest_journal.stop()
+    # 写入日志加载完最后一批访问后再分析剩余轨迹、写入剩余草图
+    await trajectory_analyzer.stop()
+    await distinct_counter.stop()
+    await close_http_client()
+    ingest_journal.unregister_process()
+
 
 # 创建 FastAPI 应用实例
 app = FastAPI(
@@ -15,6 +68,7 @@ app = FastAPI(
     version=settings.APP_VERSION,
     description="AdAllianceTools 流量测试网站 - 访问追踪 API",
     debug=settings.DEBUG,
+    lifespan=lifespan,
 )
 
 # CORS 中间件配置
@@ -26,22 +80,42 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 响应压缩（导出、统计接口的 JSON / CSV，未预压缩的静态文件）
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MIN_SIZE,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+    )
+
+# 请求耗时指标（最外层，包含压缩耗时）
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # 注册 API 路由
 app.include_router(tracker.router, prefix="/api/v1")
 app.include_router(admin.router, prefix="/api/v1")
 app.include_router(auth.router, prefix="/api/v1")
 
-# 静态文件服务
+# 静态文件服务：执行过 scripts/build_static.py 时使用 frontend/dist（带哈希的文件名 + 预压缩文件）
 frontend_dir = Path(__file__).parent.parent.parent / "frontend"
+asset_manifest = load_manifest(frontend_dir / "dist")
+if asset_manifest is not None:
+    frontend_dir = frontend_dir / "dist"
 
 if (frontend_dir / "static").exists():
-    app.mount("/static", StaticFiles(directory=str(frontend_dir / "static")), name="static")
+    app.mount(
+        "/static",
+        AssetStaticFiles(directory=str(frontend_dir / "static"), immutable=set((asset_manifest or {}).values())),
+        name="static"
+    )
 
 if (frontend_dir / "public").exists():
-    app.mount("/public", StaticFiles(directory=str(frontend_dir / "public"), html=True), name="public")
+    app.mount("/public", AssetStaticFiles(directory=str(frontend_dir / "public"), html=True), name="public")
 
 if (frontend_dir / "admin").exists():
-    app.mount("/admin", StaticFiles(directory=str(frontend_dir / "admin"), html=True), name="admin")
+    app.mount("/admin", AssetStaticFiles(directory=str(frontend_dir / "admin"), html=True), name="admin")
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -120,6 +194,23 @@ async def health_check():
     }
 
 
+@app.get("/ready")
+async def readiness_check():
+    """就绪检查端点（启动预热完成前返回 503，负载均衡器据此决定是否转发流量）"""
+    stats = warmup_manager.stats()
+    return JSONResponse(
+        status_code=200 if stats["ready"] else 503,
+        content={"status": "ready" if stats["ready"] else "not_ready", **stats},
+    )
+
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+    async def metrics():
+        """运行指标（Prometheus 文本格式）"""
+        return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.get("/api/v1/info")
 async def api_info():
     """API 信息"""
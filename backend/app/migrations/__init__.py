@@ -0,0 +1,6 @@
+"""
+版本化数据库迁移
+"""
+from app.migrations.runner import MigrationRunner, migration_runner
+
+__all__ = ["MigrationRunner", "migration_runner"]
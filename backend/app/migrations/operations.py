@@ -0,0 +1,337 @@
+"""
+迁移操作
+
+每个迁移版本由若干操作组成，分两个阶段执行：
+- 结构变更（online=False）：添加字段、创建表，执行很快，在启动时同步完成，完成后新代码即可运行
+- 后台操作（online=True）：分批回填、建索引、删除旧字段，在后台按顺序执行，
+  每批一个短事务，中断后从保存的断点继续
+
+exclusive=True 的操作在 SQLite 上执行期间持续持有写锁（建索引、删字段需要扫描或重写整张表），
+由迁移执行器在此期间把追踪数据暂存到写入日志
+"""
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Index, inspect, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from sqlalchemy.schema import CreateIndex as CreateIndexDDL
+from app.core.database import Base
+
+
+# 一批回填：(连接, 断点, 批大小) -> (新断点, 本批处理的记录数)，处理 0 条时结束
+BatchFunc = Callable[[AsyncConnection, Any, int], Awaitable[Tuple[Any, int]]]
+
+
+class MigrationContext:
+    """操作执行时的上下文"""
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        batch_size: int,
+        batch_pause: float,
+        cursor: Any = None,
+        save_cursor: Optional[Callable[[AsyncConnection, Any], Awaitable[None]]] = None,
+        progress: Optional[Dict] = None
+    ):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.cursor = cursor
+        self.save_cursor = save_cursor
+        self.progress = progress if progress is not None else {}
+
+    @property
+    def dialect(self) -> str:
+        return self.engine.dialect.name
+
+    def report(self, processed: int, total: Optional[int] = None):
+        """更新进度（管理后台 /admin/stats/migrations 显示）"""
+        self.progress["processed"] = processed
+        if total is not None:
+            self.progress["total"] = total
+
+
+async def column_names(conn: AsyncConnection, table: str) -> set:
+    """表中已有的字段名"""
+    columns = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_columns(table))
+    return {column["name"] for column in columns}
+
+
+async def index_names(conn: AsyncConnection, table: str) -> set:
+    """表中已有的索引名"""
+    indexes = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_indexes(table))
+    return {index["name"] for index in indexes}
+
+
+async def has_table(conn: AsyncConnection, table: str) -> bool:
+    return await conn.run_sync(lambda sync_conn: inspect(sync_conn).has_table(table))
+
+
+class Operation:
+    """迁移操作基类"""
+
+    online = False
+    exclusive = False
+
+    def describe(self) -> str:
+        raise NotImplementedError
+
+    async def run(self, ctx: MigrationContext):
+        raise NotImplementedError
+
+
+class AddColumns(Operation):
+    """添加字段（已存在的跳过），字段类型按模型定义编译为当前数据库的类型"""
+
+    def __init__(self, table: str, columns: Sequence[str], defaults: Optional[Dict[str, str]] = None):
+        self.table = table
+        self.columns = list(columns)
+        self.defaults = defaults or {}
+
+    def describe(self) -> str:
+        return f"添加字段 {self.table}: {', '.join(self.columns)}"
+
+    async def run(self, ctx: MigrationContext):
+        model = Base.metadata.tables[self.table]
+        async with ctx.engine.begin() as conn:
+            existing = await column_names(conn, self.table)
+            for name in self.columns:
+                if name in existing:
+                    continue
+                ddl = model.c[name].type.compile(dialect=conn.dialect)
+                if name in self.defaults:
+                    ddl += f" DEFAULT {self.defaults[name]}"
+                await conn.execute(text(f"ALTER TABLE {self.table} ADD COLUMN {name} {ddl}"))
+                print(f"  [ADD] {self.table}.{name} {ddl}")
+
+
+class CreateTables(Operation):
+    """按模型创建表（已存在的跳过）"""
+
+    def __init__(self, *models):
+        self.tables = [model.__table__ for model in models]
+
+    def describe(self) -> str:
+        return f"创建表 {', '.join(table.name for table in self.tables)}"
+
+    async def run(self, ctx: MigrationContext):
+        async with ctx.engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, tables=self.tables)
+
+
+class Backfill(Operation):
+    """
+    分批回填（后台）
+
+    每批在一个事务内处理并保存断点，批次之间暂停 batch_pause 秒，让出写锁给追踪写入；
+    批处理函数需可重复执行（中断后最后一批会重做）
+    """
+
+    online = True
+
+    def __init__(self, description: str, batch: BatchFunc, count: Optional[Callable[[AsyncConnection], Awaitable[int]]] = None):
+        self.description = description
+        self.batch = batch
+        self.count = count
+
+    def describe(self) -> str:
+        return self.description
+
+    async def run(self, ctx: MigrationContext):
+        total = None
+        if self.count is not None:
+            async with ctx.engine.connect() as conn:
+                total = await self.count(conn)
+
+        cursor = ctx.cursor
+        processed = 0
+        ctx.report(processed, total)
+
+        while True:
+            async with ctx.engine.begin() as conn:
+                next_cursor, count = await self.batch(conn, cursor, ctx.batch_size)
+                if not count:
+                    break
+                await ctx.save_cursor(conn, next_cursor)
+
+            cursor = next_cursor
+            processed += count
+            ctx.report(processed)
+            await asyncio.sleep(ctx.batch_pause)
+
+        if processed:
+            print(f"  [BACKFILL] {self.description}: {processed} 条记录")
+
+
+class Execute(Operation):
+    """在一个事务内执行 SQL（后台）"""
+
+    online = True
+
+    def __init__(self, description: str, statements: Sequence[str], exclusive: bool = False):
+        self.description = description
+        self.statements = list(statements)
+        self.exclusive = exclusive
+
+    def describe(self) -> str:
+        return self.description
+
+    async def run(self, ctx: MigrationContext):
+        async with ctx.engine.begin() as conn:
+            for statement in self.statements:
+                await conn.execute(text(statement))
+
+
+class CreateIndex(Operation):
+    """
+    按模型创建索引（后台，已存在的跳过）
+
+    PostgreSQL 使用 CREATE INDEX CONCURRENTLY，不阻塞写入，进度来自 pg_stat_progress_create_index；
+    SQLite 建索引期间持有写锁
+    """
+
+    online = True
+    exclusive = True
+
+    # PostgreSQL 进度查询间隔（秒）
+    poll_interval = 2.0
+
+    def __init__(self, index: Index):
+        self.index = index
+
+    @property
+    def table(self) -> str:
+        return self.index.table.name
+
+    def describe(self) -> str:
+        return f"创建索引 {self.index.name} ON {self.table} ({', '.join(c.name for c in self.index.columns)})"
+
+    async def run(self, ctx: MigrationContext):
+        async with ctx.engine.connect() as conn:
+            if self.index.name in await index_names(conn, self.table):
+                return
+            rows = (await conn.execute(text(f"SELECT COUNT(*) FROM {self.table}"))).scalar_one()
+        ctx.report(0, rows)
+
+        started = time.monotonic()
+        if ctx.dialect == "postgresql":
+            await self._create_concurrently(ctx)
+        else:
+            async with ctx.engine.begin() as conn:
+                await conn.execute(CreateIndexDDL(self.index, if_not_exists=True))
+        ctx.report(rows)
+
+        print(f"  [INDEX] {self.index.name}: {rows} 行，耗时 {time.monotonic() - started:.1f} 秒")
+
+    async def _create_concurrently(self, ctx: MigrationContext):
+        async with ctx.engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+
+            # 上次中断的 CONCURRENTLY 会留下无效索引，先删除
+            result = await conn.execute(
+                text(
+                    "SELECT NOT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                    "WHERE c.relname = :name"
+                ),
+                {"name": self.index.name}
+            )
+            if result.scalar():
+                await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {self.index.name}"))
+
+            ddl = str(CreateIndexDDL(self.index, if_not_exists=True).compile(dialect=conn.dialect))
+            ddl = ddl.replace("INDEX IF NOT EXISTS", "INDEX CONCURRENTLY IF NOT EXISTS", 1)
+
+            poller = asyncio.create_task(self._poll_progress(ctx))
+            try:
+                await conn.execute(text(ddl))
+            finally:
+                poller.cancel()
+
+    async def _poll_progress(self, ctx: MigrationContext):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                async with ctx.engine.connect() as conn:
+                    result = await conn.execute(
+                        text(
+                            "SELECT phase, tuples_done, tuples_total FROM pg_stat_progress_create_index "
+                            "WHERE relid = CAST(:table AS regclass)"
+                        ),
+                        {"table": self.table}
+                    )
+                    row = result.first()
+            except Exception as e:
+                print(f"[WARN] 读取建索引进度失败: {str(e)}")
+                return
+            if row:
+                ctx.progress["phase"] = row.phase
+                if row.tuples_total:
+                    ctx.report(row.tuples_done, row.tuples_total)
+
+
+class DropIndexes(Operation):
+    """删除索引（后台，不存在的跳过）"""
+
+    online = True
+
+    def __init__(self, names: Sequence[str]):
+        self.names = list(names)
+
+    def describe(self) -> str:
+        return f"删除索引 {', '.join(self.names)}"
+
+    async def run(self, ctx: MigrationContext):
+        concurrently = "CONCURRENTLY " if ctx.dialect == "postgresql" else ""
+        async with ctx.engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            for name in self.names:
+                await conn.execute(text(f"DROP INDEX {concurrently}IF EXISTS {name}"))
+
+
+class DropColumns(Operation):
+    """删除字段（后台，不存在的跳过）"""
+
+    online = True
+    exclusive = True
+
+    def __init__(self, table: str, columns: Sequence[str]):
+        self.table = table
+        self.columns = list(columns)
+
+    def describe(self) -> str:
+        return f"删除字段 {self.table}: {', '.join(self.columns)}"
+
+    async def run(self, ctx: MigrationContext):
+        async with ctx.engine.connect() as conn:
+            existing = await column_names(conn, self.table)
+
+        for name in self.columns:
+            if name not in existing:
+                continue
+            try:
+                async with ctx.engine.begin() as conn:
+                    await conn.execute(text(f"ALTER TABLE {self.table} DROP COLUMN {name}"))
+                print(f"  [DROP] {self.table}.{name}")
+            except Exception as e:
+                # SQLite 3.35 以下不支持 DROP COLUMN：模型不再映射旧字段，保留也不影响使用
+                print(f"[WARN] 无法删除字段 {self.table}.{name}: {str(e).splitlines()[0]}")
+
+
+@dataclass
+class Migration:
+    """迁移版本"""
+
+    version: int
+    name: str
+    operations: List[Operation]
+
+    @property
+    def schema_operations(self) -> List[Operation]:
+        return [op for op in self.operations if not op.online]
+
+    @property
+    def online_operations(self) -> List[Operation]:
+        return [op for op in self.operations if op.online]
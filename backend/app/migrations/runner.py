@@ -0,0 +1,364 @@
+"""
+数据库迁移执行器
+
+- 新数据库：按模型建表，全部版本直接标记为已完成
+- 已有数据库：按版本顺序同步执行结构变更，再在后台执行回填、建索引等操作；
+  schema_version 表记录每个版本的状态和后台操作断点，中断后从断点继续
+- 多个进程同时启动时通过 schema_lock 表的租约保证只有一个进程执行迁移，
+  其他进程等待结构变更完成后直接启动
+- 应用内执行 SQLite 独占操作（建索引、删字段）要求单个工作进程（或开启 INGEST_JOURNAL），
+  多进程运行时该操作失败并显示在管理后台，需停止应用后执行 scripts/migrate.py
+"""
+import asyncio
+import json
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import select, update, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from app.config import settings
+from app.core.database import Base, engine, async_session_maker
+from app.models.migration import SchemaVersion, SchemaLock
+from app.migrations.operations import Migration, MigrationContext, has_table
+from app.migrations.versions import MIGRATIONS
+from app.services.journal import ingest_journal
+from app.services.response_cache import bump_data_version
+
+
+class MigrationRunner:
+    """版本化迁移执行器"""
+
+    def __init__(self, migrations: List[Migration], batch_size: int, batch_pause: float, lock_seconds: float):
+        self.migrations = sorted(migrations, key=lambda m: m.version)
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.lock_seconds = lock_seconds
+
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # 应用内执行时，SQLite 独占操作期间把追踪数据暂存到写入日志（命令行执行时不需要）
+        self.hold_writes = False
+
+        self._locked = False
+        self._task: Optional[asyncio.Task] = None
+
+        # 状态（管理后台）
+        self.current: Optional[Dict] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def head(self) -> int:
+        return self.migrations[-1].version if self.migrations else 0
+
+    # ---------- 版本表 ----------
+
+    async def prepare(self):
+        """创建版本表和锁表"""
+        async with engine.begin() as conn:
+            await conn.run_sync(
+                Base.metadata.create_all,
+                tables=[SchemaVersion.__table__, SchemaLock.__table__]
+            )
+
+    async def _versions(self) -> Dict[int, SchemaVersion]:
+        async with async_session_maker() as db:
+            result = await db.execute(select(SchemaVersion))
+            return {row.version: row for row in result.scalars()}
+
+    async def _pending_schema(self) -> bool:
+        """是否有未执行结构变更的版本"""
+        versions = await self._versions()
+        return any(m.version not in versions for m in self.migrations)
+
+    async def pending_versions(self) -> List[int]:
+        """未执行结构变更的版本（不执行迁移时启动检查用）"""
+        async with engine.connect() as conn:
+            if not await has_table(conn, SchemaVersion.__tablename__):
+                return [m.version for m in self.migrations]
+        versions = await self._versions()
+        return [m.version for m in self.migrations if m.version not in versions]
+
+    async def _pending_online(self) -> bool:
+        """是否有未完成后台操作的版本"""
+        versions = await self._versions()
+        return any(v.status != "done" for v in versions.values())
+
+    async def _save_cursor(self, version: int, conn, cursor):
+        """保存后台操作断点（与该批数据在同一个事务内提交）"""
+        await conn.execute(
+            update(SchemaVersion)
+            .where(SchemaVersion.version == version)
+            .values(cursor=json.dumps(cursor))
+        )
+
+    # ---------- 迁移锁 ----------
+
+    async def acquire_lock(self) -> bool:
+        """获取迁移锁（未被持有、由自己持有或持有者超时未续期时成功）"""
+        now = datetime.utcnow()
+        async with engine.begin() as conn:
+            insert = postgresql.insert if conn.dialect.name == "postgresql" else sqlite.insert
+            await conn.execute(insert(SchemaLock).values(id=1).on_conflict_do_nothing())
+            result = await conn.execute(
+                update(SchemaLock)
+                .where(
+                    SchemaLock.id == 1,
+                    or_(
+                        SchemaLock.owner.is_(None),
+                        SchemaLock.owner == self.owner,
+                        SchemaLock.heartbeat_at < now - timedelta(seconds=self.lock_seconds),
+                    )
+                )
+                .values(owner=self.owner, heartbeat_at=now)
+            )
+        self._locked = result.rowcount == 1
+        return self._locked
+
+    async def release_lock(self):
+        if not self._locked:
+            return
+        self._locked = False
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(
+                    update(SchemaLock)
+                    .where(SchemaLock.id == 1, SchemaLock.owner == self.owner)
+                    .values(owner=None, heartbeat_at=None)
+                )
+        except Exception as e:
+            print(f"[WARN] 释放迁移锁失败（超时后自动失效）: {str(e)}")
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.lock_seconds / 3)
+            try:
+                async with engine.begin() as conn:
+                    await conn.execute(
+                        update(SchemaLock)
+                        .where(SchemaLock.id == 1, SchemaLock.owner == self.owner)
+                        .values(heartbeat_at=datetime.utcnow())
+                    )
+            except Exception as e:
+                # SQLite 建索引期间续期会等待写锁超时，下一次再续
+                print(f"[WARN] 迁移锁续期失败: {str(e).splitlines()[0]}")
+
+    # ---------- 执行 ----------
+
+    async def init_schema(self):
+        """新数据库：按模型建表，全部版本标记为已完成"""
+        now = datetime.utcnow()
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with async_session_maker() as db:
+            existing = set((await db.execute(select(SchemaVersion.version))).scalars())
+            for m in self.migrations:
+                if m.version in existing:
+                    continue
+                db.add(SchemaVersion(
+                    version=m.version,
+                    name=m.name,
+                    status="done",
+                    step=len(m.online_operations),
+                    applied_at=now,
+                    finished_at=now,
+                ))
+            await db.commit()
+
+    async def expand(self):
+        """按版本顺序执行未执行版本的结构变更"""
+        versions = await self._versions()
+        async with engine.connect() as conn:
+            fresh = not await has_table(conn, "visits")
+        if fresh:
+            print("[INFO] 新数据库：按模型创建全部表")
+            await self.init_schema()
+            return
+
+        for m in self.migrations:
+            if m.version in versions:
+                continue
+            print(f"[INFO] 数据库迁移 {m.version:04d} {m.name}: 结构变更")
+            ctx = self._context(m)
+            for op in m.schema_operations:
+                await op.run(ctx)
+
+            now = datetime.utcnow()
+            done = not m.online_operations
+            async with async_session_maker() as db:
+                db.add(SchemaVersion(
+                    version=m.version,
+                    name=m.name,
+                    status="done" if done else "expanded",
+                    step=0,
+                    applied_at=now,
+                    finished_at=now if done else None,
+                ))
+                await db.commit()
+
+    def _context(self, m: Migration, cursor=None) -> MigrationContext:
+        async def save_cursor(conn, value):
+            await self._save_cursor(m.version, conn, value)
+
+        return MigrationContext(
+            engine=engine,
+            batch_size=self.batch_size,
+            batch_pause=self.batch_pause,
+            cursor=cursor,
+            save_cursor=save_cursor,
+            progress=self.current,
+        )
+
+    async def run_online(self):
+        """按版本顺序执行后台操作，每个操作完成后记录进度"""
+        versions = await self._versions()
+        for m in self.migrations:
+            row = versions.get(m.version)
+            if row is None or row.status == "done":
+                continue
+
+            operations = m.online_operations
+            cursor = json.loads(row.cursor) if row.cursor else None
+            for step in range(row.step, len(operations)):
+                op = operations[step]
+                print(f"[INFO] 数据库迁移 {m.version:04d} {m.name}: {op.describe()}")
+                self.current = {
+                    "version": m.version,
+                    "name": m.name,
+                    "step": step + 1,
+                    "steps": len(operations),
+                    "operation": op.describe(),
+                    "started_at": datetime.utcnow().isoformat(),
+                }
+                # SQLite 独占操作期间追踪数据暂存到写入日志，完成后再加载进数据库；
+                # 多个工作进程时无法暂存其他进程的写入，拒绝执行（改用 scripts/migrate.py）
+                if self.hold_writes and op.exclusive and engine.dialect.name == "sqlite":
+                    async with ingest_journal.hold_exclusive(alternative="，或停止应用后执行 scripts/migrate.py"):
+                        await op.run(self._context(m, cursor))
+                else:
+                    await op.run(self._context(m, cursor))
+                cursor = None
+                # 回填可能修改了统计用到的字段
+                bump_data_version()
+
+                async with engine.begin() as conn:
+                    await conn.execute(
+                        update(SchemaVersion)
+                        .where(SchemaVersion.version == m.version)
+                        .values(step=step + 1, cursor=None)
+                    )
+
+            async with engine.begin() as conn:
+                await conn.execute(
+                    update(SchemaVersion)
+                    .where(SchemaVersion.version == m.version)
+                    .values(status="done", finished_at=datetime.utcnow())
+                )
+            print(f"[SUCCESS] 数据库迁移 {m.version:04d} {m.name} 完成")
+
+        self.current = None
+
+    async def upgrade(self):
+        """前台执行全部迁移（命令行）"""
+        await self.prepare()
+        if not await self.acquire_lock():
+            raise RuntimeError("其他进程正在执行数据库迁移")
+
+        heartbeat = asyncio.create_task(self._heartbeat_loop())
+        try:
+            await self.expand()
+            await self.run_online()
+        finally:
+            heartbeat.cancel()
+            await self.release_lock()
+
+    async def start(self):
+        """
+        应用启动时执行：同步完成结构变更，后台操作在后台任务中执行
+
+        其他进程持有迁移锁时等待结构变更完成（新代码依赖新字段）
+        """
+        self.hold_writes = True
+        await self.prepare()
+
+        while not await self.acquire_lock():
+            if not await self._pending_schema():
+                break
+            print("[INFO] 其他进程正在执行数据库迁移，等待结构变更完成...")
+            await asyncio.sleep(1)
+
+        if self._locked:
+            try:
+                await self.expand()
+            except Exception:
+                await self.release_lock()
+                raise
+
+        self._task = asyncio.create_task(self._background())
+
+    async def _background(self):
+        """执行后台操作；锁由其他进程持有时定期重试，持有者退出后接手"""
+        while not self._locked:
+            if not await self._pending_online():
+                return
+            await asyncio.sleep(self.lock_seconds)
+            await self.acquire_lock()
+
+        heartbeat = asyncio.create_task(self._heartbeat_loop())
+        try:
+            await self.run_online()
+            self.last_error = None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # 不自动重试：错误显示在管理后台，修复后重启应用从断点继续
+            self.last_error = str(e).splitlines()[0] if str(e) else type(e).__name__
+            print(f"[ERROR] 数据库迁移失败: {self.last_error}")
+        finally:
+            heartbeat.cancel()
+            await self.release_lock()
+
+    async def stop(self):
+        """停止后台操作（已完成的批次已保存断点）"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.release_lock()
+
+    async def status(self) -> List[Dict]:
+        """各版本状态"""
+        versions = await self._versions()
+        items = []
+        for m in self.migrations:
+            row = versions.get(m.version)
+            items.append({
+                "version": m.version,
+                "name": m.name,
+                "status": row.status if row else "pending",
+                "step": row.step if row else 0,
+                "steps": len(m.online_operations),
+                "applied_at": row.applied_at.isoformat() if row and row.applied_at else None,
+                "finished_at": row.finished_at.isoformat() if row and row.finished_at else None,
+            })
+        return items
+
+    async def stats(self) -> Dict:
+        """迁移状态（管理后台）"""
+        return {
+            "head": self.head,
+            "running": self._task is not None and not self._task.done(),
+            "current": self.current,
+            "last_error": self.last_error,
+            "versions": await self.status(),
+        }
+
+
+# 全局迁移执行器（MIGRATE_ON_STARTUP 开启时在应用启动时执行）
+migration_runner = MigrationRunner(
+    migrations=MIGRATIONS,
+    batch_size=settings.MIGRATION_BATCH_SIZE,
+    batch_pause=settings.MIGRATION_BATCH_PAUSE,
+    lock_seconds=settings.MIGRATION_LOCK_SECONDS,
+)
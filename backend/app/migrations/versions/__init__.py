@@ -0,0 +1,40 @@
+"""
+迁移版本（按版本号顺序执行）
+
+新增版本：添加 vNNNN_<name>.py 定义 migration，并加入下面的列表；
+已发布的版本不要修改，结构变化写成新版本
+"""
+from app.migrations.versions import (
+    v0001_tracking_columns,
+    v0002_referrer_channel,
+    v0003_device_identity,
+    v0004_distinct_sketches,
+    v0005_device_lsh,
+    v0006_mouse_features,
+    v0007_custom_events,
+    v0008_visit_payloads,
+    v0009_visit_indexes,
+    v0010_mouse_analysis,
+    v0011_rate_limit,
+    v0012_mouse_pending_index,
+    v0013_custom_event_id,
+)
+
+MIGRATIONS = [
+    module.migration
+    for module in (
+        v0001_tracking_columns,
+        v0002_referrer_channel,
+        v0003_device_identity,
+        v0004_distinct_sketches,
+        v0005_device_lsh,
+        v0006_mouse_features,
+        v0007_custom_events,
+        v0008_visit_payloads,
+        v0009_visit_indexes,
+        v0010_mouse_analysis,
+        v0011_rate_limit,
+        v0012_mouse_pending_index,
+        v0013_custom_event_id,
+    )
+]
@@ -0,0 +1,49 @@
+"""
+0001 全量采集字段
+硬件、网络、浏览器功能、指纹、电池、性能、浏览器地理位置、IP 变化检测、视口大小
+"""
+from app.migrations.operations import Migration, AddColumns
+from app.models.visit import Visit  # noqa: F401  注册 visits 表模型（AddColumns 按模型定义编译字段类型）
+
+
+migration = Migration(
+    version=1,
+    name="tracking_columns",
+    operations=[
+        AddColumns(
+            "visits",
+            [
+                # WebGL 详细信息
+                "webgl_vendor", "webgl_renderer",
+                # 硬件信息
+                "device_memory", "hardware_concurrency", "color_depth", "pixel_ratio", "max_touch_points",
+                # 网络信息
+                "connection_type", "connection_downlink", "connection_rtt", "connection_save_data",
+                # 浏览器功能
+                "cookies_enabled", "do_not_track", "pdf_viewer_enabled", "plugins_hash",
+                # 音频指纹、媒体设备
+                "audio_fingerprint", "media_devices_hash",
+                # 存储支持
+                "local_storage_enabled", "session_storage_enabled", "indexed_db_enabled",
+                # 广告拦截检测
+                "ad_blocker_detected",
+                # 电池信息
+                "battery_charging", "battery_level", "battery_charging_time", "battery_discharging_time",
+                # WebRTC、语音列表哈希
+                "webrtc_hash", "speech_voices_hash",
+                # 性能指标
+                "page_load_time", "dom_parse_time", "dns_time", "tcp_time", "ttfb",
+                # Headless 检测
+                "is_headless",
+                # 浏览器地理位置
+                "browser_latitude", "browser_longitude", "browser_accuracy",
+                "browser_altitude", "browser_altitude_accuracy",
+                # IP 变化检测
+                "last_ip", "ip_changed", "ip_change_count",
+                # 视口大小
+                "viewport_size",
+            ],
+            defaults={"ip_changed": "FALSE", "ip_change_count": "0"},
+        ),
+    ],
+)
@@ -0,0 +1,44 @@
+"""
+0002 来源域名和渠道
+添加 referrer_domain / referrer_channel 字段，并由 referrer 回填已有记录
+"""
+from sqlalchemy import text
+from app.migrations.operations import Migration, AddColumns, Backfill
+from app.models.visit import Visit  # noqa: F401  注册 visits 表模型（AddColumns 按模型定义编译字段类型）
+from app.utils.referrer import classify_referrer
+
+
+async def classify_batch(conn, cursor, limit):
+    """按主键分批回填来源域名和渠道"""
+    result = await conn.execute(
+        text(
+            "SELECT id, referrer FROM visits "
+            "WHERE id > :last_id AND referrer_channel IS NULL "
+            "ORDER BY id LIMIT :limit"
+        ),
+        {"last_id": cursor or 0, "limit": limit}
+    )
+    rows = result.fetchall()
+    if not rows:
+        return cursor, 0
+
+    params = []
+    for row_id, referrer in rows:
+        domain, channel = classify_referrer(referrer)
+        params.append({"id": row_id, "domain": domain, "channel": channel})
+
+    await conn.execute(
+        text("UPDATE visits SET referrer_domain = :domain, referrer_channel = :channel WHERE id = :id"),
+        params
+    )
+    return rows[-1][0], len(rows)
+
+
+migration = Migration(
+    version=2,
+    name="referrer_channel",
+    operations=[
+        AddColumns("visits", ["referrer_domain", "referrer_channel"]),
+        Backfill("回填来源域名和渠道", classify_batch),
+    ],
+)
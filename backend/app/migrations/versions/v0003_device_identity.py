@@ -0,0 +1,59 @@
+"""
+0003 设备身份
+添加 visits.device_id 字段和 devices / device_ips 表，由已有记录回填 device_id 并重新汇总设备表
+"""
+from types import SimpleNamespace
+from sqlalchemy import text
+from app.migrations.operations import Migration, AddColumns, CreateTables, Backfill, Execute
+from app.models.visit import Visit  # noqa: F401  注册 visits 表模型（AddColumns 按模型定义编译字段类型）
+from app.models.device import Device, DeviceIP
+from app.utils.hash import DEVICE_ID_FIELDS, generate_device_id
+
+
+async def device_id_batch(conn, cursor, limit):
+    """按主键分批计算已有记录的 device_id"""
+    result = await conn.execute(
+        text(
+            f"SELECT id, {', '.join(DEVICE_ID_FIELDS)} FROM visits "
+            "WHERE id > :last_id AND device_id IS NULL "
+            "ORDER BY id LIMIT :limit"
+        ),
+        {"last_id": cursor or 0, "limit": limit}
+    )
+    rows = result.mappings().all()
+    if not rows:
+        return cursor, 0
+
+    await conn.execute(
+        text("UPDATE visits SET device_id = :device_id WHERE id = :id"),
+        [{"id": row["id"], "device_id": generate_device_id(SimpleNamespace(**row))} for row in rows]
+    )
+    return rows[-1]["id"], len(rows)
+
+
+migration = Migration(
+    version=3,
+    name="device_identity",
+    operations=[
+        AddColumns("visits", ["device_id"]),
+        CreateTables(Device, DeviceIP),
+        Backfill("回填 device_id", device_id_batch),
+        # 一个事务内删除并重新汇总，期间写入的设备访问在事务提交后继续累加
+        Execute(
+            "由 visits 重新汇总 devices / device_ips",
+            [
+                "DELETE FROM device_ips",
+                "DELETE FROM devices",
+                "INSERT INTO devices (device_id, first_seen, last_seen, visit_count, distinct_ip_count, last_ip) "
+                "SELECT v.device_id, MIN(v.timestamp), MAX(v.timestamp), COUNT(*), COUNT(DISTINCT v.ip_address), "
+                "(SELECT v2.ip_address FROM visits v2 WHERE v2.device_id = v.device_id "
+                " ORDER BY v2.timestamp DESC LIMIT 1) "
+                "FROM visits v WHERE v.device_id IS NOT NULL GROUP BY v.device_id",
+                "INSERT INTO device_ips (device_id, ip_address, first_seen) "
+                "SELECT device_id, ip_address, MIN(timestamp) FROM visits "
+                "WHERE device_id IS NOT NULL GROUP BY device_id, ip_address",
+            ],
+            exclusive=True,
+        ),
+    ],
+)
@@ -0,0 +1,15 @@
+"""
+0004 去重计数草图
+创建 distinct_sketches 表（已有记录的草图由 scripts/rebuild_distinct_sketches.py 重建）
+"""
+from app.migrations.operations import Migration, CreateTables
+from app.models.sketch import DistinctSketch
+
+
+migration = Migration(
+    version=4,
+    name="distinct_sketches",
+    operations=[
+        CreateTables(DistinctSketch),
+    ],
+)
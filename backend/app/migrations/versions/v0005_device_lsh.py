@@ -0,0 +1,15 @@
+"""
+0005 近似重复设备检测
+创建 device_signatures / device_lsh_buckets 表（已有设备的签名由 scripts/rebuild_device_lsh.py 重建）
+"""
+from app.migrations.operations import Migration, CreateTables
+from app.models.device import DeviceSignature, DeviceLSHBucket
+
+
+migration = Migration(
+    version=5,
+    name="device_lsh",
+    operations=[
+        CreateTables(DeviceSignature, DeviceLSHBucket),
+    ],
+)
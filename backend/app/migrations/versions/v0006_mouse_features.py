@@ -0,0 +1,24 @@
+"""
+0006 鼠标轨迹特征和增量上报序号
+已有轨迹的分析在 0010（轨迹搬到 visit_payloads 之后）执行
+"""
+from app.migrations.operations import Migration, AddColumns
+from app.models.visit import Visit  # noqa: F401  注册 visits 表模型（AddColumns 按模型定义编译字段类型）
+
+
+migration = Migration(
+    version=6,
+    name="mouse_features",
+    operations=[
+        AddColumns(
+            "visits",
+            [
+                "mouse_seq_next",
+                "mouse_points", "mouse_speed_mean", "mouse_speed_cv", "mouse_accel_mean",
+                "mouse_curvature", "mouse_straightness", "mouse_interval_entropy",
+                "mouse_direction_entropy", "mouse_pause_count", "mouse_analyzed_at",
+            ],
+            defaults={"mouse_seq_next": "0"},
+        ),
+    ],
+)
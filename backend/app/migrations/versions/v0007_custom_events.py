@@ -0,0 +1,15 @@
+"""
+0007 自定义事件
+创建 custom_events 表
+"""
+from app.migrations.operations import Migration, CreateTables
+from app.models.event import CustomEvent
+
+
+migration = Migration(
+    version=7,
+    name="custom_events",
+    operations=[
+        CreateTables(CustomEvent),
+    ],
+)
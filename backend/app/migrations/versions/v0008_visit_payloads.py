@@ -0,0 +1,78 @@
+"""
+0008 大字段拆分到 visit_payloads 表
+把 visits 表中的鼠标轨迹（旧 JSON 轨迹同时转换为二进制编码）和原始数据按主键分批搬到 visit_payloads，
+然后删除 visits 表中的这些字段
+
+结构变更完成后新写入的数据直接进入 visit_payloads，搬运时已存在的记录不覆盖
+"""
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql, sqlite
+from app.migrations.operations import Migration, CreateTables, Backfill, DropColumns, column_names
+from app.models.visit import VisitPayload
+from app.utils.trajectory import encode_points, parse_json_points, point_count, TrajectoryError
+
+
+# 需要搬运的字段（旧表中存在的才处理）
+MOVED_COLUMNS = ["mouse_trajectory", "mouse_movements", "raw_data"]
+
+
+async def move_batch(conn, cursor, limit):
+    """按主键分批把大字段写入 visit_payloads"""
+    existing = await column_names(conn, "visits")
+    columns = [c for c in MOVED_COLUMNS if c in existing]
+    if not columns:
+        return cursor, 0
+
+    result = await conn.execute(
+        text(
+            f"SELECT id, {', '.join(columns)} FROM visits "
+            f"WHERE id > :last_id AND ({' OR '.join(f'{c} IS NOT NULL' for c in columns)}) "
+            "ORDER BY id LIMIT :limit"
+        ),
+        {"last_id": cursor or 0, "limit": limit}
+    )
+    rows = [row._asdict() for row in result]
+    if not rows:
+        return cursor, 0
+
+    payloads = []
+    received = []
+    for row in rows:
+        trajectory = row.get("mouse_trajectory")
+        movements = row.get("mouse_movements")
+        if trajectory is None and movements is not None:
+            try:
+                points = parse_json_points(movements)
+            except TrajectoryError:
+                points = []
+            trajectory = encode_points(points) if points else None
+
+        payloads.append({"visit_pk": row["id"], "mouse_trajectory": trajectory, "raw_data": row.get("raw_data")})
+        if trajectory:
+            received.append({"id": row["id"], "count": point_count(trajectory)})
+
+    insert = postgresql.insert if conn.dialect.name == "postgresql" else sqlite.insert
+    await conn.execute(insert(VisitPayload).on_conflict_do_nothing(), payloads)
+
+    # 旧协议写入的轨迹没有确认序号，回填为点数（后台分析队列据此判断是否有轨迹）
+    if received:
+        await conn.execute(
+            text(
+                "UPDATE visits SET mouse_seq_next = :count "
+                "WHERE id = :id AND COALESCE(mouse_seq_next, 0) = 0"
+            ),
+            received
+        )
+
+    return rows[-1]["id"], len(rows)
+
+
+migration = Migration(
+    version=8,
+    name="visit_payloads",
+    operations=[
+        CreateTables(VisitPayload),
+        Backfill("搬运鼠标轨迹和原始数据到 visit_payloads", move_batch),
+        DropColumns("visits", MOVED_COLUMNS),
+    ],
+)
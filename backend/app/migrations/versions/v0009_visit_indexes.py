@@ -0,0 +1,46 @@
+"""
+0009 按查询计划重建 visits 表索引
+先创建模型中定义的覆盖索引，再删除不再使用的单列索引和被覆盖索引取代的复合索引
+（索引设计见 scripts/check_query_plans.py 的输出）
+"""
+from app.migrations.operations import Migration, CreateIndex, DropIndexes
+from app.models.visit import Visit
+from app.models.device import DeviceLSHBucket
+
+
+# 需要删除的旧索引
+OLD_INDEXES = [
+    "ix_visits_id",
+    "ix_visits_timestamp",
+    "ix_visits_ip_address",
+    "ix_visits_ip_country",
+    "ix_visits_ip_city",
+    "ix_visits_ip_changed",
+    "ix_visits_referrer_domain",
+    "ix_visits_referrer_channel",
+    "ix_visits_device_type",
+    "ix_visits_is_bot",
+    "ix_visits_authenticity_score",
+    "ix_visits_fingerprint_hash",
+    "ix_visits_device_id",
+    "idx_timestamp_device",
+    "idx_timestamp_score",
+    "idx_location",
+    "idx_timestamp_bot",
+]
+
+
+migration = Migration(
+    version=9,
+    name="visit_indexes",
+    operations=[
+        *[
+            CreateIndex(index)
+            for index in sorted(
+                list(Visit.__table__.indexes) + list(DeviceLSHBucket.__table__.indexes),
+                key=lambda index: index.name
+            )
+        ],
+        DropIndexes(OLD_INDEXES),
+    ],
+)
@@ -0,0 +1,42 @@
+"""
+0010 分析已有鼠标轨迹
+为尚未分析的轨迹计算特征并按新特征重新评分
+"""
+from sqlalchemy import select, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.migrations.operations import Migration, Backfill
+from app.models.visit import Visit, VisitPayload
+from app.services.mouse_features import analyze_visits
+
+
+async def analyze_batch(conn, cursor, limit):
+    """按主键分批分析未分析的轨迹"""
+    async with AsyncSession(bind=conn, expire_on_commit=False) as db:
+        result = await db.execute(
+            select(Visit.id)
+            .join(VisitPayload, VisitPayload.visit_pk == Visit.id)
+            .where(
+                Visit.id > (cursor or 0),
+                Visit.mouse_analyzed_at.is_(None),
+                or_(VisitPayload.mouse_trajectory.isnot(None), VisitPayload.mouse_movements.isnot(None)),
+            )
+            .order_by(Visit.id)
+            .limit(limit)
+        )
+        visit_ids = result.scalars().all()
+        if not visit_ids:
+            return cursor, 0
+
+        # 会话加入外层事务，analyze_visits 的提交不会提前提交这一批
+        await analyze_visits(db, visit_ids)
+
+    return visit_ids[-1], len(visit_ids)
+
+
+migration = Migration(
+    version=10,
+    name="mouse_analysis",
+    operations=[
+        Backfill("分析已有鼠标轨迹", analyze_batch),
+    ],
+)
@@ -0,0 +1,15 @@
+"""
+0011 追踪接口限流
+创建 rate_limit_counters 表（多进程共享限流计数）
+"""
+from app.migrations.operations import Migration, CreateTables
+from app.models.ratelimit import RateLimitCounter
+
+
+migration = Migration(
+    version=11,
+    name="rate_limit",
+    operations=[
+        CreateTables(RateLimitCounter),
+    ],
+)
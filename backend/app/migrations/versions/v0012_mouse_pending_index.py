@@ -0,0 +1,15 @@
+"""
+0012 未分析轨迹索引
+启动时按 mouse_analyzed_at 为空读取待分析的访问，不扫描 visits 表
+"""
+from app.migrations.operations import Migration, CreateIndex
+from app.models.visit import Visit
+
+
+migration = Migration(
+    version=12,
+    name="mouse_pending_index",
+    operations=[
+        CreateIndex(next(index for index in Visit.__table__.indexes if index.name == "idx_mouse_pending")),
+    ],
+)
@@ -0,0 +1,16 @@
+"""
+0013 自定义事件 ID
+写入日志重放时按事件 ID 跳过已写入的自定义事件
+"""
+from app.migrations.operations import Migration, AddColumns, CreateIndex
+from app.models.event import CustomEvent
+
+
+migration = Migration(
+    version=13,
+    name="custom_event_id",
+    operations=[
+        AddColumns("custom_events", ["event_id"]),
+        CreateIndex(next(index for index in CustomEvent.__table__.indexes if index.name == "idx_event_id")),
+    ],
+)
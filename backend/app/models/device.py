@@ -0,0 +1,73 @@
+"""
+设备身份数据模型
+以与 IP 无关的设备标识聚合访问，用于重复访问和异常指纹检测
+"""
+from sqlalchemy import Column, Integer, SmallInteger, String, DateTime, LargeBinary, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class Device(Base):
+    """设备身份表"""
+
+    __tablename__ = "devices"
+
+    device_id = Column(String(64), primary_key=True, comment="设备标识（不含 IP 的指纹哈希）")
+    first_seen = Column(DateTime(timezone=True), server_default=func.now(), comment="首次访问时间")
+    last_seen = Column(DateTime(timezone=True), server_default=func.now(), index=True, comment="最近访问时间")
+    visit_count = Column(Integer, nullable=False, default=0, index=True, comment="访问次数")
+    distinct_ip_count = Column(Integer, nullable=False, default=0, index=True, comment="使用过的不同 IP 数")
+    last_ip = Column(String(45), comment="最近一次访问的 IP")
+
+    def __repr__(self):
+        return f"<Device {self.device_id} - {self.visit_count} visits>"
+
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            "device_id": self.device_id,
+            "first_seen": self.first_seen.isoformat() if self.first_seen else None,
+            "last_seen": self.last_seen.isoformat() if self.last_seen else None,
+            "visit_count": self.visit_count,
+            "distinct_ip_count": self.distinct_ip_count,
+            "last_ip": self.last_ip,
+        }
+
+
+class DeviceIP(Base):
+    """设备使用过的 IP（用于精确统计不同 IP 数）"""
+
+    __tablename__ = "device_ips"
+
+    device_id = Column(String(64), ForeignKey("devices.device_id", ondelete="CASCADE"), primary_key=True, comment="设备标识")
+    ip_address = Column(String(45), primary_key=True, comment="IP 地址")
+    first_seen = Column(DateTime(timezone=True), server_default=func.now(), comment="首次使用时间")
+
+    __table_args__ = (
+        Index('idx_device_ips_ip', ip_address),
+    )
+
+
+class DeviceSignature(Base):
+    """设备指纹组件的 MinHash 签名"""
+
+    __tablename__ = "device_signatures"
+
+    device_id = Column(String(64), ForeignKey("devices.device_id", ondelete="CASCADE"), primary_key=True, comment="设备标识")
+    signature = Column(LargeBinary, nullable=False, comment="MinHash 签名（uint32 数组）")
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), comment="创建时间")
+
+
+class DeviceLSHBucket(Base):
+    """LSH 分段桶：同一 (band, bucket) 下的设备互为近似重复候选"""
+
+    __tablename__ = "device_lsh_buckets"
+
+    band = Column(SmallInteger, primary_key=True, comment="分段序号")
+    bucket = Column(String(16), primary_key=True, comment="分段桶键")
+    device_id = Column(String(64), ForeignKey("devices.device_id", ondelete="CASCADE"), primary_key=True, comment="设备标识")
+
+    __table_args__ = (
+        # 查询设备所在的桶（近似重复设备查询），包含 band / bucket 不回表
+        Index('idx_lsh_device', device_id, band, bucket),
+    )
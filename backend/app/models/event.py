@@ -0,0 +1,42 @@
+"""
+自定义事件数据模型
+"""
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class CustomEvent(Base):
+    """页面上报的自定义事件（点击、表单提交等）"""
+
+    __tablename__ = "custom_events"
+
+    id = Column(Integer, primary_key=True, comment="自增主键")
+    event_id = Column(String(36), comment="事件 ID（写入日志模式下接收时分配，重放时按它跳过已写入的事件）")
+    visit_id = Column(String(36), nullable=False, index=True, comment="所属访问记录 ID")
+    name = Column(String(100), nullable=False, comment="事件名称")
+    properties = Column(Text, comment="事件属性（JSON）")
+    page_time = Column(Integer, comment="事件发生时间（相对页面加载的毫秒数）")
+    timestamp = Column(DateTime(timezone=True), server_default=func.now(), comment="接收时间")
+
+    __table_args__ = (
+        # 用于按事件名称和时间统计
+        Index('idx_event_name_timestamp', name, timestamp),
+
+        # 同一事件只写入一次（直接写入数据库的事件没有事件 ID）
+        Index('idx_event_id', event_id, unique=True),
+    )
+
+    def __repr__(self):
+        return f"<CustomEvent {self.name} - {self.visit_id}>"
+
+    def to_dict(self):
+        """转换为字典"""
+        return {
+            "id": self.id,
+            "visit_id": self.visit_id,
+            "name": self.name,
+            "properties": self.properties,
+            "page_time": self.page_time,
+            "timestamp": self.timestamp.isoformat() if self.timestamp else None,
+        }
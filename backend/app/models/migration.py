@@ -0,0 +1,33 @@
+"""
+数据库结构版本数据模型
+记录已执行的迁移（app/migrations/versions）及后台操作的进度
+"""
+from sqlalchemy import Column, Integer, String, DateTime, Text
+from app.core.database import Base
+
+
+class SchemaVersion(Base):
+    """已执行的迁移版本"""
+
+    __tablename__ = "schema_version"
+
+    version = Column(Integer, primary_key=True, autoincrement=False, comment="迁移版本号")
+    name = Column(String(100), nullable=False, comment="迁移名称")
+    status = Column(String(20), nullable=False, comment="状态: expanded（结构变更已完成，后台操作进行中）/done")
+    step = Column(Integer, nullable=False, default=0, comment="下一个待执行的后台操作序号")
+    cursor = Column(Text, comment="当前后台操作的断点（JSON）")
+    applied_at = Column(DateTime, comment="结构变更完成时间（UTC）")
+    finished_at = Column(DateTime, comment="全部完成时间（UTC）")
+
+    def __repr__(self):
+        return f"<SchemaVersion {self.version} {self.name} - {self.status}>"
+
+
+class SchemaLock(Base):
+    """迁移锁（多个进程同时启动时只有一个执行迁移，持有者定时续期，超时未续期视为失效）"""
+
+    __tablename__ = "schema_lock"
+
+    id = Column(Integer, primary_key=True, autoincrement=False, comment="固定为 1")
+    owner = Column(String(64), comment="持有者标识")
+    heartbeat_at = Column(DateTime, comment="最近续期时间（UTC）")
@@ -0,0 +1,20 @@
+"""
+限流计数数据模型
+多进程部署共享限流状态时使用（RATE_LIMIT_SHARED），按分钟窗口汇总各进程放行的请求数
+"""
+from sqlalchemy import Column, Integer, String
+from app.core.database import Base
+
+
+class RateLimitCounter(Base):
+    """每个限流键每分钟的请求数（各进程定期累加写入，过期窗口定期删除）"""
+
+    __tablename__ = "rate_limit_counters"
+
+    # 窗口在前：按窗口删除过期记录、按窗口 + 键查询计数都走主键
+    window = Column(Integer, primary_key=True, autoincrement=False, comment="分钟窗口（Unix 时间 // 60）")
+    key = Column(String(128), primary_key=True, comment="限流键: ip:<IP> / visit:<visit_id>")
+    count = Column(Integer, nullable=False, default=0, comment="窗口内的请求数")
+
+    def __repr__(self):
+        return f"<RateLimitCounter {self.key} @{self.window} - {self.count}>"
@@ -0,0 +1,30 @@
+"""
+去重计数草图数据模型
+"""
+from sqlalchemy import Column, Integer, String, DateTime, LargeBinary, UniqueConstraint
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class DistinctSketch(Base):
+    """按小时存储的 HyperLogLog 草图"""
+
+    __tablename__ = "distinct_sketches"
+
+    id = Column(Integer, primary_key=True, comment="自增主键")
+    metric = Column(String(32), nullable=False, comment="统计对象: ip/fingerprint/canvas")
+    bucket_start = Column(DateTime, nullable=False, index=True, comment="小时桶起始时间（UTC）")
+    registers = Column(LargeBinary, nullable=False, comment="压缩后的 HyperLogLog 寄存器")
+    updated_at = Column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        onupdate=func.now(),
+        comment="最后更新时间"
+    )
+
+    __table_args__ = (
+        UniqueConstraint('metric', 'bucket_start', name='uq_sketch_metric_bucket'),
+    )
+
+    def __repr__(self):
+        return f"<DistinctSketch {self.metric} - {self.bucket_start}>"
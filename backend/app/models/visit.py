@@ -1,7 +1,13 @@
 """
 访问记录数据模型
+
+列表和统计查询会扫描 visits 表，为保持行宽较小：
+- 鼠标轨迹和原始数据等大字段存放在 visit_payloads 表，只在需要时按主键读取
+- User-Agent 和来源页面延迟加载（deferred），select(Visit) 默认不读取，
+  需要时用 undefer_group("text") 一起加载；未加载时访问会直接报错，不会隐式查询
 """
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Float, Text, Index
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Float, Text, LargeBinary, Index
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql import func
 from app.core.database import Base
 
@@ -12,14 +18,13 @@ class Visit(Base):
     __tablename__ = "visits"
 
     # 主键和唯一标识
-    id = Column(Integer, primary_key=True, index=True, comment="自增主键")
+    id = Column(Integer, primary_key=True, comment="自增主键")
     visit_id = Column(String(64), unique=True, nullable=False, index=True, comment="访问唯一ID")
 
     # 时间信息
     timestamp = Column(
         DateTime(timezone=True),
         server_default=func.now(),
-        index=True,
         comment="访问时间戳"
     )
     created_at = Column(
@@ -29,23 +34,25 @@ class Visit(Base):
     )
 
     # IP 信息
-    ip_address = Column(String(45), nullable=False, index=True, comment="初始IP地址")
-    ip_country = Column(String(2), index=True, comment="国家代码")
-    ip_city = Column(String(100), index=True, comment="城市")
+    ip_address = Column(String(45), nullable=False, comment="初始IP地址")
+    ip_country = Column(String(2), comment="国家代码")
+    ip_city = Column(String(100), comment="城市")
     is_proxy = Column(Boolean, default=False, comment="是否代理IP")
 
     # IP 变化检测
     last_ip = Column(String(45), comment="最后一次请求的IP地址")
-    ip_changed = Column(Boolean, default=False, index=True, comment="访问期间IP是否变化")
+    ip_changed = Column(Boolean, default=False, comment="访问期间IP是否变化")
     ip_change_count = Column(Integer, default=0, comment="IP变化次数")
 
     # 请求信息
-    user_agent = Column(Text, comment="User-Agent")
-    referrer = Column(Text, comment="来源页面")
+    user_agent = deferred(Column(Text, comment="User-Agent"), group="text", raiseload=True)
+    referrer = deferred(Column(Text, comment="来源页面"), group="text", raiseload=True)
+    referrer_domain = Column(String(255), comment="来源域名（规范化）")
+    referrer_channel = Column(String(20), comment="来源渠道: google/facebook/direct/other 等")
     page_url = Column(String(500), nullable=False, comment="访问页面 URL")
 
     # 设备信息（从 User-Agent 解析）
-    device_type = Column(String(20), index=True, comment="设备类型: pc/mobile/tablet")
+    device_type = Column(String(20), comment="设备类型: pc/mobile/tablet")
     browser = Column(String(50), comment="浏览器名称")
     browser_version = Column(String(20), comment="浏览器版本")
     os = Column(String(50), comment="操作系统")
@@ -130,29 +137,44 @@ class Visit(Base):
     # 行为数据
     stay_duration = Column(Integer, default=0, comment="停留时间（秒）")
     scroll_depth = Column(Integer, default=0, comment="滚动深度（%）")
-    mouse_movements = Column(Text, comment="鼠标轨迹（JSON）")
+    mouse_seq_next = Column(Integer, default=0, comment="已接收的轨迹采样数（增量上报的确认序号）")
+
+    # 鼠标轨迹特征（后台批量分析，轨迹更新后 mouse_analyzed_at 置空等待重新分析）
+    mouse_points = Column(Integer, comment="轨迹点数")
+    mouse_speed_mean = Column(Float, comment="平均移动速度（像素/秒）")
+    mouse_speed_cv = Column(Float, comment="速度变异系数（标准差/均值）")
+    mouse_accel_mean = Column(Float, comment="平均加速度绝对值（像素/秒²）")
+    mouse_curvature = Column(Float, comment="平均转向角（弧度）")
+    mouse_straightness = Column(Float, comment="直线度（首尾距离/路径长度，1 为直线）")
+    mouse_interval_entropy = Column(Float, comment="采样间隔熵（0-1）")
+    mouse_direction_entropy = Column(Float, comment="移动方向熵（0-1）")
+    mouse_pause_count = Column(Integer, comment="停顿次数")
+    mouse_analyzed_at = Column(DateTime, comment="轨迹特征分析时间")
 
     # 分析字段
-    is_bot = Column(Boolean, default=False, index=True, comment="是否机器人")
-    authenticity_score = Column(Float, default=0.0, index=True, comment="真实性评分 0-100")
-    fingerprint_hash = Column(String(64), nullable=False, index=True, comment="综合指纹哈希")
-
-    # 元数据
-    raw_data = Column(Text, comment="原始数据备份（JSON）")
-
-    # 复合索引 - 优化常用查询
+    is_bot = Column(Boolean, default=False, comment="是否机器人")
+    authenticity_score = Column(Float, default=0.0, comment="真实性评分 0-100")
+    fingerprint_hash = Column(String(64), nullable=False, comment="综合指纹哈希")
+    device_id = Column(String(64), comment="设备标识（不含 IP 的指纹哈希）")
+
+    # 复合索引 - 按 scripts/check_query_plans.py 的执行计划设计
+    # 管理后台的查询几乎都按时间范围筛选，索引以 timestamp 开头并包含统计用到的列（覆盖索引，不回表）；
+    # 每个索引都会增加写入开销，不再为单列建索引
     __table_args__ = (
-        # 用于按时间和设备类型筛选（admin visits list）
-        Index('idx_timestamp_device', timestamp, device_type),
+        # 访问列表（按时间倒序翻页，设备类型 / 评分筛选）、统计摘要、访问趋势、设备统计、分钟分布
+        Index('idx_timestamp_stats', timestamp, device_type, is_bot, authenticity_score, browser, os),
+
+        # 地理位置统计和访问者本地时间分布
+        Index('idx_timestamp_location', timestamp, ip_country, ip_city, timezone),
 
-        # 用于按时间和评分筛选
-        Index('idx_timestamp_score', timestamp, authenticity_score),
+        # 来源渠道统计
+        Index('idx_timestamp_referrer', timestamp, referrer_channel, referrer_domain),
 
-        # 用于地理位置统计
-        Index('idx_location', ip_country, ip_city),
+        # 设备详情中的最近访问
+        Index('idx_device_timestamp', device_id, timestamp),
 
-        # 用于机器人检测和时间筛选
-        Index('idx_timestamp_bot', timestamp, is_bot),
+        # 启动时重新加入有轨迹但尚未分析的访问（mouse_analyzed_at 为空且 mouse_seq_next > 0）
+        Index('idx_mouse_pending', mouse_analyzed_at, mouse_seq_next),
     )
 
     def __repr__(self):
@@ -173,4 +195,19 @@ class Visit(Base):
             "authenticity_score": self.authenticity_score,
             "stay_duration": self.stay_duration,
             "scroll_depth": self.scroll_depth,
+            "is_bot": self.is_bot,
         }
+
+
+class VisitPayload(Base):
+    """访问记录的大字段（与 visits 一对一，按主键读取）"""
+
+    __tablename__ = "visit_payloads"
+
+    visit_pk = Column(Integer, primary_key=True, comment="访问记录主键（visits.id）")
+    mouse_trajectory = Column(LargeBinary, comment="鼠标轨迹（增量 varint 编码）")
+    mouse_movements = Column(Text, comment="鼠标轨迹（旧 JSON 格式，迁移后为空）")
+    raw_data = Column(Text, comment="原始数据备份（JSON）")
+
+    def __repr__(self):
+        return f"<VisitPayload {self.visit_pk}>"
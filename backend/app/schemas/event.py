@@ -0,0 +1,59 @@
+"""
+批量上报相关的 Pydantic Schema
+一次请求包含多个事件（访问、行为、自定义事件），整个请求体用一个 TypeAdapter 一次性校验
+"""
+from pydantic import BaseModel, Field, TypeAdapter, model_validator
+from typing import Annotated, Optional, Dict, Any, List, Literal, Union
+from app.config import settings
+from app.schemas.visit import VisitCreate, BehaviorData
+
+
+class BatchVisitEvent(BaseModel):
+    """访问事件：创建访问记录"""
+
+    type: Literal["visit"]
+    ref: Optional[str] = Field(
+        None,
+        max_length=64,
+        description="批内引用名，同一批中的后续事件可用 visit_ref 指向该访问"
+    )
+    data: VisitCreate
+
+
+class _VisitTarget(BaseModel):
+    """指向已有访问（visit_id）或同批新建访问（visit_ref）的事件"""
+
+    visit_id: Optional[str] = Field(None, max_length=36, description="访问记录的唯一ID")
+    visit_ref: Optional[str] = Field(None, max_length=64, description="同一批中访问事件的 ref")
+
+    @model_validator(mode="after")
+    def _check_target(self):
+        if not self.visit_id and not self.visit_ref:
+            raise ValueError("visit_id 和 visit_ref 至少需要一个")
+        return self
+
+
+class BatchBehaviorEvent(_VisitTarget, BehaviorData):
+    """行为事件：更新停留时间、滚动深度和鼠标轨迹"""
+
+    type: Literal["behavior"]
+
+
+class BatchCustomEvent(_VisitTarget):
+    """自定义事件：页面上报的业务事件（点击、表单提交等）"""
+
+    type: Literal["custom"]
+    name: str = Field(..., min_length=1, max_length=100, description="事件名称")
+    properties: Optional[Dict[str, Any]] = Field(None, description="事件属性")
+    t: Optional[int] = Field(None, ge=0, description="事件发生时间（相对页面加载的毫秒数）")
+
+
+BatchEvent = Annotated[
+    Union[BatchVisitEvent, BatchBehaviorEvent, BatchCustomEvent],
+    Field(discriminator="type")
+]
+
+# 批量上报请求体校验器（模块加载时构建一次，按 type 字段直接分派到对应模型）
+batch_events_adapter = TypeAdapter(
+    Annotated[List[BatchEvent], Field(min_length=1, max_length=settings.TRACK_BATCH_MAX_EVENTS)]
+)
@@ -122,13 +122,28 @@ class VisitCreate(BaseModel):
         }
 
 
-class BehaviorUpdate(BaseModel):
-    """更新行为数据的请求体"""
+class BehaviorData(BaseModel):
+    """行为数据字段（单独上报和批量上报共用）"""
 
-    visit_id: str = Field(..., description="访问记录的唯一ID")
     stay_duration: Optional[int] = Field(None, ge=0, description="停留时间（秒）")
     scroll_depth: Optional[int] = Field(None, ge=0, le=100, description="滚动深度（%）")
     mouse_movements: Optional[str] = Field(None, description="鼠标轨迹（JSON字符串）")
+    mouse_packed: Optional[str] = Field(
+        None,
+        description="鼠标轨迹（紧凑格式：base64url 编码的增量 varint 二进制，优先于 mouse_movements）"
+    )
+    mouse_seq: Optional[int] = Field(
+        None,
+        ge=0,
+        le=2 ** 31 - 1,
+        description="增量上报时本批第一个采样的序号；不传时按旧协议用本次轨迹覆盖已有轨迹"
+    )
+
+
+class BehaviorUpdate(BehaviorData):
+    """更新行为数据的请求体"""
+
+    visit_id: str = Field(..., description="访问记录的唯一ID")
 
     class Config:
         json_schema_extra = {
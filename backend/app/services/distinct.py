@@ -0,0 +1,281 @@
+"""
+近似去重统计
+按小时维护 IP / 指纹 / Canvas 指纹的 HyperLogLog 草图，任意时间范围合并后估算去重数量
+
+写入时只更新内存中的当前小时草图；草图由后台任务每 HLL_FLUSH_SECONDS 秒（以及读取前、
+应用关闭时）合并写入数据库。合并按寄存器取最大值，重复写入和多进程各自写入都不会重复计数
+
+估算时需要合并时间范围内的全部小时草图（90 天约 6600 个），解压和合并在线程中执行，不阻塞事件循环
+
+草图无法减去已删除的值：清理访问记录后由剩余访问重建受影响小时的草图（rebuild），清空时直接删除（clear）
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.core.database import async_session_maker
+from app.crud import visit as visit_crud
+from app.models.sketch import DistinctSketch
+from app.utils.hll import HyperLogLog
+
+# 删除草图时 IN 查询每批的小时数
+_DELETE_CHUNK = 500
+
+# 统计对象
+METRIC_IP = "ip"
+METRIC_FINGERPRINT = "fingerprint"
+METRIC_CANVAS = "canvas"
+METRICS = (METRIC_IP, METRIC_FINGERPRINT, METRIC_CANVAS)
+
+
+def hour_bucket(when: datetime) -> datetime:
+    """截断到小时"""
+    return when.replace(minute=0, second=0, microsecond=0)
+
+
+class DistinctCounter:
+    """按小时分桶的去重计数器"""
+
+    def __init__(self, precision: int, flush_interval: int):
+        self.precision = precision
+        self.flush_interval = flush_interval
+        self._pending: Dict[Tuple[str, datetime], HyperLogLog] = {}
+        self._last_flush = time.monotonic()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """启动定期写入任务"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """停止定期写入并写入剩余草图"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await flush_distinct_counter()
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await flush_distinct_counter()
+
+    def record(
+        self,
+        ip_address: Optional[str],
+        fingerprint_hash: Optional[str],
+        canvas_fingerprint: Optional[str],
+        when: Optional[datetime] = None
+    ):
+        """
+        记录一次访问
+
+        Args:
+            ip_address: IP 地址
+            fingerprint_hash: 综合指纹哈希
+            canvas_fingerprint: Canvas 指纹
+            when: 访问时间（UTC），默认当前时间
+        """
+        bucket = hour_bucket(when or datetime.utcnow())
+
+        for metric, value in (
+            (METRIC_IP, ip_address),
+            (METRIC_FINGERPRINT, fingerprint_hash),
+            (METRIC_CANVAS, canvas_fingerprint),
+        ):
+            if not value:
+                continue
+            key = (metric, bucket)
+            sketch = self._pending.get(key)
+            if sketch is None:
+                sketch = self._pending[key] = HyperLogLog(self.precision)
+            sketch.add(value)
+
+    @property
+    def pending_count(self) -> int:
+        """待写入数据库的草图数"""
+        return len(self._pending)
+
+    def flush_due(self) -> bool:
+        """是否到了写入数据库的时间"""
+        return bool(self._pending) and time.monotonic() - self._last_flush >= self.flush_interval
+
+    async def flush(self, db: Optional[AsyncSession] = None):
+        """
+        将内存中的草图合并写入数据库
+
+        Args:
+            db: 数据库会话，默认新建会话
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return
+
+            pending, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+
+            try:
+                if db is None:
+                    async with async_session_maker() as session:
+                        await self._write(session, pending)
+                else:
+                    await self._write(db, pending)
+            except Exception:
+                # 写入失败时放回内存，下次再试
+                for key, sketch in pending.items():
+                    if key in self._pending:
+                        self._pending[key].merge(sketch)
+                    else:
+                        self._pending[key] = sketch
+                raise
+
+    async def _write(self, db: AsyncSession, pending: Dict[Tuple[str, datetime], HyperLogLog]):
+        """合并写入（读取已有草图取最大值后覆盖）"""
+        buckets = {bucket for _, bucket in pending}
+        stmt = select(DistinctSketch).where(DistinctSketch.bucket_start.in_(buckets))
+        result = await db.execute(stmt)
+        existing = {(row.metric, row.bucket_start): row for row in result.scalars()}
+
+        for (metric, bucket), sketch in pending.items():
+            row = existing.get((metric, bucket))
+            if row is None:
+                db.add(DistinctSketch(metric=metric, bucket_start=bucket, registers=sketch.to_bytes()))
+            else:
+                merged = HyperLogLog.from_bytes(row.registers)
+                merged.merge(sketch)
+                row.registers = merged.to_bytes()
+
+        await db.commit()
+
+    async def estimate(self, db: AsyncSession, start: datetime, end: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        估算时间范围内的去重数量
+
+        Args:
+            db: 数据库会话
+            start: 起始时间（UTC，按小时向下取整）
+            end: 结束时间（UTC，不含），默认不限
+
+        Returns:
+            dict: 每个统计对象的去重数量估计
+        """
+        try:
+            await self.flush()
+        except Exception as e:
+            # 写入失败的草图已放回内存，下面会一并合并
+            print(f"[WARN] 去重草图写入失败: {str(e)}")
+
+        start = hour_bucket(start)
+        stmt = select(DistinctSketch.metric, DistinctSketch.registers).where(
+            DistinctSketch.bucket_start >= start
+        )
+        if end is not None:
+            stmt = stmt.where(DistinctSketch.bucket_start < end)
+
+        serialized: Dict[str, List[bytes]] = {metric: [] for metric in METRICS}
+
+        result = await db.execute(stmt)
+        for metric, registers in result:
+            if metric in serialized:
+                serialized[metric].append(registers)
+
+        # 刷新之后新到达、尚未写入的访问
+        for (metric, bucket), sketch in list(self._pending.items()):
+            if bucket >= start and (end is None or bucket < end):
+                serialized[metric].append(sketch.to_bytes())
+
+        return await asyncio.to_thread(self._count_union, serialized)
+
+    async def clear(self):
+        """删除全部草图（清空访问记录后）"""
+        async with self._flush_lock:
+            self._pending = {}
+            async with async_session_maker() as db:
+                await db.execute(delete(DistinctSketch))
+                await db.commit()
+
+    async def rebuild(self, hours: Iterable[datetime]) -> int:
+        """
+        由剩余访问重建指定小时的草图（删除访问记录后）
+
+        先丢弃内存中和数据库中这些小时的草图：内存中的访问都已提交，逐小时重新读取时会读到；
+        重建期间新到达的访问照常记录，写入时按寄存器合并
+
+        Args:
+            hours: 小时桶起始时间（UTC）
+
+        Returns:
+            int: 重建的小时数
+        """
+        hours = sorted(set(hours))
+        if not hours:
+            return 0
+
+        async with self._flush_lock:
+            hour_set = set(hours)
+            for key in [key for key in self._pending if key[1] in hour_set]:
+                del self._pending[key]
+            async with async_session_maker() as db:
+                for i in range(0, len(hours), _DELETE_CHUNK):
+                    await db.execute(
+                        delete(DistinctSketch).where(DistinctSketch.bucket_start.in_(hours[i:i + _DELETE_CHUNK]))
+                    )
+                await db.commit()
+
+        for hour in hours:
+            async with async_session_maker() as db:
+                rows = await visit_crud.get_distinct_values(db, hour, hour + timedelta(hours=1))
+            if not rows:
+                continue
+            sketches = await asyncio.to_thread(self._build_sketches, hour, rows)
+            async with self._flush_lock:
+                async with async_session_maker() as db:
+                    await self._write(db, sketches)
+        return len(hours)
+
+    def _build_sketches(self, hour: datetime, rows) -> Dict[Tuple[str, datetime], HyperLogLog]:
+        """一个小时内访问的草图（在线程中执行）"""
+        sketches: Dict[Tuple[str, datetime], HyperLogLog] = {}
+        for row in rows:
+            for metric, value in zip(METRICS, row):
+                if not value:
+                    continue
+                sketch = sketches.get((metric, hour))
+                if sketch is None:
+                    sketch = sketches[(metric, hour)] = HyperLogLog(self.precision)
+                sketch.add(value)
+        return sketches
+
+    def _count_union(self, serialized: Dict[str, List[bytes]]) -> Dict[str, int]:
+        """合并每个统计对象的草图并估算（在线程中执行）"""
+        return {
+            metric: HyperLogLog.union(blobs, self.precision).count()
+            for metric, blobs in serialized.items()
+        }
+
+    @property
+    def standard_error(self) -> float:
+        """估计值的理论标准误差"""
+        return HyperLogLog(self.precision).standard_error
+
+
+# 全局去重计数器实例
+distinct_counter = DistinctCounter(
+    precision=settings.HLL_PRECISION,
+    flush_interval=settings.HLL_FLUSH_SECONDS,
+)
+
+
+async def flush_distinct_counter():
+    """后台任务：写入草图，失败时只记录日志"""
+    try:
+        await distinct_counter.flush()
+    except Exception as e:
+        print(f"[WARN] 去重草图写入失败: {str(e)}")
@@ -0,0 +1,80 @@
+"""
+追踪数据写入后的处理
+访问记录 / 行为数据提交到数据库后更新实时指标、推送给管理后台、更新去重草图和轨迹分析队列；
+追踪接口和写入日志的后台加载任务共用
+"""
+from types import SimpleNamespace
+
+from fastapi import BackgroundTasks
+
+from app.models.visit import Visit
+from app.models.event import CustomEvent
+from app.schemas.visit import VisitCreate
+from app.services.live import live_hub
+from app.services.realtime import realtime_stats
+from app.services.response_cache import bump_data_version
+from app.services.distinct import distinct_counter, flush_distinct_counter
+from app.services.mouse_features import trajectory_analyzer, flush_trajectory_analyzer
+from app.services.scoring import SCORING_FIELDS, scoring_engine
+from app.utils.ua import parse_user_agent
+
+
+def after_visit(visit: Visit, background_tasks: BackgroundTasks):
+    """访问记录提交后：更新实时指标、推送给管理后台、更新去重草图、使统计缓存失效"""
+    bump_data_version()
+    realtime_stats.record_visit(visit.visit_id, visit.is_bot)
+    live_hub.publish("visit", visit.to_dict())
+
+    # 更新去重草图，到期后在响应发送后写入数据库
+    distinct_counter.record(visit.ip_address, visit.fingerprint_hash, visit.canvas_fingerprint)
+    if distinct_counter.flush_due():
+        background_tasks.add_task(flush_distinct_counter)
+    if trajectory_analyzer.flush_due():
+        background_tasks.add_task(flush_trajectory_analyzer)
+
+
+def after_behavior(visit: Visit, background_tasks: BackgroundTasks):
+    """行为数据提交后：更新实时指标、推送给管理后台、轨迹加入分析队列、使统计缓存失效"""
+    bump_data_version()
+    realtime_stats.record_behavior(visit.visit_id)
+    live_hub.publish("behavior", {
+        "visit_id": visit.visit_id,
+        "stay_duration": visit.stay_duration,
+        "scroll_depth": visit.scroll_depth,
+        "ip_changed": visit.ip_changed,
+        "authenticity_score": visit.authenticity_score,
+    })
+
+    # 轨迹有更新时加入分析队列，攒够一批或等待超时后在响应发送后批量分析
+    # （轨迹存放在 visit_payloads，这里只看已接收的采样数，不读取轨迹）
+    if visit.mouse_seq_next and visit.mouse_analyzed_at is None:
+        trajectory_analyzer.enqueue(visit.id)
+    if trajectory_analyzer.flush_due():
+        background_tasks.add_task(flush_trajectory_analyzer)
+
+
+def after_custom_event(event: CustomEvent):
+    """自定义事件提交后：推送给管理后台、使统计缓存失效"""
+    bump_data_version()
+    live_hub.publish("event", {"visit_id": event.visit_id, "name": event.name})
+
+
+def preview_visit(visit_data: VisitCreate) -> dict:
+    """
+    不访问数据库时的访问预览（写入日志模式下用于立即响应）
+
+    评分不含 IP 地理位置相关的项，写入数据库时按完整数据重新计算
+
+    Returns:
+        dict: device_type、is_bot、authenticity_score
+    """
+    ua_info = parse_user_agent(visit_data.user_agent)
+    row = SimpleNamespace(**{field: getattr(visit_data, field, None) for field in SCORING_FIELDS})
+    row.os = ua_info["os"]
+    row.is_bot = ua_info["is_bot"]
+
+    return {
+        "device_type": ua_info["device_type"],
+        "is_bot": ua_info["is_bot"],
+        "authenticity_score": scoring_engine.score(row),
+    }
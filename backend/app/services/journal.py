@@ -0,0 +1,685 @@
+"""
+追踪数据写入日志（ingest journal）
+开启 INGEST_JOURNAL 后，追踪接口校验通过的访问 / 行为 / 自定义事件只追加到本地日志文件就返回，
+不再等待数据库；后台加载任务按批读取日志，每批在一个事务中写入数据库并记录检查点
+
+- 日志按分段文件存储（segment-000000000001.log ...），每行一条 JSON 记录，
+  分段达到 JOURNAL_SEGMENT_BYTES 后切换到新分段，已全部写入数据库的分段会被删除
+- 追加只是一次 write 系统调用，由后台任务每 JOURNAL_FSYNC_SECONDS 秒 fsync 一次，
+  进程崩溃时最多丢失这段时间内的记录
+- 检查点（分段号 + 偏移）在每批提交后保存；启动时从检查点开始重放尚未写入的记录。
+  提交后、保存检查点前崩溃会重放同一批记录：访问记录按预分配的 visit_id、
+  自定义事件按接收时分配的 event_id 跳过已存在的，行为数据重复写入结果相同
+- 数据库暂时不可用（锁定、连接失败）时保留检查点稍后重试；其他错误时逐条写入，
+  写不进去的记录转存到 rejected.log 后跳过，不会卡住后续记录
+
+日志目录只能由一个进程使用：打开日志时对目录中的 journal.lock 加排他文件锁，直到关闭。
+多进程部署（uvicorn --workers）时启动重放只由拿到锁的进程执行，其他进程跳过；
+开启 INGEST_JOURNAL 时每个进程需配置不同的 JOURNAL_DIR，否则后启动的进程启动失败
+
+hold() 只改变当前进程的写入路径。SQLite 独占操作（应用内迁移建索引、清理后的 full VACUUM）
+使用 hold_exclusive()：未开启 INGEST_JOURNAL 时要求当前进程是唯一的工作进程
+（每个进程启动时在 processes.lock 上登记共享锁），否则拒绝执行
+"""
+import asyncio
+import os
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+from fastapi import BackgroundTasks
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.core.database import async_session_maker
+from app.crud import event as event_crud
+from app.crud import visit as visit_crud
+from app.models.visit import Visit
+from app.schemas.visit import VisitCreate, BehaviorUpdate
+from app.services.ingest import after_visit, after_behavior, after_custom_event
+from app.utils.geolocation import get_ip_geolocation
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# 记录类型
+RECORD_VISIT = "visit"
+RECORD_BEHAVIOR = "behavior"
+RECORD_CUSTOM = "custom"
+
+_SEGMENT_PREFIX = "segment-"
+_SEGMENT_SUFFIX = ".log"
+_CHECKPOINT_FILE = "checkpoint.json"
+_REJECTED_FILE = "rejected.log"
+_LOCK_FILE = "journal.lock"
+_PROCESSES_FILE = "processes.lock"
+
+# 每次从分段读取的最大字节数
+_READ_CHUNK = 4 * 1024 * 1024
+
+# 数据库不可用时的最长重试间隔（秒）
+_RETRY_MAX_SECONDS = 30
+
+# hold() 等待其他进程释放日志目录的检查间隔（秒）
+_LOCK_WAIT_SECONDS = 0.5
+
+
+class JournalLockedError(RuntimeError):
+    """日志目录已被其他进程使用"""
+
+
+class MultipleWorkersError(RuntimeError):
+    """有其他工作进程在运行，无法暂存它们的追踪数据"""
+
+
+def visit_record(visit_id: str, ip_address: str, visit_data: VisitCreate) -> Dict:
+    """访问记录（visit_id 在接收时分配并返回给客户端）"""
+    return {
+        "type": RECORD_VISIT,
+        "at": datetime.utcnow().isoformat(),
+        "ip": ip_address,
+        "visit_id": visit_id,
+        "data": visit_data.model_dump(mode="json", exclude_none=True),
+    }
+
+
+def behavior_record(ip_address: str, behavior_data: BehaviorUpdate) -> Dict:
+    """行为数据记录"""
+    return {
+        "type": RECORD_BEHAVIOR,
+        "at": datetime.utcnow().isoformat(),
+        "ip": ip_address,
+        "data": behavior_data.model_dump(mode="json", exclude_none=True),
+    }
+
+
+def custom_record(visit_id: str, name: str, properties: Optional[Dict], page_time: Optional[int]) -> Dict:
+    """自定义事件记录"""
+    return {
+        "type": RECORD_CUSTOM,
+        "at": datetime.utcnow().isoformat(),
+        "event_id": str(uuid.uuid4()),
+        "visit_id": visit_id,
+        "name": name,
+        "properties": properties,
+        "t": page_time,
+    }
+
+
+def expected_mouse_ack(behavior_data: BehaviorUpdate) -> int:
+    """
+    写入日志时的鼠标轨迹确认序号
+
+    增量上报的批次写入数据库时总会被确认（重复部分去重、空缺直接接受、超过上限也确认序号），
+    因此记录写入日志后即可按本批末尾确认；格式错误的批次不确认
+    """
+    if behavior_data.mouse_seq is None:
+        return 0
+    points = visit_crud.parse_mouse_points(behavior_data)
+    if points is None:
+        return behavior_data.mouse_seq
+    return behavior_data.mouse_seq + len(points)
+
+
+async def load_records(db: AsyncSession, records: List[Dict]) -> Dict[str, int]:
+    """
+    在一个事务中把一批日志记录写入数据库，提交后执行实时指标、推送等后续处理
+
+    Args:
+        db: 数据库会话
+        records: 日志记录（按接收顺序）
+
+    Returns:
+        dict: 写入数和跳过数（已存在的访问 / 自定义事件、访问不存在的行为 / 自定义事件）
+    """
+    # 并发预取地理位置（结果进入缓存，逐条创建访问时不再等待外部接口）
+    ips = {record["ip"] for record in records if record["type"] == RECORD_VISIT}
+    await asyncio.gather(*(get_ip_geolocation(ip) for ip in ips), return_exceptions=True)
+
+    # 一次查询确认访问是否存在（重放时跳过已写入的访问）
+    known_ids = await event_crud.existing_visit_ids(
+        db, (record["visit_id"] for record in records if record["type"] in (RECORD_VISIT, RECORD_CUSTOM))
+    )
+    # 重放时跳过已写入的自定义事件（没有 event_id 的旧记录不去重）
+    known_events = await event_crud.existing_event_ids(
+        db, (record.get("event_id") for record in records if record["type"] == RECORD_CUSTOM)
+    )
+
+    created = {}
+    updated = {}
+    custom = []
+    skipped = 0
+
+    for record in records:
+        kind = record["type"]
+        if kind == RECORD_VISIT:
+            if record["visit_id"] in known_ids:
+                skipped += 1
+                continue
+            visit = await visit_crud.create_visit(
+                db,
+                VisitCreate.model_validate(record["data"]),
+                record["ip"],
+                commit=False,
+                visit_id=record["visit_id"],
+                timestamp=datetime.fromisoformat(record["at"])
+            )
+            known_ids.add(visit.visit_id)
+            created[visit.id] = visit
+        elif kind == RECORD_BEHAVIOR:
+            visit = await visit_crud.update_behavior(
+                db, BehaviorUpdate.model_validate(record["data"]), record["ip"], commit=False
+            )
+            if not visit:
+                skipped += 1
+                continue
+            updated[visit.id] = visit
+        elif kind == RECORD_CUSTOM:
+            event_id = record.get("event_id")
+            if record["visit_id"] not in known_ids or event_id in known_events:
+                skipped += 1
+                continue
+            custom.append(event_crud.add_custom_event(
+                db, record["visit_id"], record["name"], record.get("properties"), record.get("t"),
+                event_id=event_id
+            ))
+            if event_id:
+                known_events.add(event_id)
+        else:
+            raise ValueError(f"unknown journal record type: {kind}")
+
+    await db.commit()
+
+    # 重新加载数据库生成的字段，一次查询
+    touched = {**created, **updated}
+    if touched:
+        await db.execute(
+            select(Visit)
+            .where(Visit.id.in_(list(touched)))
+            .execution_options(populate_existing=True)
+        )
+
+    background_tasks = BackgroundTasks()
+    for visit in created.values():
+        after_visit(visit, background_tasks)
+    for visit in updated.values():
+        after_behavior(visit, background_tasks)
+    for event in custom:
+        after_custom_event(event)
+    await background_tasks()
+
+    return {"loaded": len(records) - skipped, "skipped": skipped}
+
+
+def _fsync_close(file):
+    file.flush()
+    os.fsync(file.fileno())
+    file.close()
+
+
+def _try_lock(file) -> bool:
+    """对文件加排他锁（不等待），已被其他进程锁定时返回 False"""
+    try:
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+def _unlock_close(file):
+    try:
+        if fcntl is not None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+        else:
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+    finally:
+        file.close()
+
+
+class IngestJournal:
+    """分段追加写入日志 + 后台批量加载"""
+
+    def __init__(
+        self,
+        directory: str,
+        segment_bytes: int,
+        fsync_interval: float,
+        batch_size: int,
+        load_interval: float
+    ):
+        self.directory = Path(directory)
+        self.segment_bytes = segment_bytes
+        self.fsync_interval = fsync_interval
+        self.batch_size = batch_size
+        self.load_interval = load_interval
+
+        self.running = False
+        self._file = None
+        self._lock_file = None
+        self._process_file = None
+        self._segment = 0
+        self._size = 0
+        self._dirty = False
+        self._checkpoint: Tuple[int, int] = (0, 0)
+        self._sync_lock = asyncio.Lock()
+        self._tasks: List[asyncio.Task] = []
+        self._closing: set = set()
+        # 临时开启（hold）的嵌套数
+        self._holds = 0
+        self._held = False
+
+        # 统计
+        self.appended_count = 0
+        self.loaded_count = 0
+        self.skipped_count = 0
+        self.rejected_count = 0
+        self.last_error: Optional[str] = None
+        self.last_loaded_at: Optional[datetime] = None
+
+    def _segment_path(self, segment: int) -> Path:
+        return self.directory / f"{_SEGMENT_PREFIX}{segment:012d}{_SEGMENT_SUFFIX}"
+
+    def _segments(self) -> List[int]:
+        """已存在的分段号（升序）"""
+        segments = []
+        for path in self.directory.glob(f"{_SEGMENT_PREFIX}*{_SEGMENT_SUFFIX}"):
+            try:
+                segments.append(int(path.name[len(_SEGMENT_PREFIX):-len(_SEGMENT_SUFFIX)]))
+            except ValueError:
+                continue
+        return sorted(segments)
+
+    def _open_segment(self, segment: int):
+        # 无缓冲：每次追加直接写入操作系统，加载任务立即可读
+        self._file = open(self._segment_path(segment), "ab", buffering=0)
+        self._segment = segment
+        self._size = 0
+
+    def _rotate(self):
+        """切换到新分段，旧分段在后台 fsync 后关闭"""
+        old = self._file
+        self._open_segment(self._segment + 1)
+        task = asyncio.get_running_loop().create_task(self._close_segment(old))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _close_segment(self, file):
+        async with self._sync_lock:
+            await asyncio.to_thread(_fsync_close, file)
+
+    def append(self, records: List[Dict]):
+        """
+        追加记录（一次写入，不等待 fsync）
+
+        Args:
+            records: 日志记录，由 visit_record / behavior_record / custom_record 构造
+        """
+        data = b"".join(orjson.dumps(record) + b"\n" for record in records)
+        self._file.write(data)
+        self._size += len(data)
+        self._dirty = True
+        self.appended_count += len(records)
+
+        if self._size >= self.segment_bytes:
+            self._rotate()
+
+    async def sync(self):
+        """把已追加的记录 fsync 到磁盘"""
+        if not self._dirty:
+            return
+        self._dirty = False
+        file = self._file
+        async with self._sync_lock:
+            await asyncio.to_thread(os.fsync, file.fileno())
+
+    async def _sync_loop(self):
+        while True:
+            await asyncio.sleep(self.fsync_interval)
+            try:
+                await self.sync()
+            except Exception as e:
+                print(f"[WARN] 写入日志 fsync 失败: {str(e)}")
+
+    def _read_checkpoint(self) -> Tuple[int, int]:
+        try:
+            data = orjson.loads((self.directory / _CHECKPOINT_FILE).read_bytes())
+            return int(data["segment"]), int(data["offset"])
+        except FileNotFoundError:
+            return 0, 0
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"[WARN] 写入日志检查点损坏，从最早的分段开始重放: {str(e)}")
+            return 0, 0
+
+    def _save_checkpoint(self, segment: int, offset: int):
+        """保存检查点（先写临时文件再替换，不会留下写了一半的检查点）"""
+        self._checkpoint = (segment, offset)
+        path = self.directory / _CHECKPOINT_FILE
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(orjson.dumps({"segment": segment, "offset": offset}))
+        os.replace(tmp, path)
+
+    def _reject(self, record, error: Exception):
+        """无法写入数据库的记录转存到 rejected.log"""
+        self.rejected_count += 1
+        print(f"[WARN] 写入日志记录无法写入数据库，已转存: {str(error)}")
+        with open(self.directory / _REJECTED_FILE, "ab") as f:
+            f.write(orjson.dumps({"error": str(error), "record": record}) + b"\n")
+
+    def _read_lines(self, segment: int, offset: int) -> Tuple[List[bytes], int]:
+        """从分段读取最多 batch_size 条完整记录，返回记录和读取的字节数（末尾不完整的行不读取）"""
+        with open(self._segment_path(segment), "rb") as f:
+            f.seek(offset)
+            chunk = f.read(_READ_CHUNK)
+
+        lines = chunk.split(b"\n")[:-1][:self.batch_size]
+        consumed = sum(len(line) + 1 for line in lines)
+
+        # 单条记录超过读取上限（不应出现），整块跳过以免卡住
+        if not lines and len(chunk) == _READ_CHUNK:
+            self._reject(chunk[:200].decode(errors="replace"), ValueError("record too large"))
+            return [], len(chunk)
+
+        return lines, consumed
+
+    async def _load_batch(self, records: List[Dict]):
+        """写入一批记录；数据库不可用时抛出 OperationalError，其他错误逐条写入并跳过失败的记录"""
+        try:
+            async with async_session_maker() as db:
+                result = await load_records(db, records)
+            self.loaded_count += result["loaded"]
+            self.skipped_count += result["skipped"]
+            return
+        except OperationalError:
+            raise
+        except Exception as e:
+            if len(records) == 1:
+                self._reject(records[0], e)
+                return
+
+        for record in records:
+            await self._load_batch([record])
+
+    async def load_once(self) -> bool:
+        """
+        加载下一批记录
+
+        Returns:
+            bool: 是否还有可立即加载的记录
+        """
+        segment, offset = self._checkpoint
+        pending = [s for s in self._segments() if s >= segment]
+        if not pending:
+            return False
+        if pending[0] != segment:
+            segment, offset = pending[0], 0
+
+        lines, consumed = await asyncio.to_thread(self._read_lines, segment, offset)
+
+        if not lines:
+            if consumed:
+                self._save_checkpoint(segment, offset + consumed)
+                return True
+            # 写入中的分段等待新记录
+            if self.running and segment >= self._segment:
+                return False
+            # 已关闭的分段加载完成（崩溃时末尾写了一半的记录无法恢复），删除后继续下一个分段
+            self._segment_path(segment).unlink(missing_ok=True)
+            self._save_checkpoint(segment + 1, 0)
+            return len(pending) > 1
+
+        records = []
+        for line in lines:
+            try:
+                records.append(orjson.loads(line))
+            except orjson.JSONDecodeError as e:
+                self._reject(line.decode(errors="replace"), e)
+
+        if records:
+            await self._load_batch(records)
+
+        self._save_checkpoint(segment, offset + consumed)
+        self.last_loaded_at = datetime.utcnow()
+        self.last_error = None
+        # 已关闭的分段继续读到末尾，写入中的分段不足一批时等待新记录
+        return len(lines) >= self.batch_size or not self.running or segment < self._segment
+
+    async def _load_loop(self):
+        retry_delay = self.load_interval
+        while True:
+            try:
+                more = await self.load_once()
+                retry_delay = self.load_interval
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # 数据库不可用：保留检查点，逐步延长重试间隔
+                self.last_error = str(e).splitlines()[0] if str(e) else type(e).__name__
+                print(f"[WARN] 写入日志加载失败，{retry_delay:g} 秒后重试: {self.last_error}")
+                await asyncio.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, _RETRY_MAX_SECONDS)
+                continue
+
+            if not more:
+                await asyncio.sleep(self.load_interval)
+
+    def _acquire_lock(self) -> bool:
+        """对日志目录加锁（进程持有期间其他进程不能打开同一目录）"""
+        if self._lock_file is not None:
+            return True
+        self.directory.mkdir(parents=True, exist_ok=True)
+        file = open(self.directory / _LOCK_FILE, "a+b")
+        if not _try_lock(file):
+            file.close()
+            return False
+        self._lock_file = file
+        return True
+
+    def _release_lock(self):
+        if self._lock_file is not None:
+            _unlock_close(self._lock_file)
+            self._lock_file = None
+
+    async def start(self):
+        """
+        打开新分段并启动 fsync 和加载任务；上次未加载完的分段从检查点开始重放
+
+        Raises:
+            JournalLockedError: 日志目录已被其他进程使用
+        """
+        if self.running:
+            return
+        if not self._acquire_lock():
+            raise JournalLockedError(
+                f"写入日志目录 {self.directory} 已被其他进程使用，多进程部署时每个进程需配置不同的 JOURNAL_DIR"
+            )
+
+        segments = self._segments()
+        self._checkpoint = self._read_checkpoint()
+        if segments:
+            print(f"[INFO] 写入日志: 发现 {len(segments)} 个未加载完的分段，开始重放")
+
+        # 总是写入新分段：上次崩溃时最后一个分段末尾可能有写了一半的记录；
+        # 分段号不小于检查点，已加载完删除的分段之后不会重新从 1 开始
+        self._open_segment(max([self._checkpoint[0], 1] + [s + 1 for s in segments[-1:]]))
+        self.running = True
+        self._tasks = [
+            asyncio.create_task(self._sync_loop()),
+            asyncio.create_task(self._load_loop()),
+        ]
+
+    async def stop(self, drain_timeout: float = 5.0):
+        """停止接收，尽量加载剩余记录（未加载的部分下次启动时重放），fsync 并关闭分段"""
+        if not self.running:
+            return
+        self.running = False
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        # 先关闭全部分段（Windows 下打开中的文件无法删除）
+        await asyncio.gather(*self._closing, return_exceptions=True)
+        async with self._sync_lock:
+            await asyncio.to_thread(_fsync_close, self._file)
+        self._file = None
+
+        try:
+            await asyncio.wait_for(self._drain(), drain_timeout)
+        except Exception as e:
+            print(f"[WARN] 写入日志停止前未加载完，下次启动时重放: {str(e) or type(e).__name__}")
+        finally:
+            self._release_lock()
+
+    async def _drain(self):
+        while await self.load_once():
+            pass
+
+    @asynccontextmanager
+    async def hold(self):
+        """
+        数据库长时间持有写锁期间（SQLite 建索引、VACUUM 等）临时开启写入日志：
+        追踪数据先追加到日志，加载任务遇到数据库锁定会等待重试；
+        最后一个 hold 结束时关闭并加载剩余记录（INGEST_JOURNAL 开启的写入日志不会被关闭）；
+        日志目录被其他进程使用（启动重放）时等待其释放
+        """
+        if not self.running:
+            while not self._acquire_lock():
+                await asyncio.sleep(_LOCK_WAIT_SECONDS)
+            await self.start()
+            self._held = True
+        self._holds += 1
+        try:
+            yield
+        finally:
+            self._holds -= 1
+            if not self._holds and self._held:
+                self._held = False
+                await self.stop(drain_timeout=60)
+
+    async def register_process(self):
+        """
+        登记当前工作进程（应用启动时调用）：在 processes.lock 上持有共享锁直到 unregister_process，
+        独占操作据此判断是否有其他工作进程。其他进程正在执行独占操作时等待其完成
+        """
+        if fcntl is None or self._process_file is not None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        file = open(self.directory / _PROCESSES_FILE, "a+b")
+        await asyncio.to_thread(fcntl.flock, file.fileno(), fcntl.LOCK_SH)
+        self._process_file = file
+
+    def unregister_process(self):
+        if self._process_file is not None:
+            _unlock_close(self._process_file)
+            self._process_file = None
+
+    async def _lock_processes(self) -> bool:
+        """把登记的共享锁升级为排他锁（不等待），有其他工作进程时返回 False"""
+        if fcntl is None:
+            # Windows 没有共享文件锁，按配置的进程数判断
+            return settings.WORKERS <= 1
+        await self.register_process()
+        if _try_lock(self._process_file):
+            return True
+        # 升级失败时原来的共享锁已被释放（flock 的锁转换不是原子的），重新登记
+        await asyncio.to_thread(fcntl.flock, self._process_file.fileno(), fcntl.LOCK_SH)
+        return False
+
+    def _share_processes(self):
+        if fcntl is not None and self._process_file is not None:
+            fcntl.flock(self._process_file.fileno(), fcntl.LOCK_SH)
+
+    @asynccontextmanager
+    async def hold_exclusive(self, alternative: str = ""):
+        """
+        SQLite 独占操作期间暂存追踪数据（见 hold）
+
+        开启 INGEST_JOURNAL 时每个进程都已先写入各自的日志；否则 hold 只能暂存当前进程的追踪数据，
+        要求当前进程是唯一的工作进程，执行期间新启动的进程在登记时等待
+
+        Args:
+            alternative: 多进程时的其他执行方式（附在错误信息中）
+
+        Raises:
+            MultipleWorkersError: 有其他工作进程在运行
+        """
+        if settings.INGEST_JOURNAL:
+            async with self.hold():
+                yield
+            return
+
+        if not await self._lock_processes():
+            raise MultipleWorkersError(
+                "有其他工作进程在运行，独占操作期间无法暂存它们的追踪数据："
+                f"请以单进程运行应用或开启 INGEST_JOURNAL{alternative}"
+            )
+        try:
+            async with self.hold():
+                yield
+        finally:
+            self._share_processes()
+
+    async def replay(self):
+        """
+        加载上次临时开启（hold）时未加载完的记录（未开启写入日志模式时在启动时调用）
+
+        多进程同时启动时只有拿到日志目录锁的进程重放，其他进程直接跳过
+        """
+        if self.running or not self._segments():
+            return
+        if not self._acquire_lock():
+            print("[INFO] 写入日志: 其他进程正在使用日志目录，跳过重放")
+            return
+        try:
+            print("[INFO] 写入日志: 加载上次暂存的追踪数据")
+            async with self.hold():
+                pass
+        finally:
+            # hold 结束时已释放锁；启动失败时在这里释放
+            if not self.running:
+                self._release_lock()
+
+    def stats(self) -> Dict:
+        """日志状态（管理后台）"""
+        segment, offset = self._checkpoint
+        segments = [s for s in self._segments() if s >= segment]
+        pending_bytes = sum(self._segment_path(s).stat().st_size for s in segments)
+        if segments and segments[0] == segment:
+            pending_bytes -= offset
+
+        return {
+            "enabled": self.running,
+            "directory": str(self.directory),
+            "segments": len(segments),
+            "pending_bytes": max(pending_bytes, 0),
+            "appended": self.appended_count,
+            "loaded": self.loaded_count,
+            "skipped": self.skipped_count,
+            "rejected": self.rejected_count,
+            "last_loaded_at": self.last_loaded_at.isoformat() if self.last_loaded_at else None,
+            "last_error": self.last_error,
+        }
+
+
+# 全局写入日志实例（INGEST_JOURNAL 开启时在应用启动时启动）
+ingest_journal = IngestJournal(
+    directory=settings.JOURNAL_DIR,
+    segment_bytes=settings.JOURNAL_SEGMENT_BYTES,
+    fsync_interval=settings.JOURNAL_FSYNC_SECONDS,
+    batch_size=settings.JOURNAL_BATCH_SIZE,
+    load_interval=settings.JOURNAL_LOAD_SECONDS,
+)
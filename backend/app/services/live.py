@@ -0,0 +1,117 @@
+"""
+实时推送中心
+进程内发布/订阅，由追踪写入路径发布事件，推送给已连接的管理后台
+"""
+import asyncio
+import json
+from typing import Any, Dict, Optional, Set
+
+from app.config import settings
+
+
+class LiveSubscriber:
+    """单个订阅者（一个管理后台连接），持有有界发送队列"""
+
+    def __init__(self, max_queue: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.dropped = False
+
+    async def next_message(self, timeout: float) -> Optional[str]:
+        """
+        等待下一条消息
+
+        Returns:
+            Optional[str]: SSE 消息文本；超时返回空字符串；被踢出时返回 None
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return ""
+
+
+class LiveHub:
+    """
+    进程内实时事件中心
+
+    发布操作永不等待：订阅者队列满时直接踢出该订阅者，
+    避免卡住的管理后台标签页拖慢追踪写入
+    """
+
+    def __init__(self, max_queue: int = 100):
+        self.max_queue = max_queue
+        self._subscribers: Set[LiveSubscriber] = set()
+        self.published_count = 0
+        self.dropped_count = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> LiveSubscriber:
+        """注册新的订阅者"""
+        subscriber = LiveSubscriber(self.max_queue)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: LiveSubscriber):
+        """注销订阅者"""
+        self._subscribers.discard(subscriber)
+
+    def publish(self, event: str, data: Dict[str, Any]):
+        """
+        发布事件给所有订阅者
+
+        消息只编码一次；队列已满的订阅者会被踢出
+
+        Args:
+            event: 事件类型（visit / behavior / event / counters）
+            data: 事件数据
+        """
+        if not self._subscribers:
+            return
+
+        message = format_sse(event, data)
+        self.published_count += 1
+
+        for subscriber in list(self._subscribers):
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self._drop(subscriber)
+
+    def _drop(self, subscriber: LiveSubscriber):
+        """踢出慢消费者：清空队列并放入结束标记"""
+        self._subscribers.discard(subscriber)
+        subscriber.dropped = True
+        self.dropped_count += 1
+
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(None)
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取推送中心统计"""
+        return {
+            "subscribers": self.subscriber_count,
+            "published": self.published_count,
+            "dropped": self.dropped_count,
+        }
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """
+    编码为 Server-Sent Events 消息
+
+    Args:
+        event: 事件类型
+        data: 事件数据
+
+    Returns:
+        str: SSE 消息文本
+    """
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+# 全局推送中心实例
+live_hub = LiveHub(max_queue=settings.LIVE_QUEUE_SIZE)
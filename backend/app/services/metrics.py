@@ -0,0 +1,76 @@
+"""
+/metrics 抓取时采集的状态指标
+队列深度、缓存命中、限流等数值由各模块自己维护（stats()），这里只在抓取时读取并写入指标，
+追踪请求的热路径上没有额外开销
+"""
+from app.core.metrics import registry
+from app.services.journal import ingest_journal
+from app.services.distinct import distinct_counter
+from app.services.live import live_hub
+from app.services.mouse_features import trajectory_analyzer
+from app.services.ratelimit import rate_limiter
+from app.services.response_cache import response_cache
+from app.services.warmup import warmup_manager
+from app.utils import geolocation, ua
+from app.utils.auth import token_cache
+
+app_ready = registry.gauge("app_ready", "启动预热是否完成（/ready）")
+
+ingest_queue_depth = registry.gauge(
+    "ingest_queue_depth", "追踪数据处理队列中等待的条目数", ("queue",),
+)
+ingest_journal_pending_bytes = registry.gauge(
+    "ingest_journal_pending_bytes", "写入日志中尚未加载到数据库的字节数",
+)
+ingest_journal_records = registry.counter(
+    "ingest_journal_records_total", "写入日志记录数（appended / loaded / skipped / rejected）", ("state",),
+)
+live_subscribers = registry.gauge("live_subscribers", "管理后台实时推送连接数")
+
+cache_hits = registry.counter("cache_hits_total", "缓存命中次数", ("cache",))
+cache_misses = registry.counter("cache_misses_total", "缓存未命中次数", ("cache",))
+cache_entries = registry.gauge("cache_entries", "缓存条目数", ("cache",))
+
+rate_limit_requests = registry.counter(
+    "rate_limit_requests_total", "限流检查次数", ("rule", "result"),
+)
+
+
+def _set_cache(name: str, entries: int, hits: int, misses: int):
+    cache_entries.labels(name).set(entries)
+    cache_hits.labels(name).value = hits
+    cache_misses.labels(name).value = misses
+
+
+def collect():
+    """读取各模块当前状态写入指标"""
+    app_ready.set(1 if warmup_manager.ready else 0)
+
+    ingest_queue_depth.labels("trajectory_analysis").set(trajectory_analyzer.pending_count)
+    ingest_queue_depth.labels("distinct_sketches").set(distinct_counter.pending_count)
+
+    journal = ingest_journal.stats()
+    ingest_journal_pending_bytes.set(journal["pending_bytes"])
+    for state in ("appended", "loaded", "skipped", "rejected"):
+        ingest_journal_records.labels(state).value = journal[state]
+
+    live_subscribers.set(live_hub.subscriber_count)
+
+    geo = geolocation.get_cache_stats()
+    _set_cache("geolocation", geo["cache_size"], geo["hits"], geo["misses"])
+    user_agent = ua.get_cache_stats()
+    _set_cache("user_agent", user_agent["cache_size"], user_agent["hits"], user_agent["misses"])
+    tokens = token_cache.stats()
+    _set_cache("admin_token", tokens["size"], tokens["hits"], tokens["misses"])
+    responses = response_cache.stats()
+    _set_cache("stats_response", responses["entries"], responses["hits"], responses["misses"])
+
+    for rule in rate_limiter.rules:
+        rate_limit_requests.labels(rule, "allowed").value = rate_limiter.allowed[rule]
+        rate_limit_requests.labels(rule, "rejected").value = rate_limiter.rejected[rule]
+
+
+def render_metrics() -> str:
+    """Prometheus 文本格式的全部指标"""
+    collect()
+    return registry.render()
@@ -0,0 +1,349 @@
+"""
+鼠标轨迹特征分析
+从轨迹点计算速度、加速度、曲率、直线度、采样间隔熵、方向熵和停顿次数，
+结果写回访问记录供评分和筛选使用
+
+分析不在请求路径上进行：行为上报只把访问加入待分析队列，
+队列达到批量大小时在响应发送后批量分析，其余由后台任务每 TRAJECTORY_FLUSH_SECONDS 秒分析；
+一批轨迹拼接成一个数组一次性计算（在线程中执行，不阻塞事件循环）。
+应用关闭时分析队列中剩余的访问，启动时重新加入上次未分析完的访问（mouse_analyzed_at 为空）
+"""
+import asyncio
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.core.database import async_session_maker
+from app.models.visit import Visit, VisitPayload
+from app.services.scoring import SCORING_FIELDS, scoring_engine
+from app.services.response_cache import bump_data_version
+from app.utils.trajectory import load_points
+
+# 写回访问记录的特征字段
+FEATURE_COLUMNS = (
+    "mouse_points",
+    "mouse_speed_mean",
+    "mouse_speed_cv",
+    "mouse_accel_mean",
+    "mouse_curvature",
+    "mouse_straightness",
+    "mouse_interval_entropy",
+    "mouse_direction_entropy",
+    "mouse_pause_count",
+)
+
+# 点数少于该值的轨迹不计算特征（只记录点数和停顿次数）
+MIN_POINTS = 4
+
+# 采样间隔达到该值（毫秒）记为一次停顿
+PAUSE_MS = 1000
+
+# 采样间隔分箱边界（毫秒，按对数间隔）
+_INTERVAL_EDGES = np.array([50, 100, 200, 400, 800, 1600, 3200], dtype=np.float64)
+_INTERVAL_BINS = len(_INTERVAL_EDGES) + 1
+
+# 移动方向分箱数
+_DIRECTION_BINS = 8
+
+
+def _segment_mean(values: np.ndarray, rows: np.ndarray, n: int) -> np.ndarray:
+    """按行求均值，没有数据的行为 NaN"""
+    counts = np.bincount(rows, minlength=n)
+    sums = np.bincount(rows, weights=values, minlength=n)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def _segment_entropy(bins: np.ndarray, rows: np.ndarray, n: int, num_bins: int) -> np.ndarray:
+    """按行求分箱分布的归一化熵（0-1），没有数据的行为 NaN"""
+    counts = np.bincount(rows * num_bins + bins, minlength=n * num_bins).reshape(n, num_bins).astype(np.float64)
+    totals = counts.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        probs = counts / totals[:, None]
+        logs = np.where(probs > 0, np.log2(probs), 0.0)
+    entropy = np.abs((probs * logs).sum(axis=1)) / np.log2(num_bins)
+    return np.where(totals > 0, entropy, np.nan)
+
+
+def analyze_trajectories(trajectories: Sequence[Sequence]) -> Dict[str, np.ndarray]:
+    """
+    批量计算轨迹特征
+
+    Args:
+        trajectories: 每行一个轨迹点列表 [(x, y, t), ...]
+
+    Returns:
+        dict: 特征名 -> 每行的特征值数组（无法计算时为 NaN）
+    """
+    n = len(trajectories)
+    lengths = np.fromiter((len(p) for p in trajectories), dtype=np.int64, count=n)
+    features = {name: np.full(n, np.nan) for name in FEATURE_COLUMNS}
+    features["mouse_points"] = lengths.astype(np.float64)
+    features["mouse_pause_count"] = np.zeros(n)
+
+    if lengths.sum() < 2:
+        return features
+
+    points = np.array([p for trajectory in trajectories for p in trajectory], dtype=np.float64)
+    point_rows = np.repeat(np.arange(n), lengths)
+
+    # 相邻两点构成一步，只保留同一行内的步
+    steps = np.diff(points, axis=0)
+    same_row = point_rows[1:] == point_rows[:-1]
+    steps = steps[same_row]
+    step_rows = point_rows[1:][same_row]
+    dx, dy, dt = steps[:, 0], steps[:, 1], steps[:, 2]
+    dist = np.hypot(dx, dy)
+
+    features["mouse_pause_count"] = np.bincount(step_rows, weights=(dt >= PAUSE_MS), minlength=n)
+
+    # 速度（像素/秒）
+    timed = dt > 0
+    speed = dist[timed] / dt[timed] * 1000.0
+    speed_rows = step_rows[timed]
+    speed_mean = _segment_mean(speed, speed_rows, n)
+    speed_sq_mean = _segment_mean(speed * speed, speed_rows, n)
+    speed_std = np.sqrt(np.maximum(speed_sq_mean - speed_mean * speed_mean, 0.0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        speed_cv = np.where(speed_mean > 0, speed_std / speed_mean, np.nan)
+
+    # 加速度：相邻两步的速度差 / 两步中点的时间差
+    timed_dt = dt[timed]
+    accel_pair = speed_rows[1:] == speed_rows[:-1]
+    accel = np.abs(np.diff(speed))[accel_pair] / ((timed_dt[1:] + timed_dt[:-1])[accel_pair] / 2000.0)
+    accel_mean = _segment_mean(accel, speed_rows[1:][accel_pair], n)
+
+    # 曲率：相邻两步的转向角
+    moved = dist > 0
+    headings = np.arctan2(dy[moved], dx[moved])
+    heading_rows = step_rows[moved]
+    turn_pair = heading_rows[1:] == heading_rows[:-1]
+    turns = np.diff(headings)[turn_pair]
+    turns = np.abs((turns + np.pi) % (2 * np.pi) - np.pi)
+    curvature = _segment_mean(turns, heading_rows[1:][turn_pair], n)
+
+    # 方向熵
+    direction_bins = ((headings + np.pi) / (2 * np.pi) * _DIRECTION_BINS).astype(np.int64) % _DIRECTION_BINS
+    direction_entropy = _segment_entropy(direction_bins, heading_rows, n, _DIRECTION_BINS)
+
+    # 直线度：首尾距离 / 路径长度
+    path_length = np.bincount(step_rows, weights=dist, minlength=n)
+    ends = np.cumsum(lengths)
+    starts = ends - lengths
+    has_points = lengths > 0
+    displacement = np.zeros(n)
+    first = points[starts[has_points]]
+    last = points[ends[has_points] - 1]
+    displacement[has_points] = np.hypot(last[:, 0] - first[:, 0], last[:, 1] - first[:, 1])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        straightness = np.where(path_length > 0, np.minimum(displacement / path_length, 1.0), np.nan)
+
+    # 采样间隔熵
+    interval_bins = np.searchsorted(_INTERVAL_EDGES, dt[timed], side="right")
+    interval_entropy = _segment_entropy(interval_bins, speed_rows, n, _INTERVAL_BINS)
+
+    enough = lengths >= MIN_POINTS
+    for name, values in (
+        ("mouse_speed_mean", speed_mean),
+        ("mouse_speed_cv", speed_cv),
+        ("mouse_accel_mean", accel_mean),
+        ("mouse_curvature", curvature),
+        ("mouse_straightness", straightness),
+        ("mouse_interval_entropy", interval_entropy),
+        ("mouse_direction_entropy", direction_entropy),
+    ):
+        features[name] = np.where(enough, values, np.nan)
+
+    return features
+
+
+def _to_value(name: str, value: float):
+    """numpy 数值转为可写入数据库的值"""
+    if np.isnan(value):
+        return None
+    if name in ("mouse_points", "mouse_pause_count"):
+        return int(value)
+    return round(float(value), 4)
+
+
+async def analyze_visits(db: AsyncSession, visit_ids: List[int]) -> int:
+    """
+    分析指定访问的轨迹，写回特征并重新评分
+
+    Args:
+        db: 数据库会话
+        visit_ids: 访问记录主键
+
+    Returns:
+        int: 已分析的访问数
+    """
+    if not visit_ids:
+        return 0
+
+    columns = [Visit.id, VisitPayload.mouse_trajectory, VisitPayload.mouse_movements] + [
+        getattr(Visit, f) for f in SCORING_FIELDS if f not in FEATURE_COLUMNS
+    ]
+    result = await db.execute(
+        select(*columns)
+        .outerjoin(VisitPayload, VisitPayload.visit_pk == Visit.id)
+        .where(Visit.id.in_(visit_ids))
+    )
+    rows = [SimpleNamespace(**row._asdict()) for row in result]
+    if not rows:
+        return 0
+
+    features = await asyncio.to_thread(
+        lambda: analyze_trajectories([load_points(row.mouse_trajectory, row.mouse_movements) for row in rows])
+    )
+    for i, row in enumerate(rows):
+        for name in FEATURE_COLUMNS:
+            setattr(row, name, _to_value(name, features[name][i]))
+
+    scores = scoring_engine.score_rows(rows)
+    analyzed_at = datetime.utcnow()
+
+    await db.execute(
+        update(Visit),
+        [
+            {
+                "id": row.id,
+                **{name: getattr(row, name) for name in FEATURE_COLUMNS},
+                "authenticity_score": float(scores[i]),
+                "mouse_analyzed_at": analyzed_at,
+            }
+            for i, row in enumerate(rows)
+        ]
+    )
+    await db.commit()
+    bump_data_version()
+
+    return len(rows)
+
+
+class TrajectoryAnalyzer:
+    """待分析访问队列"""
+
+    def __init__(self, batch_size: int, flush_interval: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending: Dict[int, None] = {}
+        self._oldest: Optional[float] = None
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """启动定期分析任务（先重新加入上次未分析完的访问）"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        """停止定期分析并分析队列中剩余的访问"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await flush_trajectory_analyzer()
+
+    async def _flush_loop(self):
+        try:
+            requeued = await self.requeue_unanalyzed()
+            if requeued:
+                print(f"[INFO] 重新加入 {requeued} 个未分析的鼠标轨迹")
+        except Exception as e:
+            print(f"[WARN] 读取未分析的鼠标轨迹失败: {str(e)}")
+
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self._pending:
+                await flush_trajectory_analyzer()
+
+    async def requeue_unanalyzed(self) -> int:
+        """
+        把有轨迹但尚未分析的访问加入队列（上次关闭前未分析完、分析失败的访问）
+
+        按 idx_mouse_pending 索引读取；多进程部署时每个进程都会加入，重复分析结果相同
+
+        Returns:
+            int: 加入的访问数
+        """
+        async with async_session_maker() as db:
+            result = await db.execute(
+                select(Visit.id).where(Visit.mouse_analyzed_at.is_(None), Visit.mouse_seq_next > 0)
+            )
+            visit_ids = result.scalars().all()
+        for visit_pk in visit_ids:
+            self.enqueue(visit_pk)
+        return len(visit_ids)
+
+    def enqueue(self, visit_pk: int):
+        """加入待分析队列（重复加入只分析一次）"""
+        if not self._pending:
+            self._oldest = time.monotonic()
+        self._pending[visit_pk] = None
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def flush_due(self) -> bool:
+        """是否需要立即分析"""
+        if not self._pending:
+            return False
+        return (
+            len(self._pending) >= self.batch_size
+            or time.monotonic() - self._oldest >= self.flush_interval
+        )
+
+    async def flush(self, db: Optional[AsyncSession] = None) -> int:
+        """
+        分析队列中的全部访问
+
+        Args:
+            db: 数据库会话，默认新建会话
+
+        Returns:
+            int: 已分析的访问数
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+
+            pending, self._pending = list(self._pending), {}
+            self._oldest = None
+
+            try:
+                analyzed = 0
+                for i in range(0, len(pending), self.batch_size):
+                    batch = pending[i:i + self.batch_size]
+                    if db is None:
+                        async with async_session_maker() as session:
+                            analyzed += await analyze_visits(session, batch)
+                    else:
+                        analyzed += await analyze_visits(db, batch)
+                return analyzed
+            except Exception:
+                # 分析失败时放回队列，下次再试
+                for visit_pk in pending:
+                    self.enqueue(visit_pk)
+                raise
+
+
+# 全局轨迹分析队列
+trajectory_analyzer = TrajectoryAnalyzer(
+    batch_size=settings.TRAJECTORY_BATCH_SIZE,
+    flush_interval=settings.TRAJECTORY_FLUSH_SECONDS,
+)
+
+
+async def flush_trajectory_analyzer():
+    """后台任务：分析待分析队列，失败时只记录日志"""
+    try:
+        await trajectory_analyzer.flush()
+    except Exception as e:
+        print(f"[WARN] 鼠标轨迹分析失败: {str(e)}")
@@ -0,0 +1,351 @@
+"""
+访问记录批量清理
+按条件（时间范围、设备类型、是否机器人、评分）删除访问记录及其大字段和自定义事件
+
+- 在后台任务中执行，每批 PURGE_BATCH_SIZE 条一个短事务，批次之间暂停 PURGE_BATCH_PAUSE 秒，
+  让出写锁给追踪写入；进度可通过管理后台查询，可随时取消（已删除的批次不会恢复）
+- 只删除任务开始时已存在的记录，清理期间新写入的访问不受影响
+- 删除后 SQLite 的空闲页留在数据库文件中，可选回收：
+  incremental 分批执行 PRAGMA incremental_vacuum（需要数据库已开启 auto_vacuum=INCREMENTAL），
+  full 执行一次 VACUUM 并开启增量回收（期间持有写锁，追踪数据暂存到写入日志）；
+  PostgreSQL 两种方式都执行普通 VACUUM（不阻塞读写）
+- 删除后（包括取消前已删除的批次）由剩余访问重建受影响小时的去重草图，
+  重新汇总受影响设备的访问次数、不同 IP 数和 device_ips，没有剩余访问的设备连同签名一起删除；
+  清空全部记录时直接删除草图和设备表，只重建清理期间新写入的访问
+
+同一时间只运行一个清理任务
+"""
+import asyncio
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import select, func, text
+
+from app.config import settings
+from app.core.database import engine, async_session_maker
+from app.crud import device as device_crud
+from app.crud import visit as visit_crud
+from app.models.visit import Visit
+from app.services.distinct import distinct_counter, hour_bucket
+from app.services.journal import ingest_journal
+from app.services.response_cache import bump_data_version
+
+# 空间回收方式
+VACUUM_NONE = "none"
+VACUUM_INCREMENTAL = "incremental"
+VACUUM_FULL = "full"
+VACUUM_MODES = (VACUUM_NONE, VACUUM_INCREMENTAL, VACUUM_FULL)
+
+# SQLite PRAGMA auto_vacuum 的增量模式
+_AUTO_VACUUM_INCREMENTAL = 2
+
+# 重新汇总设备时每批的设备数
+_DEVICE_BATCH = 100
+
+# 记录受影响设备的上限，超过后重新汇总全部设备
+_MAX_TRACKED_DEVICES = 100000
+
+
+def _hour(timestamp: Optional[datetime]) -> Optional[datetime]:
+    """访问时间所在的小时桶（UTC，不带时区）"""
+    if timestamp is None:
+        return None
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return hour_bucket(timestamp)
+
+
+class PurgeFilter:
+    """清理条件（均为可选，全部为空时清理全部记录）"""
+
+    def __init__(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        device_type: Optional[str] = None,
+        is_bot: Optional[bool] = None,
+        min_score: Optional[float] = None,
+        max_score: Optional[float] = None
+    ):
+        self.start = start
+        self.end = end
+        self.device_type = device_type
+        self.is_bot = is_bot
+        self.min_score = min_score
+        self.max_score = max_score
+
+    @property
+    def has_time_range(self) -> bool:
+        return self.start is not None or self.end is not None
+
+    def conditions(self) -> List:
+        conditions = []
+        if self.start is not None:
+            conditions.append(Visit.timestamp >= self.start)
+        if self.end is not None:
+            conditions.append(Visit.timestamp < self.end)
+        if self.device_type:
+            conditions.append(Visit.device_type == self.device_type)
+        if self.is_bot is not None:
+            conditions.append(Visit.is_bot == self.is_bot)
+        if self.min_score is not None:
+            conditions.append(Visit.authenticity_score >= self.min_score)
+        if self.max_score is not None:
+            conditions.append(Visit.authenticity_score <= self.max_score)
+        return conditions
+
+    def to_dict(self) -> Dict:
+        return {
+            "start": self.start.isoformat() if self.start else None,
+            "end": self.end.isoformat() if self.end else None,
+            "device_type": self.device_type,
+            "is_bot": self.is_bot,
+            "min_score": self.min_score,
+            "max_score": self.max_score,
+        }
+
+
+class PurgeJob:
+    """清理任务"""
+
+    def __init__(self, filters: PurgeFilter, vacuum: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.filters = filters
+        self.vacuum = vacuum
+
+        # pending / counting / deleting / rebuilding / vacuum / done / cancelled / failed
+        self.status = "pending"
+        self.total: Optional[int] = None
+        self.deleted = 0
+        # 任务开始时最大的访问主键（只清理此前的记录）
+        self.max_id: Optional[int] = None
+        # 删除的访问所在的小时和设备（删除后重建草图和设备汇总）
+        self.hours: set = set()
+        self.device_ids: set = set()
+        self.all_devices = False
+        self.freed_bytes: Optional[int] = None
+        self.note: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+        self.cancel_requested = False
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "cancelled", "failed")
+
+    def to_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "filters": self.filters.to_dict(),
+            "vacuum": self.vacuum,
+            "total": self.total,
+            "deleted": self.deleted,
+            "progress": round(self.deleted / self.total, 4) if self.total else (1.0 if self.finished else 0.0),
+            "freed_bytes": self.freed_bytes,
+            "note": self.note,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class PurgeManager:
+    """清理任务管理（后台执行，保留最近的任务记录）"""
+
+    def __init__(self, batch_size: int, batch_pause: float, vacuum_pages: int = 2000, keep_jobs: int = 20):
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.vacuum_pages = vacuum_pages
+        self.keep_jobs = keep_jobs
+
+        self.jobs: "OrderedDict[str, PurgeJob]" = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, filters: PurgeFilter, vacuum: str = VACUUM_NONE) -> PurgeJob:
+        """
+        创建并在后台开始清理任务
+
+        Raises:
+            RuntimeError: 已有清理任务在运行
+        """
+        if self.running:
+            raise RuntimeError("已有清理任务在运行")
+
+        job = PurgeJob(filters, vacuum)
+        self.jobs[job.id] = job
+        while len(self.jobs) > self.keep_jobs:
+            self.jobs.popitem(last=False)
+
+        self._task = asyncio.create_task(self._run(job))
+        return job
+
+    def get(self, job_id: str) -> Optional[PurgeJob]:
+        return self.jobs.get(job_id)
+
+    def list(self) -> List[Dict]:
+        """最近的任务（新的在前）"""
+        return [job.to_dict() for job in reversed(self.jobs.values())]
+
+    def cancel(self, job_id: str) -> bool:
+        """请求取消（当前批次完成后停止）"""
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return False
+        job.cancel_requested = True
+        return True
+
+    async def stop(self):
+        """应用关闭时停止正在运行的任务"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self, job: PurgeJob):
+        try:
+            await self._delete(job)
+            if job.deleted:
+                job.status = "rebuilding"
+                await self._rebuild(job)
+            if job.cancel_requested:
+                job.status = "cancelled"
+            else:
+                if job.vacuum != VACUUM_NONE and job.deleted:
+                    job.status = "vacuum"
+                    await self._vacuum(job)
+                job.status = "done"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            raise
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e).splitlines()[0] if str(e) else type(e).__name__
+            print(f"[WARN] 清理任务 {job.id} 失败: {job.error}")
+        finally:
+            job.finished_at = datetime.utcnow()
+
+    async def _delete(self, job: PurgeJob):
+        """分批删除符合条件的记录"""
+        conditions = job.filters.conditions()
+
+        job.status = "counting"
+        async with async_session_maker() as db:
+            # 只清理任务开始时已存在的记录，避免一直追着新写入的访问删除
+            max_id = (await db.execute(select(func.max(Visit.id)))).scalar()
+            if max_id is None:
+                job.total = 0
+                return
+            conditions.append(Visit.id <= max_id)
+            job.max_id = max_id
+            job.total = (await db.execute(select(func.count(Visit.id)).where(*conditions))).scalar()
+
+        # 有时间范围时由时间索引定位；否则按主键顺序扫描，每条记录只读一次
+        after_id = None if job.filters.has_time_range else 0
+
+        job.status = "deleting"
+        while not job.cancel_requested:
+            async with async_session_maker() as db:
+                rows, after_id = await visit_crud.purge_visits_batch(db, conditions, self.batch_size, after_id)
+            if not rows:
+                break
+            job.deleted += len(rows)
+            self._track(job, rows)
+            await asyncio.sleep(self.batch_pause)
+
+    @staticmethod
+    def _track(job: PurgeJob, rows):
+        """记录删除的访问所在的小时和设备"""
+        for row in rows:
+            hour = _hour(row.timestamp)
+            if hour is not None:
+                job.hours.add(hour)
+            if row.device_id and not job.all_devices:
+                job.device_ids.add(row.device_id)
+        if len(job.device_ids) > _MAX_TRACKED_DEVICES:
+            job.all_devices = True
+            job.device_ids = set()
+
+    async def _rebuild(self, job: PurgeJob):
+        """删除后重建去重草图和设备汇总（HLL 草图和设备计数不能减去已删除的访问）"""
+        reindex = False
+        if not job.filters.conditions() and not job.cancel_requested:
+            # 清空全部记录：直接删除，只重建清理期间新写入的访问（主键大于任务开始时的最大主键）
+            await distinct_counter.clear()
+            async with async_session_maker() as db:
+                await device_crud.clear_devices(db)
+                await db.commit()
+                rows = await visit_crud.get_visit_keys_after(db, job.max_id)
+            job.hours = {hour for hour in (_hour(row.timestamp) for row in rows) if hour is not None}
+            job.device_ids = {row.device_id for row in rows if row.device_id}
+            job.all_devices = False
+            reindex = True
+
+        await distinct_counter.rebuild(job.hours)
+
+        if job.all_devices:
+            after = None
+            while True:
+                async with async_session_maker() as db:
+                    device_ids = await device_crud.get_device_ids_after(db, after, _DEVICE_BATCH)
+                    if not device_ids:
+                        break
+                    await device_crud.rebuild_devices(db, device_ids)
+                    await db.commit()
+                after = device_ids[-1]
+                await asyncio.sleep(self.batch_pause)
+        else:
+            device_ids = sorted(job.device_ids)
+            for i in range(0, len(device_ids), _DEVICE_BATCH):
+                async with async_session_maker() as db:
+                    await device_crud.rebuild_devices(db, device_ids[i:i + _DEVICE_BATCH], reindex=reindex)
+                    await db.commit()
+                await asyncio.sleep(self.batch_pause)
+
+        bump_data_version()
+
+    async def _vacuum(self, job: PurgeJob):
+        """回收删除后的空闲空间"""
+        if engine.dialect.name != "sqlite":
+            async with engine.connect() as conn:
+                conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+                await conn.execute(text("VACUUM (ANALYZE) visits, visit_payloads, custom_events"))
+            return
+
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            page_size = (await conn.execute(text("PRAGMA page_size"))).scalar()
+            pages_before = (await conn.execute(text("PRAGMA page_count"))).scalar()
+
+            if job.vacuum == VACUUM_FULL:
+                # 同时开启增量回收，之后的清理可以使用 incremental；VACUUM 重写整个文件，期间持有写锁
+                # （要求单个工作进程，见 hold_exclusive）
+                async with ingest_journal.hold_exclusive():
+                    await conn.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
+                    await conn.execute(text("VACUUM"))
+            else:
+                mode = (await conn.execute(text("PRAGMA auto_vacuum"))).scalar()
+                if mode != _AUTO_VACUUM_INCREMENTAL:
+                    job.note = "数据库未开启增量回收（auto_vacuum=INCREMENTAL），需要先执行一次 full 回收"
+                    return
+                # 每次释放一部分空闲页，之间让出写锁
+                while (await conn.execute(text("PRAGMA freelist_count"))).scalar():
+                    await conn.execute(text(f"PRAGMA incremental_vacuum({self.vacuum_pages})"))
+                    await asyncio.sleep(self.batch_pause)
+
+            pages_after = (await conn.execute(text("PRAGMA page_count"))).scalar()
+        job.freed_bytes = max(pages_before - pages_after, 0) * page_size
+
+
+# 全局清理任务管理器
+purge_manager = PurgeManager(
+    batch_size=settings.PURGE_BATCH_SIZE,
+    batch_pause=settings.PURGE_BATCH_PAUSE,
+)
@@ -0,0 +1,303 @@
+"""
+追踪接口限流
+按客户端 IP（以及请求中的 visit_id）限制追踪接口的请求频率，防止异常客户端挤占正常流量
+
+- 令牌桶：每个键一个桶（令牌数 + 上次更新时间），容量为突发上限，按每分钟限额匀速补充；
+  全部在内存中，只在事件循环线程内更新，无需加锁
+- 空闲到令牌补满的桶与新桶等价，定期整体扫描删除，内存只与最近活跃的键数有关
+- 多进程部署（RATE_LIMIT_SHARED）：各进程放行的请求按分钟窗口定期累加写入数据库，
+  读回全局计数，超过每分钟限额的键在本窗口剩余时间内各进程都拒绝；
+  全局计数有一个同步间隔的延迟，进程内仍由令牌桶兜底
+"""
+import asyncio
+import math
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, delete
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app.config import settings
+from app.core.database import engine
+from app.models.ratelimit import RateLimitCounter
+from app.services.realtime import SlidingWindowCounter
+
+# 限流对象
+RULE_IP = "ip"
+RULE_VISIT = "visit"
+
+
+class TokenBucketLimiter:
+    """
+    令牌桶限流器（一条规则）
+
+    桶用 [令牌数, 上次更新时间] 两个数保存，每次请求消耗一个令牌，
+    令牌不足时返回补足一个令牌需要等待的秒数
+    """
+
+    def __init__(self, per_minute: int, burst: int, evict_seconds: float = 60.0):
+        self.rate = per_minute / 60.0
+        self.capacity = float(max(burst, 1))
+        self.evict_seconds = evict_seconds
+
+        self._buckets: Dict[str, List[float]] = {}
+        self._last_evict = time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def acquire(self, key: str, now: Optional[float] = None) -> float:
+        """
+        消耗一个令牌
+
+        Returns:
+            float: 0 表示放行，否则为需要等待的秒数
+        """
+        now = time.monotonic() if now is None else now
+        if now - self._last_evict >= self.evict_seconds:
+            self.evict(now)
+
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            self._buckets[key] = [self.capacity - 1, now]
+            return 0.0
+
+        tokens = min(self.capacity, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return 0.0
+
+        bucket[0] = tokens
+        return (1 - tokens) / self.rate if self.rate > 0 else 60.0
+
+    def evict(self, now: Optional[float] = None) -> int:
+        """删除已补满的桶，返回删除的数量"""
+        now = time.monotonic() if now is None else now
+        self._last_evict = now
+        refill = (self.capacity / self.rate) if self.rate > 0 else math.inf
+
+        idle = [key for key, (_, last) in self._buckets.items() if now - last >= refill]
+        for key in idle:
+            del self._buckets[key]
+        return len(idle)
+
+
+class SharedWindowStore:
+    """
+    多进程共享的分钟窗口计数（数据库）
+
+    放行的请求先累加在内存中，定期写入数据库并读回这些键的全局计数；
+    全局计数超过限额的键记录到本窗口结束
+    """
+
+    def __init__(self, limits: Dict[str, int], sync_seconds: float):
+        self.limits = limits
+        self.sync_seconds = sync_seconds
+
+        self._pending: Counter = Counter()
+        self._blocked: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+        self.last_error: Optional[str] = None
+        self.syncs = 0
+
+    @staticmethod
+    def window(now: Optional[float] = None) -> int:
+        return int((time.time() if now is None else now) // 60)
+
+    def record(self, key: str):
+        self._pending[(self.window(), key)] += 1
+
+    def retry_after(self, key: str, now: Optional[float] = None) -> float:
+        """键在本窗口已超过全局限额时返回到窗口结束的秒数，否则为 0"""
+        now = time.time() if now is None else now
+        if self._blocked.get(key) != self.window(now):
+            return 0.0
+        return 60 - now % 60
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._sync_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            await self.sync()
+        except Exception as e:
+            print(f"[WARN] 限流计数写入失败: {str(e).splitlines()[0]}")
+
+    async def _sync_loop(self):
+        while True:
+            await asyncio.sleep(self.sync_seconds)
+            try:
+                await self.sync()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e).splitlines()[0] if str(e) else type(e).__name__
+                print(f"[WARN] 限流计数同步失败: {self.last_error}")
+
+    async def sync(self):
+        """写入本进程的计数，读回全局计数，删除过期窗口"""
+        current = self.window()
+        pending, self._pending = self._pending, Counter()
+        # 上一个窗口的计数只写入，不再用于拒绝
+        pending = {k: n for k, n in pending.items() if k[0] >= current - 1}
+
+        try:
+            async with engine.begin() as conn:
+                if pending:
+                    insert = postgresql.insert if conn.dialect.name == "postgresql" else sqlite.insert
+                    stmt = insert(RateLimitCounter)
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=[RateLimitCounter.window, RateLimitCounter.key],
+                        set_={"count": RateLimitCounter.count + stmt.excluded.count},
+                    )
+                    await conn.execute(stmt, [
+                        {"window": window, "key": key, "count": count}
+                        for (window, key), count in pending.items()
+                    ])
+
+                keys = [key for window, key in pending if window == current]
+                blocked = {}
+                if keys:
+                    result = await conn.execute(
+                        select(RateLimitCounter.key, RateLimitCounter.count)
+                        .where(RateLimitCounter.window == current, RateLimitCounter.key.in_(keys))
+                    )
+                    for key, count in result:
+                        if count > self.limits.get(key.split(":", 1)[0], math.inf):
+                            blocked[key] = current
+
+                await conn.execute(delete(RateLimitCounter).where(RateLimitCounter.window < current - 1))
+        except Exception:
+            # 写入失败时放回内存，下次再试
+            self._pending.update(pending)
+            raise
+
+        self._blocked = {k: w for k, w in self._blocked.items() if w == current}
+        self._blocked.update(blocked)
+        self.syncs += 1
+
+
+class RateLimiter:
+    """追踪接口限流（按 IP 和 visit_id 两条规则）"""
+
+    def __init__(
+        self,
+        enabled: bool,
+        per_minute: int,
+        burst: int,
+        visit_per_minute: int,
+        visit_burst: int,
+        exempt_ips: List[str],
+        shared: bool = False,
+        sync_seconds: float = 2.0
+    ):
+        self.enabled = enabled
+        self.exempt_ips = set(exempt_ips)
+        self.rules: Dict[str, TokenBucketLimiter] = {
+            RULE_IP: TokenBucketLimiter(per_minute, burst),
+            RULE_VISIT: TokenBucketLimiter(visit_per_minute, visit_burst),
+        }
+        self.shared = SharedWindowStore(
+            {RULE_IP: per_minute, RULE_VISIT: visit_per_minute},
+            sync_seconds,
+        ) if shared else None
+
+        # 统计（管理后台）
+        self.allowed: Counter = Counter()
+        self.rejected: Counter = Counter()
+        self.rejected_per_minute = SlidingWindowCounter(slots=60, slot_seconds=60)
+        self._offenders: Counter = Counter()
+        self.max_offenders = 1000
+
+    def check(self, rule: str, value: Optional[str]) -> float:
+        """
+        检查一次请求
+
+        Returns:
+            float: 0 表示放行，否则为建议的重试等待秒数
+        """
+        if not self.enabled or not value:
+            return 0.0
+        if rule == RULE_IP and value in self.exempt_ips:
+            return 0.0
+
+        key = f"{rule}:{value}"
+        wait = self.rules[rule].acquire(key)
+        if not wait and self.shared is not None:
+            wait = self.shared.retry_after(key)
+            if not wait:
+                self.shared.record(key)
+
+        if wait:
+            self.rejected[rule] += 1
+            self.rejected_per_minute.add()
+            self._offenders[key] += 1
+            if len(self._offenders) > self.max_offenders:
+                # 排行只保留被拒绝最多的一部分键
+                self._offenders = Counter(dict(self._offenders.most_common(self.max_offenders // 10)))
+            return wait
+
+        self.allowed[rule] += 1
+        return 0.0
+
+    def check_visits(self, visit_ids) -> Tuple[float, Optional[str]]:
+        """检查一批 visit_id（批量上报），返回最长等待秒数和被限流的 visit_id"""
+        for visit_id in dict.fromkeys(v for v in visit_ids if v):
+            wait = self.check(RULE_VISIT, visit_id)
+            if wait:
+                return wait, visit_id
+        return 0.0, None
+
+    def start(self):
+        if self.enabled and self.shared is not None:
+            self.shared.start()
+
+    async def stop(self):
+        if self.shared is not None:
+            await self.shared.stop()
+
+    def stats(self, top: int = 10) -> Dict:
+        """限流统计（管理后台）"""
+        return {
+            "enabled": self.enabled,
+            "shared": self.shared is not None,
+            "rules": {
+                rule: {
+                    "per_minute": round(limiter.rate * 60),
+                    "burst": int(limiter.capacity),
+                    "tracked_keys": len(limiter),
+                    "allowed": self.allowed[rule],
+                    "rejected": self.rejected[rule],
+                }
+                for rule, limiter in self.rules.items()
+            },
+            "rejected_last_hour": self.rejected_per_minute.total(),
+            "rejected_per_minute": self.rejected_per_minute.series(),
+            "top_rejected": [
+                {"key": key, "rejected": count}
+                for key, count in self._offenders.most_common(top)
+            ],
+            "shared_syncs": self.shared.syncs if self.shared else None,
+            "shared_error": self.shared.last_error if self.shared else None,
+        }
+
+
+
+# 全局限流器
+rate_limiter = RateLimiter(
+    enabled=settings.RATE_LIMIT_ENABLED,
+    per_minute=settings.RATE_LIMIT_PER_MINUTE,
+    burst=settings.RATE_LIMIT_BURST,
+    visit_per_minute=settings.RATE_LIMIT_VISIT_PER_MINUTE,
+    visit_burst=settings.RATE_LIMIT_VISIT_BURST,
+    exempt_ips=settings.rate_limit_exempt_ips_list,
+    shared=settings.RATE_LIMIT_SHARED,
+    sync_seconds=settings.RATE_LIMIT_SYNC_SECONDS,
+)
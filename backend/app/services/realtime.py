@@ -0,0 +1,181 @@
+"""
+实时滑动窗口计数器
+在线访问数、最近 N 分钟访问量、机器人占比等指标，全部在内存中维护
+
+所有更新都发生在事件循环线程内（追踪路由中同步调用），
+环形缓冲区只做下标运算和整数加法，无需加锁，读取也不访问数据库
+"""
+import time
+from typing import Dict, List, Optional
+
+from app.config import settings
+
+
+class SlidingWindowCounter:
+    """
+    环形缓冲区滑动窗口计数器
+
+    每个槽位记录所属的时间刻度，写入时发现刻度过期即清零复用，
+    窗口大小固定，读取开销与数据量无关
+    """
+
+    def __init__(self, slots: int, slot_seconds: int):
+        self.slots = slots
+        self.slot_seconds = slot_seconds
+        self._counts = [0] * slots
+        self._ticks = [-1] * slots
+
+    def _tick(self, now: float) -> int:
+        return int(now // self.slot_seconds)
+
+    def add(self, amount: int = 1, now: Optional[float] = None):
+        """在当前槽位累加"""
+        tick = self._tick(time.time() if now is None else now)
+        index = tick % self.slots
+
+        if self._ticks[index] != tick:
+            self._ticks[index] = tick
+            self._counts[index] = 0
+
+        self._counts[index] += amount
+
+    def total(self, last_slots: Optional[int] = None, now: Optional[float] = None) -> int:
+        """
+        最近 last_slots 个槽位（含当前槽位）的累计值
+
+        Args:
+            last_slots: 统计的槽位数，默认整个窗口
+        """
+        tick = self._tick(time.time() if now is None else now)
+        span = self.slots if last_slots is None else min(last_slots, self.slots)
+        oldest = tick - span + 1
+
+        return sum(
+            count for count, slot_tick in zip(self._counts, self._ticks)
+            if oldest <= slot_tick <= tick
+        )
+
+    def series(self, now: Optional[float] = None) -> List[int]:
+        """按时间从旧到新返回整个窗口每个槽位的值"""
+        tick = self._tick(time.time() if now is None else now)
+        result = []
+
+        for t in range(tick - self.slots + 1, tick + 1):
+            index = t % self.slots
+            result.append(self._counts[index] if self._ticks[index] == t else 0)
+
+        return result
+
+
+class ActiveVisitTracker:
+    """
+    在线访问跟踪（按最后一次心跳）
+
+    visit_id 记录在最后一次心跳所在的槽位中；时间推进、槽位被复用时，
+    只淘汰最后心跳仍停留在该槽位的访问，在线数即为映射表大小
+    """
+
+    def __init__(self, window_seconds: int, slot_seconds: int = 5):
+        self.slot_seconds = slot_seconds
+        self.slots = max(1, window_seconds // slot_seconds)
+        self._buckets: List[List[str]] = [[] for _ in range(self.slots)]
+        self._last_tick: Dict[str, int] = {}
+        self._current_tick: Optional[int] = None
+
+    def _advance(self, now: float) -> int:
+        """推进时间刻度，淘汰窗口外的访问"""
+        tick = int(now // self.slot_seconds)
+
+        if self._current_tick is None:
+            self._current_tick = tick
+            return tick
+
+        if tick - self._current_tick >= self.slots:
+            # 超过一个完整窗口没有推进，全部过期
+            self._buckets = [[] for _ in range(self.slots)]
+            self._last_tick.clear()
+        else:
+            for t in range(self._current_tick + 1, tick + 1):
+                index = t % self.slots
+                expired_tick = t - self.slots
+                for visit_id in self._buckets[index]:
+                    if self._last_tick.get(visit_id) == expired_tick:
+                        del self._last_tick[visit_id]
+                self._buckets[index] = []
+
+        if tick > self._current_tick:
+            self._current_tick = tick
+
+        return self._current_tick
+
+    def touch(self, visit_id: str, now: Optional[float] = None):
+        """记录一次心跳"""
+        tick = self._advance(time.time() if now is None else now)
+
+        if self._last_tick.get(visit_id) == tick:
+            return
+
+        self._last_tick[visit_id] = tick
+        self._buckets[tick % self.slots].append(visit_id)
+
+    def count(self, now: Optional[float] = None) -> int:
+        """当前在线访问数"""
+        self._advance(time.time() if now is None else now)
+        return len(self._last_tick)
+
+
+class RealtimeStats:
+    """实时指标集合：由 track_visit / update_behavior 更新，管理后台直接读取"""
+
+    def __init__(self, online_window_seconds: int):
+        self.online_window_seconds = online_window_seconds
+        self.visits = SlidingWindowCounter(slots=60, slot_seconds=60)
+        self.bots = SlidingWindowCounter(slots=60, slot_seconds=60)
+        self.behavior_updates = SlidingWindowCounter(slots=60, slot_seconds=60)
+        self.active = ActiveVisitTracker(online_window_seconds)
+
+    def record_visit(self, visit_id: str, is_bot: bool):
+        """记录新访问"""
+        now = time.time()
+        self.visits.add(now=now)
+        if is_bot:
+            self.bots.add(now=now)
+        self.active.touch(visit_id, now=now)
+
+    def record_behavior(self, visit_id: str):
+        """记录行为数据心跳"""
+        now = time.time()
+        self.behavior_updates.add(now=now)
+        self.active.touch(visit_id, now=now)
+
+    def snapshot(self, include_series: bool = True) -> Dict:
+        """
+        获取实时指标快照
+
+        Args:
+            include_series: 是否包含最近 60 分钟每分钟访问量序列
+        """
+        now = time.time()
+        visits_60m = self.visits.total(now=now)
+        bots_60m = self.bots.total(now=now)
+
+        data = {
+            "online_now": self.active.count(now=now),
+            "online_window_seconds": self.online_window_seconds,
+            "visits_last_1m": self.visits.total(1, now=now),
+            "visits_last_5m": self.visits.total(5, now=now),
+            "visits_last_15m": self.visits.total(15, now=now),
+            "visits_last_60m": visits_60m,
+            "bots_last_60m": bots_60m,
+            "bot_rate_last_60m": round(bots_60m / visits_60m * 100, 2) if visits_60m > 0 else 0,
+            "behavior_updates_last_5m": self.behavior_updates.total(5, now=now),
+        }
+
+        if include_series:
+            data["visits_per_minute"] = self.visits.series(now=now)
+
+        return data
+
+
+# 全局实时指标实例
+realtime_stats = RealtimeStats(online_window_seconds=settings.ONLINE_WINDOW_SECONDS)
@@ -0,0 +1,189 @@
+"""
+管理后台统计接口的响应缓存
+管理后台每次刷新都用相同的参数重新请求统计接口，没有新数据时结果不变
+
+- 数据版本：追踪写入、重新评分、轨迹分析、删除 / 清理访问记录、迁移回填后递增（bump_data_version）
+- 缓存按路径 + 查询参数保存序列化后的响应体，数据版本未变且未超过 CACHE_TTL 秒时直接返回；
+  「今日」等按当前时间划分的统计在没有新数据时也会随时间变化，由 CACHE_TTL 限定最长复用时间
+- ETag 为响应体的哈希，请求带 If-None-Match 且内容未变时返回 304（数据版本变化但结果相同时同样返回 304）
+- 数据版本只在本进程内递增：多进程部署时其他进程的写入最多延迟 CACHE_TTL 秒反映到缓存中
+"""
+import functools
+import hashlib
+import inspect
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import ORJSONResponse, Response
+
+from app.config import settings
+
+
+class DataVersion:
+    """全局数据版本（只在事件循环线程内递增）"""
+
+    def __init__(self):
+        self.value = 0
+
+    def bump(self):
+        self.value += 1
+
+
+data_version = DataVersion()
+
+
+def bump_data_version():
+    """访问数据发生变化后调用，使已缓存的统计结果失效"""
+    data_version.bump()
+
+
+class CachedResponse:
+    """已缓存的响应"""
+
+    __slots__ = ("version", "created_at", "modified_at", "body", "etag")
+
+    def __init__(self, version: int, body: bytes, modified_at: Optional[datetime] = None):
+        self.version = version
+        self.created_at = time.monotonic()
+        self.body = body
+        self.etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+        # 内容最近一次变化的时间（Last-Modified，精确到秒）
+        self.modified_at = modified_at or datetime.now(timezone.utc).replace(microsecond=0)
+
+
+class ResponseCache:
+    """按路径 + 查询参数缓存响应体（LRU）"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl > 0
+
+    @staticmethod
+    def key(request: Request) -> str:
+        return request.url.path + "?" + "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """未失效的缓存（失效的条目保留到重新计算，用于判断内容是否变化）"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.version != data_version.value or time.monotonic() - entry.created_at >= self.ttl:
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, body: bytes) -> CachedResponse:
+        entry = CachedResponse(data_version.value, body)
+        previous = self._entries.get(key)
+        if previous is not None and previous.etag == entry.etag:
+            entry.modified_at = previous.modified_at
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "data_version": data_version.value,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "hit_rate": round(self.hits / total, 4) if total else None,
+        }
+
+
+# 全局响应缓存
+response_cache = ResponseCache(
+    max_entries=settings.RESPONSE_CACHE_SIZE,
+    ttl=settings.CACHE_TTL,
+)
+
+
+def _not_modified(request: Request, entry: CachedResponse) -> bool:
+    """条件请求：If-None-Match 优先，没有时按 If-Modified-Since"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return entry.etag in tags or "*" in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return entry.modified_at <= since
+    return False
+
+
+def _respond(request: Request, entry: CachedResponse) -> Response:
+    headers = {
+        "ETag": entry.etag,
+        "Last-Modified": format_datetime(entry.modified_at, usegmt=True),
+        # 浏览器每次使用前都向服务端确认（带 If-None-Match），内容未变时收到 304
+        "Cache-Control": "private, no-cache",
+    }
+    if _not_modified(request, entry):
+        response_cache.not_modified += 1
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+def cached_response(func):
+    """
+    接口响应缓存装饰器（放在 @router.get 下面）
+
+    在接口的依赖（包括管理员认证）全部通过后执行；接口返回的 dict 序列化后缓存，
+    未命中时照常调用接口
+    """
+    signature = inspect.signature(func)
+    needs_request = "request" in signature.parameters
+
+    @functools.wraps(func)
+    async def wrapper(*args, request: Request, **kwargs):
+        if not response_cache.enabled:
+            return await func(*args, **({**kwargs, "request": request} if needs_request else kwargs))
+
+        key = response_cache.key(request)
+        entry = response_cache.get(key)
+        if entry is not None:
+            response_cache.hits += 1
+            return _respond(request, entry)
+
+        response_cache.misses += 1
+        result = await func(*args, **({**kwargs, "request": request} if needs_request else kwargs))
+        if isinstance(result, Response):
+            return result
+        entry = response_cache.put(key, ORJSONResponse(result).body)
+        return _respond(request, entry)
+
+    # FastAPI 按签名解析参数：接口本身没有 request 参数时加上
+    if not needs_request:
+        wrapper.__signature__ = signature.replace(parameters=[
+            *signature.parameters.values(),
+            inspect.Parameter("request", inspect.Parameter.KEYWORD_ONLY, annotation=Request),
+        ])
+    return wrapper
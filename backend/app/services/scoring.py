@@ -0,0 +1,305 @@
+"""
+真实性评分引擎
+把每条访问的全部采集信号转换成特征向量，评分 = clip(特征矩阵 · 权重, 0, 100)
+
+特征提取和评分都按批进行，规则（权重）调整后可以用 rescore_all 快速重算全表；
+单条访问的评分也走同一套逻辑，每次都从当前字段完整重算，不会在已有分数上累加
+"""
+import time
+from datetime import datetime, timezone as dt_timezone
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.visit import Visit
+from app.services.response_cache import bump_data_version
+from app.utils.tz import COUNTRY_TIMEZONE_MAP, timezone_offset_minutes
+
+# 特征权重：特征取值均在 0-1 之间，正权重加分，负权重扣分
+FEATURE_WEIGHTS = {
+    # 指纹完整度
+    "has_canvas": 15.0,
+    "has_webgl": 15.0,
+    "has_fonts": 10.0,
+    "has_screen": 5.0,
+    "has_timezone": 5.0,
+    "has_language": 5.0,
+    # 硬件信号完整度（设备内存/CPU 核数/音频/媒体设备/插件中已采集的比例）
+    "hardware_signals": 10.0,
+    # 行为
+    "stayed": 10.0,
+    "scrolled": 10.0,
+    "mouse_direction_entropy": 10.0,
+    "mouse_interval_entropy": 5.0,
+    # 扣分项
+    "headless": -30.0,
+    "bot": -30.0,
+    "software_renderer": -20.0,
+    "webgl_inconsistent": -15.0,
+    "timezone_mismatch": -15.0,
+    "ip_changes": -15.0,
+    "hardware_implausible": -10.0,
+    "mouse_straight_path": -10.0,
+    "mouse_constant_speed": -10.0,
+}
+
+FEATURE_NAMES = tuple(FEATURE_WEIGHTS)
+
+# 评分需要读取的字段
+SCORING_FIELDS = (
+    "canvas_fingerprint",
+    "webgl_fingerprint",
+    "fonts_hash",
+    "screen_resolution",
+    "timezone",
+    "language",
+    "device_memory",
+    "hardware_concurrency",
+    "audio_fingerprint",
+    "media_devices_hash",
+    "plugins_hash",
+    "webgl_vendor",
+    "webgl_renderer",
+    "os",
+    "ip_country",
+    "ip_change_count",
+    "is_headless",
+    "is_bot",
+    "stay_duration",
+    "scroll_depth",
+    "mouse_points",
+    "mouse_speed_cv",
+    "mouse_straightness",
+    "mouse_interval_entropy",
+    "mouse_direction_entropy",
+)
+
+_HARDWARE_FIELDS = (
+    "device_memory",
+    "hardware_concurrency",
+    "audio_fingerprint",
+    "media_devices_hash",
+    "plugins_hash",
+)
+
+# 软件渲染器（无 GPU 的虚拟机 / 无头浏览器常见）
+_SOFTWARE_RENDERERS = ("swiftshader", "llvmpipe", "softpipe", "mesa offscreen", "microsoft basic render")
+
+# 浏览器时区与 IP 所在国家主要时区的偏移差超过该值（分钟）视为不一致，
+# 留出余量兼容美国、加拿大、澳大利亚等跨多个时区的国家
+_TIMEZONE_TOLERANCE_MINUTES = 180
+
+# IP 变化次数达到该值时该项扣满分
+_IP_CHANGE_SATURATION = 3
+
+# 轨迹点数达到该值才判断直线移动 / 匀速移动
+_MOUSE_MIN_POINTS = 5
+# 直线度超过该值视为直线移动
+_STRAIGHT_PATH = 0.98
+# 速度变异系数低于该值视为匀速移动
+_CONSTANT_SPEED_CV = 0.05
+
+
+def _present(rows: Sequence, field: str) -> np.ndarray:
+    """字段是否有值（0/1）"""
+    return np.fromiter(
+        (getattr(row, field) not in (None, "") for row in rows),
+        dtype=np.float64,
+        count=len(rows)
+    )
+
+
+def _numeric(rows: Sequence, field: str) -> np.ndarray:
+    """数值字段，缺失记为 NaN"""
+    return np.fromiter(
+        (np.nan if getattr(row, field) is None else getattr(row, field) for row in rows),
+        dtype=np.float64,
+        count=len(rows)
+    )
+
+
+def _is_software_renderer(renderer: Optional[str]) -> bool:
+    if not renderer:
+        return False
+    renderer = renderer.lower()
+    return any(name in renderer for name in _SOFTWARE_RENDERERS)
+
+
+def _is_webgl_inconsistent(vendor: Optional[str], renderer: Optional[str], os_name: Optional[str]) -> bool:
+    """WebGL 厂商/渲染器自相矛盾或与操作系统不符"""
+    if not vendor and not renderer:
+        return False
+    if not vendor or not renderer:
+        return True
+
+    renderer = renderer.lower()
+    os_name = (os_name or "").lower()
+    is_windows = os_name.startswith("windows")
+    is_apple = os_name in ("mac os x", "ios")
+
+    # Direct3D 只存在于 Windows
+    if ("direct3d" in renderer or "d3d11" in renderer) and os_name and not is_windows:
+        return True
+    # Apple GPU 只存在于 macOS / iOS
+    if "apple m" in renderer or "apple gpu" in renderer:
+        return bool(os_name) and not is_apple
+    # 移动 GPU 不会出现在桌面系统
+    if any(gpu in renderer for gpu in ("adreno", "mali", "powervr")):
+        return is_windows or os_name == "mac os x"
+    return False
+
+
+def _timezone_mismatch(
+    timezone: Optional[str],
+    country: Optional[str],
+    now_utc: datetime,
+    memo: Dict[str, Optional[int]]
+) -> bool:
+    """浏览器时区与 IP 地理位置不符"""
+    if not timezone or country not in COUNTRY_TIMEZONE_MAP:
+        return False
+    visitor_offset = timezone_offset_minutes(timezone, now_utc, memo)
+    country_offset = timezone_offset_minutes(COUNTRY_TIMEZONE_MAP[country], now_utc, memo)
+    if visitor_offset is None or country_offset is None:
+        return False
+    return abs(visitor_offset - country_offset) > _TIMEZONE_TOLERANCE_MINUTES
+
+
+class ScoringEngine:
+    """批量真实性评分"""
+
+    def __init__(self, weights: Dict[str, float]):
+        self.feature_names = tuple(weights)
+        self.weights = np.array([weights[name] for name in self.feature_names], dtype=np.float64)
+
+    def features(self, rows: Sequence) -> np.ndarray:
+        """
+        构建特征矩阵
+
+        Args:
+            rows: 带有 SCORING_FIELDS 属性的对象（Visit 或查询结果行）
+
+        Returns:
+            np.ndarray: 形状为 (行数, 特征数) 的矩阵，列顺序与 feature_names 一致
+        """
+        n = len(rows)
+        if n == 0:
+            return np.zeros((0, len(self.feature_names)))
+
+        now_utc = datetime.now(dt_timezone.utc)
+        tz_memo: Dict[str, Optional[int]] = {}
+
+        memory = _numeric(rows, "device_memory")
+        concurrency = _numeric(rows, "hardware_concurrency")
+        with np.errstate(invalid="ignore"):
+            hardware_implausible = (
+                (memory <= 0) | (memory > 64) | (concurrency < 1) | (concurrency > 256)
+            )
+
+        ip_changes = np.nan_to_num(_numeric(rows, "ip_change_count"))
+        stay = np.nan_to_num(_numeric(rows, "stay_duration"))
+        scroll = np.nan_to_num(_numeric(rows, "scroll_depth"))
+
+        # 鼠标轨迹特征由后台分析写入，未分析的记录不参与相关加减分
+        analyzed = np.nan_to_num(_numeric(rows, "mouse_points")) >= _MOUSE_MIN_POINTS
+        straightness = np.nan_to_num(_numeric(rows, "mouse_straightness"))
+        speed_cv = np.nan_to_num(_numeric(rows, "mouse_speed_cv"), nan=1.0)
+
+        columns = {
+            "has_canvas": _present(rows, "canvas_fingerprint"),
+            "has_webgl": _present(rows, "webgl_fingerprint"),
+            "has_fonts": _present(rows, "fonts_hash"),
+            "has_screen": _present(rows, "screen_resolution"),
+            "has_timezone": _present(rows, "timezone"),
+            "has_language": _present(rows, "language"),
+            "hardware_signals": np.mean([_present(rows, f) for f in _HARDWARE_FIELDS], axis=0),
+            "stayed": (stay > 3).astype(np.float64),
+            "scrolled": (scroll > 10).astype(np.float64),
+            "mouse_direction_entropy": np.nan_to_num(_numeric(rows, "mouse_direction_entropy")),
+            "mouse_interval_entropy": np.nan_to_num(_numeric(rows, "mouse_interval_entropy")),
+            "headless": np.fromiter((bool(row.is_headless) for row in rows), dtype=np.float64, count=n),
+            "bot": np.fromiter((bool(row.is_bot) for row in rows), dtype=np.float64, count=n),
+            "software_renderer": np.fromiter(
+                (_is_software_renderer(row.webgl_renderer) for row in rows), dtype=np.float64, count=n
+            ),
+            "webgl_inconsistent": np.fromiter(
+                (_is_webgl_inconsistent(row.webgl_vendor, row.webgl_renderer, row.os) for row in rows),
+                dtype=np.float64,
+                count=n
+            ),
+            "timezone_mismatch": np.fromiter(
+                (_timezone_mismatch(row.timezone, row.ip_country, now_utc, tz_memo) for row in rows),
+                dtype=np.float64,
+                count=n
+            ),
+            "ip_changes": np.minimum(ip_changes, _IP_CHANGE_SATURATION) / _IP_CHANGE_SATURATION,
+            "hardware_implausible": hardware_implausible.astype(np.float64),
+            "mouse_straight_path": (analyzed & (straightness > _STRAIGHT_PATH)).astype(np.float64),
+            "mouse_constant_speed": (analyzed & (speed_cv < _CONSTANT_SPEED_CV)).astype(np.float64),
+        }
+
+        return np.column_stack([columns[name] for name in self.feature_names])
+
+    def score_rows(self, rows: Sequence) -> np.ndarray:
+        """批量评分（0-100，保留一位小数）"""
+        if not rows:
+            return np.zeros(0)
+        scores = self.features(rows) @ self.weights
+        return np.round(np.clip(scores, 0.0, 100.0), 1)
+
+    def score(self, row) -> float:
+        """单条访问评分"""
+        return float(self.score_rows([row])[0])
+
+    async def rescore_all(self, db: AsyncSession, batch_size: int = 2000) -> Dict:
+        """
+        按当前规则重算全部访问记录的评分
+
+        按主键分批读取评分所需的列，只更新分数有变化的行，每批提交一次
+
+        Returns:
+            dict: 扫描行数、更新行数和耗时（毫秒）
+        """
+        started = time.perf_counter()
+        columns = [Visit.id, Visit.authenticity_score] + [getattr(Visit, f) for f in SCORING_FIELDS]
+
+        scanned = 0
+        updated = 0
+        last_id = 0
+        while True:
+            result = await db.execute(
+                select(*columns).where(Visit.id > last_id).order_by(Visit.id).limit(batch_size)
+            )
+            rows = result.all()
+            if not rows:
+                break
+
+            scores = self.score_rows(rows)
+            old = np.array([row.authenticity_score or 0.0 for row in rows])
+            changed = np.nonzero(np.abs(scores - old) > 1e-6)[0]
+
+            if len(changed):
+                await db.execute(
+                    update(Visit),
+                    [{"id": rows[i].id, "authenticity_score": float(scores[i])} for i in changed]
+                )
+                await db.commit()
+
+            scanned += len(rows)
+            updated += len(changed)
+            last_id = rows[-1].id
+
+        if updated:
+            bump_data_version()
+
+        return {
+            "scanned": scanned,
+            "updated": updated,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+
+# 全局评分引擎实例
+scoring_engine = ScoringEngine(FEATURE_WEIGHTS)
@@ -0,0 +1,257 @@
+"""
+近似重复设备检测
+对每个新设备的指纹组件集合计算 MinHash 签名并写入 LSH 分段桶，
+查询时只比较落入同一个桶的候选，避免对全部设备两两比较
+"""
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.device import Device, DeviceSignature, DeviceLSHBucket
+from app.utils.hash import DEVICE_ID_FIELDS
+from app.utils.minhash import MinHasher
+
+# 参与相似度计算的指纹组件（约 20 个）
+LSH_FIELDS = DEVICE_ID_FIELDS + (
+    "language",
+    "media_devices_hash",
+    "webrtc_hash",
+    "os",
+)
+
+# IN 查询每批的数量
+_IN_CHUNK = 500
+
+minhasher = MinHasher(bands=settings.LSH_BANDS, rows=settings.LSH_ROWS)
+
+
+def fingerprint_tokens(source) -> List[str]:
+    """
+    提取指纹组件集合（字段名=值）
+
+    Args:
+        source: 带有指纹字段属性的对象（Visit 等）
+    """
+    tokens = []
+    for field in LSH_FIELDS:
+        value = getattr(source, field, None)
+        if value is not None and value != "":
+            tokens.append(f"{field}={value}")
+    return tokens
+
+
+async def index_device(db: AsyncSession, device_id: str, source):
+    """
+    为新设备写入 MinHash 签名和 LSH 分段桶（不提交事务）
+
+    Args:
+        db: 数据库会话
+        device_id: 设备标识
+        source: 该设备首次访问的记录
+    """
+    tokens = fingerprint_tokens(source)
+    if not tokens:
+        return
+
+    signature = minhasher.signature(tokens)
+
+    db.add(DeviceSignature(device_id=device_id, signature=minhasher.pack(signature)))
+    for band, bucket in enumerate(minhasher.band_keys(signature)):
+        db.add(DeviceLSHBucket(band=band, bucket=bucket, device_id=device_id))
+
+
+async def _load_signatures(db: AsyncSession, device_ids: List[str]) -> Dict[str, List[int]]:
+    """分批读取签名"""
+    signatures = {}
+    for i in range(0, len(device_ids), _IN_CHUNK):
+        chunk = device_ids[i:i + _IN_CHUNK]
+        result = await db.execute(
+            select(DeviceSignature.device_id, DeviceSignature.signature)
+            .where(DeviceSignature.device_id.in_(chunk))
+        )
+        for device_id, data in result:
+            signatures[device_id] = minhasher.unpack(data)
+    return signatures
+
+
+async def _load_devices(db: AsyncSession, device_ids: List[str]) -> Dict[str, Device]:
+    """分批读取设备记录"""
+    devices = {}
+    for i in range(0, len(device_ids), _IN_CHUNK):
+        chunk = device_ids[i:i + _IN_CHUNK]
+        result = await db.execute(select(Device).where(Device.device_id.in_(chunk)))
+        for device in result.scalars():
+            devices[device.device_id] = device
+    return devices
+
+
+async def find_similar_devices(
+    db: AsyncSession,
+    device_id: str,
+    threshold: float = 0.7,
+    limit: int = 50
+) -> Optional[List[Dict]]:
+    """
+    查找与指定设备近似重复的设备
+
+    只需按 (band, bucket) 主键查询 bands 次，与设备总数无关
+
+    Returns:
+        Optional[List[Dict]]: 相似设备列表（按相似度降序）；设备没有签名时返回 None
+    """
+    signatures = await _load_signatures(db, [device_id])
+    if device_id not in signatures:
+        return None
+
+    own = signatures[device_id]
+    bucket_rows = await db.execute(
+        select(DeviceLSHBucket.band, DeviceLSHBucket.bucket).where(DeviceLSHBucket.device_id == device_id)
+    )
+    buckets = bucket_rows.all()
+
+    candidates = set()
+    for band, bucket in buckets:
+        result = await db.execute(
+            select(DeviceLSHBucket.device_id).where(
+                DeviceLSHBucket.band == band,
+                DeviceLSHBucket.bucket == bucket,
+                DeviceLSHBucket.device_id != device_id
+            )
+        )
+        candidates.update(result.scalars().all())
+
+    candidate_ids = list(candidates)
+    candidate_signatures = await _load_signatures(db, candidate_ids)
+    scored = [
+        (other_id, minhasher.similarity(own, sig))
+        for other_id, sig in candidate_signatures.items()
+    ]
+    scored = [item for item in scored if item[1] >= threshold]
+    scored.sort(key=lambda item: item[1], reverse=True)
+    scored = scored[:limit]
+
+    devices = await _load_devices(db, [other_id for other_id, _ in scored])
+
+    return [
+        {
+            **devices[other_id].to_dict(),
+            "similarity": round(similarity, 3),
+        }
+        for other_id, similarity in scored
+        if other_id in devices
+    ]
+
+
+def _cluster_buckets(
+    buckets: Dict[tuple, List[str]],
+    signatures: Dict[str, List[int]],
+    threshold: float
+) -> Dict[str, List[str]]:
+    """
+    桶内成员两两比较签名，相似度达到阈值的通过并查集合并成簇（CPU 密集，在线程中执行）
+
+    Returns:
+        Dict[str, List[str]]: 簇根设备 -> 簇内设备
+    """
+    parent = {device_id: device_id for device_id in signatures}
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for members in buckets.values():
+        members = [device_id for device_id in members if device_id in signatures]
+        if len(members) < 2:
+            continue
+        matrix = np.array([signatures[device_id] for device_id in members], dtype=np.uint32)
+        for i in range(len(members) - 1):
+            # 与之后的所有成员比较（每行一次向量运算）
+            similar = np.flatnonzero((matrix[i + 1:] == matrix[i]).mean(axis=1) >= threshold)
+            for j in similar:
+                root_a, root_b = find(members[i]), find(members[i + 1 + j])
+                if root_a != root_b:
+                    parent[root_b] = root_a
+
+    clusters: Dict[str, List[str]] = {}
+    for device_id in signatures:
+        clusters.setdefault(find(device_id), []).append(device_id)
+    return clusters
+
+
+async def find_device_clusters(
+    db: AsyncSession,
+    days: int = 7,
+    threshold: float = 0.7,
+    min_size: int = 2,
+    limit: int = 50
+) -> List[Dict]:
+    """
+    查找近似重复设备簇
+
+    从最近 N 天出现过的设备（last_seen 索引）出发，按 idx_lsh_device 读取它们所在的 LSH 桶，
+    不对整个 device_lsh_buckets 表分组；有多个近期成员的桶内成员两两比较签名，
+    通过并查集合并成簇
+
+    Args:
+        days: 只统计最近 N 天出现过的设备
+        threshold: 签名估计的 Jaccard 相似度下限
+        min_size: 簇内最少设备数
+        limit: 返回的簇数量上限
+    """
+    since = datetime.utcnow() - timedelta(days=days)
+
+    stmt = select(
+        DeviceLSHBucket.band,
+        DeviceLSHBucket.bucket,
+        DeviceLSHBucket.device_id
+    ).select_from(Device).join(
+        DeviceLSHBucket, DeviceLSHBucket.device_id == Device.device_id
+    ).where(
+        Device.last_seen >= since
+    )
+
+    result = await db.execute(stmt)
+
+    buckets: Dict[tuple, List[str]] = {}
+    for band, bucket, device_id in result:
+        buckets.setdefault((band, bucket), []).append(device_id)
+
+    buckets = {key: members for key, members in buckets.items() if len(members) > 1}
+    if not buckets:
+        return []
+
+    member_ids = list({device_id for members in buckets.values() for device_id in members})
+    signatures = await _load_signatures(db, member_ids)
+
+    clusters = await asyncio.to_thread(_cluster_buckets, buckets, signatures, threshold)
+
+    groups = sorted(
+        (members for members in clusters.values() if len(members) >= min_size),
+        key=len,
+        reverse=True
+    )[:limit]
+
+    devices = await _load_devices(db, [device_id for members in groups for device_id in members])
+
+    response = []
+    for members in groups:
+        member_devices = sorted(
+            (devices[d] for d in members if d in devices),
+            key=lambda d: d.visit_count or 0,
+            reverse=True
+        )
+        response.append({
+            "size": len(members),
+            "total_visits": sum(d.visit_count or 0 for d in member_devices),
+            "total_distinct_ips": sum(d.distinct_ip_count or 0 for d in member_devices),
+            "devices": [d.to_dict() for d in member_devices[:20]],
+        })
+
+    return response
@@ -0,0 +1,211 @@
+"""
+启动预热和就绪状态
+应用启动后在后台依次执行预热步骤，全部完成前 /ready 返回 503，负载均衡器不转发流量，
+避免第一批请求承担建立连接、首次解析、冷缓存的开销：
+
+- schema：MIGRATE_ON_STARTUP 关闭时确认数据库结构已是最新版本（未执行的版本需先用 scripts/migrate.py 迁移）
+- database：并发建立连接池的常驻连接
+- pipeline：用示例数据走一遍 User-Agent 解析、请求校验、评分和轨迹特征计算（首次调用的导入和初始化开销）
+- geolocation：用最近 24 小时访问记录中已解析的 IP 地理位置填充缓存，
+  重启后同一批 IP 的访问不再请求外部接口
+
+schema、database 失败时保持未就绪；其余步骤失败只记录警告，不影响就绪
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.core.database import engine, async_session_maker
+from app.crud import visit as visit_crud
+from app.migrations import migration_runner
+from app.schemas.visit import VisitCreate
+from app.services.ingest import preview_visit
+from app.services.mouse_features import analyze_trajectories
+from app.utils.geolocation import CACHE_TTL_HOURS, prime_cache
+
+# 预热用的示例 User-Agent（桌面、移动、平板、爬虫各走一遍解析规则）
+SAMPLE_USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.0 Mobile/15E148 Safari/604.1",
+    "Mozilla/5.0 (iPad; CPU OS 16_6 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.6 Mobile/15E148 Safari/604.1",
+    "Mozilla/5.0 (compatible; Googlebot/2.1; +http://www.google.com/bot.html)",
+]
+
+# 步骤状态
+STEP_PENDING = "pending"
+STEP_RUNNING = "running"
+STEP_DONE = "done"
+STEP_FAILED = "failed"
+
+
+class WarmupStep:
+    """预热步骤"""
+
+    def __init__(self, name: str, run: Callable[[], Awaitable[Optional[Dict]]], required: bool):
+        self.name = name
+        self.run = run
+        self.required = required
+
+        self.status = STEP_PENDING
+        self.elapsed_ms: Optional[float] = None
+        self.detail: Optional[Dict] = None
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "status": self.status,
+            "required": self.required,
+            "elapsed_ms": self.elapsed_ms,
+            "detail": self.detail,
+            "error": self.error,
+        }
+
+
+class WarmupManager:
+    """启动预热（后台任务）和就绪状态"""
+
+    def __init__(self, geo_visits: int):
+        self.geo_visits = geo_visits
+
+        self.steps: List[WarmupStep] = [
+            WarmupStep("schema", self._check_schema, required=True),
+            WarmupStep("database", self._warm_database, required=True),
+            WarmupStep("pipeline", self._warm_pipeline, required=False),
+            WarmupStep("geolocation", self._warm_geolocation, required=False),
+        ]
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        """全部步骤已结束且必需步骤没有失败"""
+        return self.finished_at is not None and not any(
+            step.required and step.status != STEP_DONE for step in self.steps
+        )
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def run(self):
+        """依次执行预热步骤"""
+        self.started_at = time.perf_counter()
+        for step in self.steps:
+            step.status = STEP_RUNNING
+            started = time.perf_counter()
+            try:
+                step.detail = await step.run()
+                step.status = STEP_DONE
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                step.status = STEP_FAILED
+                step.error = str(e).splitlines()[0] if str(e) else type(e).__name__
+                level = "ERROR" if step.required else "WARN"
+                print(f"[{level}] 启动预热 {step.name} 失败: {step.error}")
+            step.elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        self.finished_at = time.perf_counter()
+
+        elapsed = (self.finished_at - self.started_at) * 1000
+        print(f"[INFO] 启动预热完成（{elapsed:.0f} ms），{'已就绪' if self.ready else '未就绪'}")
+
+    def stats(self) -> Dict:
+        elapsed = None
+        if self.started_at is not None:
+            end = self.finished_at if self.finished_at is not None else time.perf_counter()
+            elapsed = round((end - self.started_at) * 1000, 1)
+        return {
+            "ready": self.ready,
+            "elapsed_ms": elapsed,
+            "steps": [step.to_dict() for step in self.steps],
+        }
+
+    # ---------- 预热步骤 ----------
+
+    async def _check_schema(self) -> Dict:
+        if settings.MIGRATE_ON_STARTUP:
+            # 结构变更已在启动时同步执行，回填和建索引在后台继续（不影响就绪）
+            return {"head": migration_runner.head, "migrated": True}
+        pending = await migration_runner.pending_versions()
+        if pending:
+            raise RuntimeError(f"数据库有未执行的迁移版本 {pending}，请先执行 scripts/migrate.py")
+        return {"head": migration_runner.head, "migrated": False}
+
+    async def _warm_database(self) -> Dict:
+        """同时占用连接池的常驻连接数个连接，使它们全部建立"""
+        size = engine.pool.size() if hasattr(engine.pool, "size") else 1
+
+        async def ping():
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+                # 保持连接直到所有连接都已建立，避免重复使用同一个连接
+                await barrier.wait()
+
+        barrier = _Barrier(size)
+        await asyncio.gather(*(ping() for _ in range(size)))
+        return {"connections": size}
+
+    async def _warm_pipeline(self) -> Dict:
+        def run():
+            for ua in SAMPLE_USER_AGENTS:
+                preview_visit(VisitCreate(
+                    user_agent=ua,
+                    page_url="http://warmup.local/",
+                    screen_resolution="1920x1080",
+                    timezone="UTC",
+                ))
+            analyze_trajectories([[(i, i * 2, i * 16) for i in range(50)]])
+
+        # CPU 密集的首次调用放到线程中，不阻塞事件循环（/health 等请求照常响应）
+        await asyncio.to_thread(run)
+        return {"user_agents": len(SAMPLE_USER_AGENTS)}
+
+    async def _warm_geolocation(self) -> Dict:
+        if self.geo_visits <= 0:
+            return {"primed": 0}
+
+        now = datetime.utcnow()
+        async with async_session_maker() as db:
+            rows = await visit_crud.recent_ip_locations(
+                db, since=now - timedelta(hours=CACHE_TTL_HOURS), limit=self.geo_visits
+            )
+
+        primed = 0
+        for ip_address, country_code, city, timestamp in rows:
+            if timestamp.tzinfo is not None:
+                timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+            # 按时间倒序：同一 IP 只使用最近一次解析的结果
+            if await prime_cache(ip_address, {"country_code": country_code, "city": city}, now - timestamp):
+                primed += 1
+        return {"visits": len(rows), "primed": primed}
+
+
+class _Barrier:
+    """等待指定数量的协程都到达后一起继续（asyncio.Barrier 需要 Python 3.11）"""
+
+    def __init__(self, parties: int):
+        self.parties = parties
+        self._arrived = 0
+        self._event = asyncio.Event()
+
+    async def wait(self):
+        self._arrived += 1
+        if self._arrived >= self.parties:
+            self._event.set()
+        await self._event.wait()
+
+
+# 全局启动预热
+warmup_manager = WarmupManager(geo_visits=settings.WARMUP_GEO_VISITS)
@@ -1,28 +1,41 @@
 """
 Authentication utilities
 JWT token generation and verification, password hashing
+
+python-jose and passlib are only needed by the admin login and admin API, so
+they are imported on first use; workers that only serve the tracking endpoints
+never load them.
 """
+import hashlib
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from typing import Dict, Optional, Tuple
 from app.config import settings
 
-# Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing context (created on first use)
+_pwd_context = None
 
 # JWT settings
 ALGORITHM = "HS256"
 
 
+def _password_context():
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return _password_context().verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
     """Generate password hash"""
-    return pwd_context.hash(password)
+    return _password_context().hash(password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -36,6 +49,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     Returns:
         Encoded JWT token
     """
+    from jose import jwt
+
     to_encode = data.copy()
 
     if expires_delta:
@@ -49,22 +64,104 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
+class VerifiedTokenCache:
+    """
+    Cache of successfully verified tokens
+
+    Maps the SHA-256 digest of a token to its decoded payload until the token's
+    own expiry. Bounded LRU; entries are tied to the secret they were verified
+    with, so changing SECRET_KEY drops the whole cache. Failed verifications are
+    never cached.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[bytes, Tuple[dict, float]]" = OrderedDict()
+        self._secret: Optional[str] = None
+
+        self.hits = 0
+        self.misses = 0
+
+    def _check_secret(self, secret: str):
+        if secret != self._secret:
+            self._entries.clear()
+            self._secret = secret
+
+    def get(self, token: str, secret: str) -> Optional[dict]:
+        """Return a copy of the cached payload, or None if absent or expired"""
+        self._check_secret(secret)
+        key = hashlib.sha256(token.encode()).digest()
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        payload, expires_at = entry
+        if time.time() >= expires_at:
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return dict(payload)
+
+    def put(self, token: str, secret: str, payload: dict):
+        """Store a verified payload (tokens without an exp claim are not cached)"""
+        if self.max_size <= 0 or not isinstance(payload.get("exp"), (int, float)):
+            return
+        self._check_secret(secret)
+        key = hashlib.sha256(token.encode()).digest()
+        self._entries[key] = (dict(payload), float(payload["exp"]))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else None,
+        }
+
+
+# Verified token cache (the admin dashboard sends several requests per refresh with the same token)
+token_cache = VerifiedTokenCache(max_size=settings.TOKEN_CACHE_SIZE)
+
+
 def verify_access_token(token: str) -> Optional[dict]:
     """
     Verify JWT access token
 
+    Recently verified tokens are served from token_cache until they expire.
+
     Args:
         token: JWT token to verify
 
     Returns:
         Decoded payload if valid, None otherwise
     """
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
+    secret = settings.SECRET_KEY
+    payload = token_cache.get(token, secret)
+    if payload is not None:
         return payload
+
+    from jose import JWTError, jwt
+
+    try:
+        payload = jwt.decode(token, secret, algorithms=[ALGORITHM])
     except JWTError:
         return None
 
+    token_cache.put(token, secret, payload)
+    return payload
+
 
 def verify_admin_credentials(username: str, password: str) -> bool:
     """
@@ -3,9 +3,15 @@ IP Geolocation utilities
 Get country, city, and ISP information from IP addresses
 """
 import httpx
+import time
 from typing import Optional, Dict
 from datetime import datetime, timedelta
 import asyncio
+from app.core.metrics import (
+    geolocation_lookups,
+    geolocation_upstream_duration,
+    geolocation_upstream_errors,
+)
 
 # Using ip-api.com (free, no API key required)
 # Rate limit: 45 requests per minute
@@ -19,6 +25,38 @@ _cache_lock = asyncio.Lock()
 # Cache TTL: 24 hours (IP locations rarely change)
 CACHE_TTL_HOURS = 24
 
+# Shared HTTP client (opened in the app lifespan so lookups reuse connections);
+# without it each lookup opens a short-lived client (scripts, tests)
+REQUEST_TIMEOUT = 5.0
+_http_client: Optional[httpx.AsyncClient] = None
+
+# Lookup counters (also exported at /metrics)
+_LOOKUP_LOCAL = geolocation_lookups.labels("local")
+_LOOKUP_HIT = geolocation_lookups.labels("hit")
+_LOOKUP_MISS = geolocation_lookups.labels("miss")
+
+
+async def open_http_client():
+    """Open the shared HTTP client used for geolocation lookups"""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(timeout=REQUEST_TIMEOUT)
+
+
+async def close_http_client():
+    """Close the shared HTTP client"""
+    global _http_client
+    if _http_client is not None:
+        client, _http_client = _http_client, None
+        await client.aclose()
+
+
+async def _fetch(url: str) -> httpx.Response:
+    if _http_client is not None:
+        return await _http_client.get(url)
+    async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT) as client:
+        return await client.get(url)
+
 
 async def get_ip_geolocation(ip_address: str) -> Optional[Dict[str, str]]:
     """
@@ -32,6 +70,7 @@ async def get_ip_geolocation(ip_address: str) -> Optional[Dict[str, str]]:
     """
     # Skip localhost and private IPs
     if ip_address in ['127.0.0.1', 'localhost'] or ip_address.startswith('192.168.') or ip_address.startswith('10.'):
+        _LOOKUP_LOCAL.inc()
         return {
             'country': 'Local',
             'country_code': 'LOCAL',
@@ -45,65 +84,102 @@ async def get_ip_geolocation(ip_address: str) -> Optional[Dict[str, str]]:
             cached_data, expiration = _geolocation_cache[ip_address]
             if datetime.now() < expiration:
                 # Cache hit and not expired
+                _LOOKUP_HIT.inc()
                 return cached_data
             else:
                 # Cache expired, remove it
                 del _geolocation_cache[ip_address]
 
     # Cache miss or expired, fetch from API
+    _LOOKUP_MISS.inc()
+    started = time.perf_counter()
     try:
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            response = await client.get(IP_API_URL.format(ip=ip_address))
-
-            if response.status_code == 200:
-                data = response.json()
-
-                if data.get('status') == 'success':
-                    result = {
-                        'country': data.get('country'),
-                        'country_code': data.get('countryCode'),
-                        'region': data.get('regionName'),
-                        'city': data.get('city'),
-                        'zip': data.get('zip'),
-                        'lat': data.get('lat'),
-                        'lon': data.get('lon'),
-                        'timezone': data.get('timezone'),
-                        'isp': data.get('isp'),
-                        'org': data.get('org'),
-                        'as': data.get('as')
-                    }
-
-                    # Store in cache
-                    async with _cache_lock:
-                        expiration = datetime.now() + timedelta(hours=CACHE_TTL_HOURS)
-                        _geolocation_cache[ip_address] = (result, expiration)
-
-                    return result
-                else:
-                    # API returned error, cache None to avoid repeated failed requests
-                    async with _cache_lock:
-                        expiration = datetime.now() + timedelta(hours=1)  # Shorter TTL for errors
-                        _geolocation_cache[ip_address] = (None, expiration)
-                    return None
+        response = await _fetch(IP_API_URL.format(ip=ip_address))
+        geolocation_upstream_duration.observe(time.perf_counter() - started)
+
+        if response.status_code == 200:
+            data = response.json()
+
+            if data.get('status') == 'success':
+                result = {
+                    'country': data.get('country'),
+                    'country_code': data.get('countryCode'),
+                    'region': data.get('regionName'),
+                    'city': data.get('city'),
+                    'zip': data.get('zip'),
+                    'lat': data.get('lat'),
+                    'lon': data.get('lon'),
+                    'timezone': data.get('timezone'),
+                    'isp': data.get('isp'),
+                    'org': data.get('org'),
+                    'as': data.get('as')
+                }
+
+                # Store in cache
+                async with _cache_lock:
+                    expiration = datetime.now() + timedelta(hours=CACHE_TTL_HOURS)
+                    _geolocation_cache[ip_address] = (result, expiration)
+
+                return result
             else:
+                # API returned error, cache None to avoid repeated failed requests
+                geolocation_upstream_errors.labels("api").inc()
+                async with _cache_lock:
+                    expiration = datetime.now() + timedelta(hours=1)  # Shorter TTL for errors
+                    _geolocation_cache[ip_address] = (None, expiration)
                 return None
+        else:
+            geolocation_upstream_errors.labels("http").inc()
+            return None
 
     except Exception as e:
         # Log error but don't fail the request
+        geolocation_upstream_errors.labels("exception").inc()
         print(f"IP geolocation error for {ip_address}: {str(e)}")
         return None
 
 
+async def prime_cache(ip_address: str, data: Dict[str, str], age: timedelta) -> bool:
+    """
+    Seed the cache with a previously resolved location (startup warm-up)
+
+    Args:
+        ip_address: IP address
+        data: Geolocation data (country_code / city as stored on visits)
+        age: How long ago the location was resolved; it expires CACHE_TTL_HOURS after that
+
+    Returns:
+        True if the entry was added (existing and already expired entries are skipped)
+    """
+    remaining = timedelta(hours=CACHE_TTL_HOURS) - age
+    if remaining <= timedelta(0):
+        return False
+
+    async with _cache_lock:
+        if ip_address in _geolocation_cache:
+            return False
+        _geolocation_cache[ip_address] = (data, datetime.now() + remaining)
+    return True
+
+
 def get_cache_stats() -> Dict[str, int]:
     """
     Get cache statistics
 
     Returns:
-        Dictionary with cache size and hit rate info
+        Dictionary with cache size and hit rate info (local/private IPs are not
+        counted as lookups)
     """
+    hits, misses = _LOOKUP_HIT.value, _LOOKUP_MISS.value
+    total = hits + misses
     return {
         'cache_size': len(_geolocation_cache),
-        'cache_limit': 1000  # Soft limit
+        'cache_limit': 1000,  # Soft limit
+        'hits': hits,
+        'misses': misses,
+        'local': _LOOKUP_LOCAL.value,
+        'hit_rate': round(hits / total, 4) if total else None,
+        'upstream_errors': geolocation_upstream_errors.total(),
     }
 
 
@@ -31,68 +31,62 @@ def generate_fingerprint_hash(*components: Optional[str]) -> str:
     return hashlib.sha256(combined.encode()).hexdigest()
 
 
-def generate_visit_id(ip: str, timestamp: str, ua: str) -> str:
+# 设备标识使用的指纹字段（均与网络环境无关，不包含 IP）
+DEVICE_ID_FIELDS = (
+    "canvas_fingerprint",
+    "webgl_fingerprint",
+    "fonts_hash",
+    "audio_fingerprint",
+    "webgl_vendor",
+    "webgl_renderer",
+    "screen_resolution",
+    "timezone",
+    "platform",
+    "hardware_concurrency",
+    "device_memory",
+    "color_depth",
+    "pixel_ratio",
+    "max_touch_points",
+    "plugins_hash",
+    "speech_voices_hash",
+)
+
+
+def generate_device_id(source) -> Optional[str]:
     """
-    生成访问记录的唯一ID
+    生成与 IP 无关的设备标识
+    同一设备更换代理 IP 后仍得到相同的标识
 
     Args:
-        ip: IP 地址
-        timestamp: 时间戳
-        ua: User-Agent
+        source: 带有指纹字段属性的对象（VisitCreate 或 Visit）
 
     Returns:
-        str: 唯一访问 ID
+        Optional[str]: SHA-256 哈希值；没有任何指纹字段时返回 None
     """
-    combined = f"{ip}|{timestamp}|{ua}"
-    return hashlib.sha256(combined.encode()).hexdigest()[:32]
+    parts = []
+    for field in DEVICE_ID_FIELDS:
+        value = getattr(source, field, None)
+        if value is not None:
+            # 带上字段名，避免缺失字段导致不同组合拼出相同的字符串
+            parts.append(f"{field}={value}")
+
+    if not parts:
+        return None
+
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()
 
 
-def calculate_fingerprint_quality(
-    canvas: Optional[str],
-    webgl: Optional[str],
-    fonts: Optional[str],
-    screen: Optional[str],
-    timezone: Optional[str],
-    language: Optional[str]
-) -> int:
+def generate_visit_id(ip: str, timestamp: str, ua: str) -> str:
     """
-    计算指纹完整度评分（0-100）
+    生成访问记录的唯一ID
 
     Args:
-        canvas: Canvas 指纹
-        webgl: WebGL 指纹
-        fonts: 字体哈希
-        screen: 屏幕分辨率
-        timezone: 时区
-        language: 语言
+        ip: IP 地址
+        timestamp: 时间戳
+        ua: User-Agent
 
     Returns:
-        int: 指纹质量分数（0-100）
+        str: 唯一访问 ID
     """
-    score = 0
-
-    # Canvas 指纹 (25分)
-    if canvas:
-        score += 25
-
-    # WebGL 指纹 (25分)
-    if webgl:
-        score += 25
-
-    # 字体哈希 (20分)
-    if fonts:
-        score += 20
-
-    # 屏幕分辨率 (10分)
-    if screen:
-        score += 10
-
-    # 时区 (10分)
-    if timezone:
-        score += 10
-
-    # 语言 (10分)
-    if language:
-        score += 10
-
-    return score
+    combined = f"{ip}|{timestamp}|{ua}"
+    return hashlib.sha256(combined.encode()).hexdigest()[:32]
@@ -0,0 +1,88 @@
+"""
+MinHash 与局部敏感哈希（LSH）工具
+用于在不做两两比较的情况下找出指纹组件高度重合的设备
+"""
+import hashlib
+import random
+import struct
+from typing import Iterable, List, Sequence
+
+# 梅森素数 2^61 - 1，作为通用哈希的模数
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+class MinHasher:
+    """
+    MinHash 签名生成器
+
+    num_perm = bands * rows；同一分段（band）内 rows 个值完全相同的两个签名
+    会落入同一个桶，Jaccard 相似度为 s 的两个集合成为候选的概率为
+    1 - (1 - s^rows)^bands
+    """
+
+    def __init__(self, bands: int = 16, rows: int = 4, seed: int = 1):
+        self.bands = bands
+        self.rows = rows
+        self.num_perm = bands * rows
+
+        # 固定种子，保证不同进程、不同时间生成的签名可以比较
+        rng = random.Random(seed)
+        self._params = [
+            (rng.randrange(1, _PRIME), rng.randrange(0, _PRIME))
+            for _ in range(self.num_perm)
+        ]
+
+    @staticmethod
+    def _token_hash(token: str) -> int:
+        return int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "big")
+
+    def signature(self, tokens: Iterable[str]) -> List[int]:
+        """
+        计算 MinHash 签名
+
+        Args:
+            tokens: 集合元素
+
+        Returns:
+            List[int]: 长度为 num_perm 的签名；空集合返回全最大值
+        """
+        hashes = [self._token_hash(t) for t in set(tokens)]
+        if not hashes:
+            return [_MAX_HASH] * self.num_perm
+
+        return [
+            min(((a * h + b) % _PRIME) & _MAX_HASH for h in hashes)
+            for a, b in self._params
+        ]
+
+    def band_keys(self, signature: Sequence[int]) -> List[str]:
+        """
+        计算签名每个分段的桶键
+
+        Returns:
+            List[str]: 长度为 bands 的十六进制桶键
+        """
+        keys = []
+        for band in range(self.bands):
+            chunk = signature[band * self.rows:(band + 1) * self.rows]
+            packed = struct.pack(f"<{self.rows}I", *chunk)
+            keys.append(hashlib.blake2b(packed, digest_size=8).hexdigest())
+        return keys
+
+    @staticmethod
+    def similarity(sig_a: Sequence[int], sig_b: Sequence[int]) -> float:
+        """由签名估计 Jaccard 相似度"""
+        if not sig_a or len(sig_a) != len(sig_b):
+            return 0.0
+        return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / len(sig_a)
+
+    @staticmethod
+    def pack(signature: Sequence[int]) -> bytes:
+        """签名序列化"""
+        return struct.pack(f"<{len(signature)}I", *signature)
+
+    @staticmethod
+    def unpack(data: bytes) -> List[int]:
+        """签名反序列化"""
+        return list(struct.unpack(f"<{len(data) // 4}I", data))
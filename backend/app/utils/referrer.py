@@ -0,0 +1,162 @@
+"""
+来源（Referrer）解析与分类工具
+在写入时解析一次，结果存入 referrer_domain / referrer_channel 字段
+"""
+from urllib.parse import urlsplit
+from typing import Optional, Tuple
+
+# 渠道常量
+CHANNEL_DIRECT = "direct"
+CHANNEL_OTHER = "other"
+
+# 渠道显示名称
+CHANNEL_NAMES = {
+    "google": "Google",
+    "bing": "Bing",
+    "baidu": "百度",
+    "tiktok": "TikTok/抖音",
+    "facebook": "Facebook",
+    "twitter": "Twitter/X",
+    "youtube": "YouTube",
+    "instagram": "Instagram",
+    "weibo": "微博",
+    "wechat": "微信",
+    "linkedin": "LinkedIn",
+    "reddit": "Reddit",
+    CHANNEL_DIRECT: "直接访问",
+}
+
+# 完整域名后缀 -> 渠道（从右向左逐级匹配，如 m.facebook.com -> facebook.com）
+_SUFFIX_CHANNELS = {
+    "fb.com": "facebook",
+    "fb.me": "facebook",
+    "x.com": "twitter",
+    "t.co": "twitter",
+    "youtu.be": "youtube",
+    "lnkd.in": "linkedin",
+    "redd.it": "reddit",
+    "wx.qq.com": "wechat",
+}
+
+# 品牌标签 -> 渠道（域名任一标签命中即可，覆盖 google.co.uk / google.com.hk 等各国域名）
+_LABEL_CHANNELS = {
+    "google": "google",
+    "bing": "bing",
+    "microsoft": "bing",
+    "baidu": "baidu",
+    "tiktok": "tiktok",
+    "douyin": "tiktok",
+    "facebook": "facebook",
+    "twitter": "twitter",
+    "youtube": "youtube",
+    "instagram": "instagram",
+    "weibo": "weibo",
+    "wechat": "wechat",
+    "weixin": "wechat",
+    "linkedin": "linkedin",
+    "reddit": "reddit",
+}
+
+# 视为"无来源"的取值
+_EMPTY_REFERRERS = {"", "null", "none", "undefined"}
+
+# referrer_domain 字段长度
+MAX_DOMAIN_LENGTH = 255
+
+
+def extract_referrer_domain(referrer: Optional[str]) -> Optional[str]:
+    """
+    从 Referrer URL 中提取规范化域名
+
+    去除端口、账号信息和 www. 前缀，统一小写
+
+    Args:
+        referrer: 来源页面 URL
+
+    Returns:
+        Optional[str]: 规范化后的域名，无法解析时返回 None
+    """
+    if referrer is None:
+        return None
+
+    referrer = referrer.strip()
+    if referrer.lower() in _EMPTY_REFERRERS:
+        return None
+
+    try:
+        hostname = urlsplit(referrer).hostname
+    except ValueError:
+        return None
+
+    if not hostname:
+        return None
+
+    hostname = hostname.rstrip(".")
+    if hostname.startswith("www."):
+        hostname = hostname[4:]
+
+    return hostname[:MAX_DOMAIN_LENGTH] or None
+
+
+def classify_domain(domain: Optional[str]) -> str:
+    """
+    根据规范化域名判断来源渠道
+
+    Args:
+        domain: extract_referrer_domain 的结果
+
+    Returns:
+        str: 渠道标识（如 google / facebook / direct / other）
+    """
+    if not domain:
+        return CHANNEL_DIRECT
+
+    labels = domain.split(".")
+
+    # 先按完整后缀匹配
+    for i in range(len(labels)):
+        channel = _SUFFIX_CHANNELS.get(".".join(labels[i:]))
+        if channel:
+            return channel
+
+    # 再按品牌标签匹配（忽略顶级域）
+    for label in labels[:-1] or labels:
+        channel = _LABEL_CHANNELS.get(label)
+        if channel:
+            return channel
+
+    return CHANNEL_OTHER
+
+
+def classify_referrer(referrer: Optional[str]) -> Tuple[Optional[str], str]:
+    """
+    解析并分类 Referrer
+
+    Args:
+        referrer: 来源页面 URL
+
+    Returns:
+        tuple: (referrer_domain, referrer_channel)
+    """
+    domain = extract_referrer_domain(referrer)
+    return domain, classify_domain(domain)
+
+
+def channel_display_name(channel: Optional[str], domain: Optional[str]) -> str:
+    """
+    获取渠道的显示名称，未归类的来源直接显示域名
+
+    Args:
+        channel: 渠道标识
+        domain: 规范化域名
+
+    Returns:
+        str: 显示名称
+    """
+    if channel in CHANNEL_NAMES:
+        return CHANNEL_NAMES[channel]
+
+    if domain:
+        return domain if len(domain) < 30 else domain[:27] + '...'
+
+    return '其他'
@@ -0,0 +1,207 @@
+"""
+鼠标轨迹编码
+轨迹点 (x, y, t) 按与前一个点的差值做 zigzag + varint 编码后以二进制存储，
+相邻采样点的差值通常只需 1-2 个字节，比 JSON 文本小一个数量级
+
+二进制格式：
+    版本（1 字节）| 点数（varint）| 每个点的 dx, dy, dt（zigzag varint，第一个点相对 0）
+
+同样的字节串经 base64url（无填充）编码后作为追踪脚本的紧凑上报格式
+"""
+import base64
+import json
+from typing import List, Optional, Sequence, Tuple
+
+from app.config import settings
+
+Point = Tuple[int, int, int]
+
+FORMAT_VERSION = 1
+
+# 坐标和时间的绝对值上限
+MAX_VALUE = 2 ** 31 - 1
+
+
+class TrajectoryError(ValueError):
+    """轨迹数据格式错误"""
+
+
+def _zigzag(n: int) -> int:
+    return (n << 1) if n >= 0 else ((-n << 1) - 1)
+
+
+def _unzigzag(n: int) -> int:
+    return (n >> 1) if not n & 1 else -((n + 1) >> 1)
+
+
+def _write_varint(out: bytearray, n: int):
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        if pos >= len(data):
+            raise TrajectoryError("truncated varint")
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+        if shift > 63:
+            raise TrajectoryError("varint too long")
+
+
+def encode_points(points: Sequence[Point]) -> bytes:
+    """
+    编码轨迹点
+
+    Args:
+        points: (x, y, t) 整数序列，t 为相对页面加载的毫秒数
+
+    Returns:
+        bytes: 二进制轨迹
+    """
+    out = bytearray([FORMAT_VERSION])
+    _write_varint(out, len(points))
+
+    px = py = pt = 0
+    for x, y, t in points:
+        _write_varint(out, _zigzag(x - px))
+        _write_varint(out, _zigzag(y - py))
+        _write_varint(out, _zigzag(t - pt))
+        px, py, pt = x, y, t
+
+    return bytes(out)
+
+
+def decode_points(data: bytes, max_points: Optional[int] = None) -> List[Point]:
+    """
+    解码二进制轨迹
+
+    Args:
+        data: 二进制轨迹
+        max_points: 最多允许的点数（上报时传入 TRAJECTORY_MAX_POINTS；
+            读取已存储的轨迹时不传，调低该设置后旧轨迹仍可读取）
+
+    Raises:
+        TrajectoryError: 数据格式错误
+    """
+    if not data:
+        return []
+    if data[0] != FORMAT_VERSION:
+        raise TrajectoryError(f"unsupported trajectory version {data[0]}")
+
+    count, pos = _read_varint(data, 1)
+    # 每个点至少 3 个字节，点数与数据长度不符时不分配列表
+    if count * 3 > len(data) - pos:
+        raise TrajectoryError("truncated trajectory")
+    if max_points is not None and count > max_points:
+        raise TrajectoryError("too many points")
+
+    points = []
+    x = y = t = 0
+    for _ in range(count):
+        dx, pos = _read_varint(data, pos)
+        dy, pos = _read_varint(data, pos)
+        dt, pos = _read_varint(data, pos)
+        x += _unzigzag(dx)
+        y += _unzigzag(dy)
+        t += _unzigzag(dt)
+        points.append((x, y, t))
+
+    if pos != len(data):
+        raise TrajectoryError("trailing bytes")
+
+    return points
+
+
+def point_count(data: Optional[bytes]) -> int:
+    """只读取头部的点数，不解码轨迹"""
+    if not data:
+        return 0
+    try:
+        count, _ = _read_varint(data, 1)
+    except TrajectoryError:
+        return 0
+    return count
+
+
+def parse_json_points(text: Optional[str]) -> List[Point]:
+    """
+    解析 JSON 格式的轨迹（[{"x":..,"y":..,"t":..}, ...]）
+
+    Raises:
+        TrajectoryError: 数据格式错误
+    """
+    if not text:
+        return []
+    try:
+        items = json.loads(text)
+        points = [
+            (int(round(float(p["x"]))), int(round(float(p["y"]))), int(round(float(p.get("t", 0)))))
+            for p in items
+        ]
+    except (ValueError, TypeError, KeyError, AttributeError, OverflowError) as e:
+        # json.loads 接受 Infinity / NaN，取整时分别抛出 OverflowError / ValueError
+        raise TrajectoryError(f"invalid trajectory JSON: {e}")
+
+    # 超出范围的值编码后无法解码（varint 最多 64 位）
+    if any(abs(value) > MAX_VALUE for point in points for value in point):
+        raise TrajectoryError("coordinate out of range")
+
+    return points[-settings.TRAJECTORY_MAX_POINTS:]
+
+
+def parse_packed(text: Optional[str]) -> List[Point]:
+    """
+    解析紧凑上报格式（base64url 编码的二进制轨迹）
+
+    Raises:
+        TrajectoryError: 数据格式错误
+    """
+    if not text:
+        return []
+    try:
+        data = base64.b64decode(text + "=" * (-len(text) % 4), altchars=b"-_", validate=True)
+    except (ValueError, TypeError) as e:
+        raise TrajectoryError(f"invalid packed trajectory: {e}")
+    return decode_points(data, max_points=settings.TRAJECTORY_MAX_POINTS)
+
+
+def to_packed(data: Optional[bytes], legacy_json: Optional[str] = None) -> str:
+    """
+    转为紧凑文本（用于导出）
+
+    尚未迁移的旧记录先把 JSON 轨迹编码为二进制
+    """
+    if not data and legacy_json:
+        points = load_points(None, legacy_json)
+        data = encode_points(points) if points else None
+    if not data:
+        return ""
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def to_json(points: Sequence[Point]) -> str:
+    """轨迹点转为 JSON 文本（与旧格式一致）"""
+    return json.dumps([{"x": x, "y": y, "t": t} for x, y, t in points], separators=(",", ":"))
+
+
+def load_points(data: Optional[bytes], legacy_json: Optional[str] = None) -> List[Point]:
+    """
+    读取访问记录中的轨迹
+
+    优先使用二进制列，尚未迁移的旧记录回退到 JSON 文本列；格式错误时返回空列表
+    """
+    try:
+        if data:
+            return decode_points(data)
+        return parse_json_points(legacy_json)
+    except TrajectoryError:
+        return []
@@ -0,0 +1,55 @@
+"""
+时区工具
+"""
+from datetime import datetime
+from typing import Dict, Optional
+from zoneinfo import ZoneInfo
+
+# 国家到时区的映射（主要时区），用于访问者未上报 timezone 时的回退
+COUNTRY_TIMEZONE_MAP = {
+    'US': 'America/New_York',
+    'CN': 'Asia/Shanghai',
+    'JP': 'Asia/Tokyo',
+    'KR': 'Asia/Seoul',
+    'GB': 'Europe/London',
+    'FR': 'Europe/Paris',
+    'DE': 'Europe/Berlin',
+    'AU': 'Australia/Sydney',
+    'CA': 'America/Toronto',
+    'IN': 'Asia/Kolkata',
+    'BR': 'America/Sao_Paulo',
+    'RU': 'Europe/Moscow',
+    'SG': 'Asia/Singapore',
+    'HK': 'Asia/Hong_Kong',
+    'TW': 'Asia/Taipei',
+}
+
+
+def timezone_offset_minutes(
+    tz_name: Optional[str],
+    now_utc: datetime,
+    memo: Optional[Dict[str, Optional[int]]] = None
+) -> Optional[int]:
+    """
+    计算时区当前相对 UTC 的偏移（分钟）
+
+    Args:
+        tz_name: IANA 时区名称
+        now_utc: 当前时间（带 UTC 时区）
+        memo: 缓存字典，同一批计算内每个时区只计算一次
+
+    Returns:
+        Optional[int]: 偏移分钟数（东正西负）；无法识别的时区返回 None
+    """
+    if memo is not None and tz_name in memo:
+        return memo[tz_name]
+
+    try:
+        offset = now_utc.astimezone(ZoneInfo(tz_name)).utcoffset()
+        minutes = int(offset.total_seconds() // 60)
+    except Exception:
+        minutes = None
+
+    if memo is not None:
+        memo[tz_name] = minutes
+    return minutes
@@ -1,9 +1,23 @@
 """
 User-Agent 解析工具
+
+user_agents 导入时加载全部解析规则（约 0.2 秒），改为首次解析时导入：
+进程启动不等待加载，启动预热（app/services/warmup.py）在后台线程中完成首次解析
+
+同一 User-Agent 的解析结果按 LRU 缓存（UA_CACHE_SIZE 条），访问集中在少数浏览器版本上，
+命中时不再执行正则匹配
 """
-from user_agents import parse
+from functools import lru_cache
 from typing import Dict
 
+from app.config import settings
+
+
+def parse(ua_string: str):
+    """解析 User-Agent（首次调用时导入 user_agents）"""
+    from user_agents import parse as parse_ua
+    return parse_ua(ua_string)
+
 
 def parse_user_agent(ua_string: str) -> Dict[str, any]:
     """
@@ -15,6 +29,12 @@ def parse_user_agent(ua_string: str) -> Dict[str, any]:
     Returns:
         dict: 包含设备类型、浏览器、操作系统等信息的字典
     """
+    # 返回副本，调用方修改结果不影响缓存
+    return dict(_parse_user_agent_cached(ua_string))
+
+
+@lru_cache(maxsize=settings.UA_CACHE_SIZE)
+def _parse_user_agent_cached(ua_string: str) -> Dict[str, any]:
     ua = parse(ua_string)
 
     # 判断设备类型
@@ -77,3 +97,16 @@ def get_device_type(ua_string: str) -> str:
         return "tablet"
     else:
         return "pc"
+
+
+def get_cache_stats() -> Dict[str, int]:
+    """User-Agent 解析缓存统计"""
+    info = _parse_user_agent_cached.cache_info()
+    total = info.hits + info.misses
+    return {
+        "cache_size": info.currsize,
+        "cache_limit": info.maxsize,
+        "hits": info.hits,
+        "misses": info.misses,
+        "hit_rate": round(info.hits / total, 4) if total else None,
+    }
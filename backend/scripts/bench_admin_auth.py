@@ -0,0 +1,96 @@
+"""
+管理后台令牌验证基准：对比每次请求都执行 jwt.decode 与使用已验证令牌缓存（app/utils/auth.py 的 token_cache）
+
+1. 验证基准：只测 verify_access_token 本身
+2. 接口基准：模拟管理后台一次刷新并发发出的多个请求，统计轻量接口（不访问数据库）的平均耗时，
+   差值即每个管理请求节省的验证时间；访问数据库的统计接口耗时以查询为主，节省的比例相应更小
+
+用法：
+    python scripts/bench_admin_auth.py [刷新次数] [每次刷新的并发请求数]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import timeit
+from pathlib import Path
+
+# 使用临时数据库，必须在导入 app 之前设置
+_tmp_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_tmp_dir}/bench.db"
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import httpx
+from app.main import app
+from app.config import settings
+from app.core.database import init_db
+from app.utils.auth import create_access_token, verify_access_token, token_cache
+
+# 不访问数据库的管理接口（耗时主要是令牌验证和框架开销）
+LIGHT_PATHS = ["/api/v1/auth/verify", "/api/v1/admin/stats/ratelimit"]
+
+
+def bench_verify(token: str, number: int = 20000):
+    """验证基准"""
+    print(f"[INFO] 验证基准（{number} 次）...")
+    results = {}
+    for name, size in (("jwt.decode", 0), ("缓存命中", settings.TOKEN_CACHE_SIZE)):
+        token_cache.max_size = size
+        token_cache.clear()
+        verify_access_token(token)
+        elapsed = min(timeit.repeat(lambda: verify_access_token(token), number=number, repeat=3))
+        results[name] = elapsed
+        print(f"  {name}: {elapsed / number * 1e6:.1f} µs/次")
+    print(f"  提升: {results['jwt.decode'] / results['缓存命中']:.1f}x")
+
+
+async def bench_refresh(client: httpx.AsyncClient, headers: dict, refreshes: int, fanout: int) -> float:
+    """模拟多次刷新，返回每个请求的平均耗时（毫秒）"""
+    paths = [LIGHT_PATHS[i % len(LIGHT_PATHS)] for i in range(fanout)]
+
+    async def one(path):
+        response = await client.get(path, headers=headers)
+        assert response.status_code == 200, response.text
+
+    started = time.perf_counter()
+    for _ in range(refreshes):
+        await asyncio.gather(*(one(path) for path in paths))
+    return (time.perf_counter() - started) / (refreshes * fanout) * 1000
+
+
+async def bench_requests(token: str, refreshes: int, fanout: int):
+    """接口基准"""
+    await init_db()
+    headers = {"Authorization": f"Bearer {token}"}
+    transport = httpx.ASGITransport(app=app)
+
+    print(f"[INFO] 接口基准（{refreshes} 次刷新，每次 {fanout} 个并发请求）...")
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # 预热
+        await bench_refresh(client, headers, 10, fanout)
+        # 交替运行两轮
+        for _ in range(2):
+            for name, size in (("jwt.decode", 0), ("缓存", settings.TOKEN_CACHE_SIZE)):
+                token_cache.max_size = size
+                token_cache.clear()
+                ms = await bench_refresh(client, headers, refreshes // 2, fanout)
+                results[name] = results.get(name, 0.0) + ms / 2
+
+    for name, ms in results.items():
+        print(f"  {name}: {ms:.3f} ms/请求")
+    saved = results["jwt.decode"] - results["缓存"]
+    print(f"  每个请求节省: {saved:.3f} ms（{saved / results['jwt.decode']:.0%}）")
+
+
+if __name__ == "__main__":
+    refreshes = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    fanout = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+    token = create_access_token({"sub": settings.ADMIN_USERNAME, "type": "admin"})
+    bench_verify(token)
+    asyncio.run(bench_requests(token, refreshes, fanout))
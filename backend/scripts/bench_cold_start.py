@@ -0,0 +1,224 @@
+"""
+冷启动基准：测量进程导入 app 的耗时和启动到第一个请求的耗时，超出预算时以非零状态退出
+
+1. 导入耗时：在新进程中执行 python -X importtime -c "import app.main"，
+   统计 app.main 的累计导入时间和耗时最多的顶层包；
+   只在导出 / 管理后台登录时使用的依赖（LAZY_MODULES）在启动时被导入视为失败
+2. 启动到第一个请求：启动 uvicorn，从创建进程开始计时，记录 /health 首次响应、
+   第一个追踪请求（POST /api/v1/track/）完成、/ready 返回就绪的时间
+
+每项运行多次取中位数；预算默认值见 IMPORT_BUDGET_MS / FIRST_REQUEST_BUDGET_MS，
+可用参数覆盖（CI 机器较慢时放宽）。修改导入结构或启动流程后运行本脚本确认启动没有变慢
+
+用法：
+    python scripts/bench_cold_start.py [--runs 5] [--import-budget 毫秒] [--first-request-budget 毫秒]
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import httpx
+
+# 项目根目录（子进程的工作目录）
+project_root = Path(__file__).parent.parent
+
+# 启动时不应导入的依赖（首次使用时导入）
+LAZY_MODULES = {
+    "openpyxl": "Excel 导出（admin.export_excel）",
+    "passlib": "密码哈希（utils/auth.py）",
+    "jose": "JWT（utils/auth.py）",
+    "user_agents": "User-Agent 解析（utils/ua.py，启动预热时在后台导入）",
+}
+
+# 预算（毫秒，中位数）
+IMPORT_BUDGET_MS = 1500
+FIRST_REQUEST_BUDGET_MS = 3000
+
+TRACK_BODY = {
+    "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "page_url": "http://bench.local/",
+    "screen_resolution": "1920x1080",
+    "timezone": "UTC",
+}
+
+
+def child_env(tmp_dir: str) -> Dict[str, str]:
+    """子进程环境：临时数据库和写入日志目录，关闭限流"""
+    env = dict(os.environ)
+    env["DATABASE_URL"] = f"sqlite+aiosqlite:///{tmp_dir}/cold_start.db"
+    env["JOURNAL_DIR"] = f"{tmp_dir}/journal"
+    env["RATE_LIMIT_ENABLED"] = "false"
+    return env
+
+
+def parse_importtime(output: str) -> List[Tuple[str, int, int]]:
+    """解析 -X importtime 的输出，返回 (模块名, 自身微秒, 累计微秒)"""
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue  # 表头
+        rows.append((parts[2].strip(), self_us, cumulative_us))
+    return rows
+
+
+def measure_import(env: Dict[str, str]) -> Tuple[float, Dict[str, float], set]:
+    """
+    一次导入测量
+
+    Returns:
+        (app.main 累计毫秒, 顶层包 -> 自身耗时合计毫秒, 导入的顶层包)
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=project_root, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"导入 app.main 失败:\n{result.stderr[-2000:]}")
+
+    rows = parse_importtime(result.stderr)
+    total = next((cumulative for name, _, cumulative in rows if name == "app.main"), 0) / 1000
+
+    packages = defaultdict(float)
+    for name, self_us, _ in rows:
+        packages[name.split(".")[0]] += self_us / 1000
+    return total, packages, set(packages)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_first_request(env: Dict[str, str], timeout: float = 60.0) -> Dict[str, float]:
+    """
+    一次启动测量（从创建进程开始计时，毫秒）
+
+    Returns:
+        dict: health（/health 首次响应）、track（第一个追踪请求完成）、
+              track_latency（第一个追踪请求本身的耗时）、ready（/ready 返回 200）
+    """
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=project_root, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+    def elapsed() -> float:
+        return (time.perf_counter() - started) * 1000
+
+    timings = {}
+    try:
+        with httpx.Client(base_url=base_url, timeout=10.0) as client:
+            while "health" not in timings:
+                if process.poll() is not None:
+                    raise RuntimeError(f"uvicorn 启动失败（退出码 {process.returncode}）")
+                if elapsed() > timeout * 1000:
+                    raise RuntimeError("等待 /health 超时")
+                try:
+                    if client.get("/health").status_code == 200:
+                        timings["health"] = elapsed()
+                except httpx.TransportError:
+                    time.sleep(0.005)
+
+            request_started = elapsed()
+            response = client.post("/api/v1/track/", json=TRACK_BODY, headers={"X-Forwarded-For": "127.0.0.1"})
+            if response.status_code != 200:
+                raise RuntimeError(f"追踪请求失败: {response.status_code} {response.text[:200]}")
+            timings["track"] = elapsed()
+            timings["track_latency"] = timings["track"] - request_started
+
+            while "ready" not in timings:
+                if elapsed() > timeout * 1000:
+                    raise RuntimeError("等待 /ready 超时")
+                if client.get("/ready").status_code == 200:
+                    timings["ready"] = elapsed()
+                else:
+                    time.sleep(0.005)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="冷启动基准")
+    parser.add_argument("--runs", type=int, default=5, help="每项运行次数（取中位数）")
+    parser.add_argument("--import-budget", type=float, default=IMPORT_BUDGET_MS, help="导入 app.main 的预算（毫秒）")
+    parser.add_argument("--first-request-budget", type=float, default=FIRST_REQUEST_BUDGET_MS,
+                        help="启动到第一个追踪请求完成的预算（毫秒）")
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        env = child_env(tmp_dir)
+
+        # 预先执行一次：生成 .pyc、创建数据库，后续测量不包含这部分开销
+        measure_import(env)
+        measure_first_request(env)
+
+        print(f"[INFO] 导入耗时（{args.runs} 次）...")
+        totals = []
+        packages = defaultdict(list)
+        imported = set()
+        for _ in range(args.runs):
+            total, by_package, modules = measure_import(env)
+            totals.append(total)
+            imported |= modules
+            for name, ms in by_package.items():
+                packages[name].append(ms)
+
+        import_ms = statistics.median(totals)
+        print(f"  app.main: {import_ms:.0f} ms（预算 {args.import_budget:.0f} ms）")
+        print("  耗时最多的顶层包（自身耗时合计）:")
+        top = sorted(packages.items(), key=lambda item: -statistics.median(item[1]))[:12]
+        for name, values in top:
+            print(f"    {name:<24} {statistics.median(values):7.1f} ms")
+
+        if import_ms > args.import_budget:
+            failures.append(f"导入 app.main 耗时 {import_ms:.0f} ms，超出预算 {args.import_budget:.0f} ms")
+        for module, usage in LAZY_MODULES.items():
+            if module in imported:
+                failures.append(f"启动时导入了 {module}（{usage}），应在首次使用时导入")
+
+        print(f"[INFO] 启动到第一个请求（{args.runs} 次）...")
+        runs = [measure_first_request(env) for _ in range(args.runs)]
+        timings = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+        print(f"  /health 首次响应:      {timings['health']:7.0f} ms")
+        print(f"  第一个追踪请求完成:    {timings['track']:7.0f} ms（请求本身 {timings['track_latency']:.0f} ms，"
+              f"预算 {args.first_request_budget:.0f} ms）")
+        print(f"  /ready 就绪:           {timings['ready']:7.0f} ms")
+
+        if timings["track"] > args.first_request_budget:
+            failures.append(
+                f"启动到第一个追踪请求完成 {timings['track']:.0f} ms，超出预算 {args.first_request_budget:.0f} ms"
+            )
+
+    if failures:
+        for failure in failures:
+            print(f"[ERROR] {failure}")
+        sys.exit(1)
+    print("\n[SUCCESS] 冷启动在预算内")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+追踪接口性能基准：对比 POST /track/ 的快速路径与原实现
+
+1. 解析基准：只测请求体解析、校验和响应序列化（不访问数据库）
+   - 原实现：json.loads -> 模型校验 -> 构造 VisitResponse -> 响应模型校验 -> jsonable_encoder -> json.dumps
+   - 快速路径：model_validate_json -> orjson 序列化
+2. 接口基准：在临时 SQLite 数据库上通过 ASGI 直接调用两个路由，统计每秒请求数
+   原实现的路由在本脚本中按改动前的写法重建（Body 参数 + response_model），其余逻辑与正式路由相同
+   SQLite 下单个请求的耗时主要是等待事务提交，两者的差距远小于解析基准；
+   解析基准反映的是每个请求节省的 CPU 时间（多进程部署时决定单核能承载的请求数）
+
+用法：
+    python scripts/bench_track_ingest.py [请求数] [并发数]
+"""
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import timeit
+from pathlib import Path
+
+# 使用临时数据库，必须在导入 app 之前设置
+_tmp_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_tmp_dir}/bench.db"
+# 全部请求来自同一个 IP，关闭追踪接口限流
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import httpx
+import orjson
+from fastapi import BackgroundTasks, Depends, FastAPI, Request
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_db, init_db
+from app.api.v1 import tracker
+from app.crud import visit as visit_crud
+from app.schemas.visit import VisitCreate, VisitResponse
+from app.services.ingest import after_visit
+from app.utils.ip import get_client_ip
+
+
+# 与 tracker.js 上报内容相当的请求体
+SAMPLE_BODY = json.dumps({
+    "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+    "referrer": "https://www.google.com/",
+    "page_url": "https://example.com/landing?utm_source=google",
+    "screen_resolution": "1920x1080",
+    "viewport_size": "1366x768",
+    "timezone": "Asia/Shanghai",
+    "language": "zh-CN",
+    "platform": "Win32",
+    "canvas_fingerprint": "a1b2c3d4e5f6a7b8",
+    "webgl_fingerprint": "e5f6a7b8c9d0e1f2",
+    "fonts_hash": "0123456789abcdef",
+    "webgl_vendor": "Google Inc. (NVIDIA)",
+    "webgl_renderer": "ANGLE (NVIDIA, NVIDIA GeForce GTX 1080 Direct3D11 vs_5_0 ps_5_0, D3D11)",
+    "device_memory": 8,
+    "hardware_concurrency": 8,
+    "color_depth": 24,
+    "pixel_ratio": 1.5,
+    "max_touch_points": 0,
+    "connection_type": "4g",
+    "connection_downlink": 10.0,
+    "connection_rtt": 50,
+    "connection_save_data": False,
+    "cookies_enabled": True,
+    "do_not_track": False,
+    "pdf_viewer_enabled": True,
+    "plugins_hash": "fedcba9876543210",
+    "audio_fingerprint": "124.04347527516074",
+    "media_devices_hash": "0f1e2d3c4b5a6978",
+    "local_storage_enabled": True,
+    "session_storage_enabled": True,
+    "indexed_db_enabled": True,
+    "ad_blocker_detected": False,
+    "battery_charging": True,
+    "battery_level": 87,
+    "webrtc_hash": "9a8b7c6d5e4f3a2b",
+    "speech_voices_hash": "1a2b3c4d5e6f7a8b",
+    "performance_metrics": {"page_load_time": 812, "dom_parse_time": 245, "dns_time": 12, "tcp_time": 30, "ttfb": 120},
+    "is_headless": False,
+}).encode()
+
+SAMPLE_RESPONSE = {
+    "visit_id": "550e8400-e29b-41d4-a716-446655440000",
+    "timestamp": None,
+    "ip_address": "127.0.0.1",
+    "device_type": "pc",
+    "authenticity_score": 85.0,
+}
+
+
+def bench_parsing(number: int = 20000):
+    """解析、校验和序列化基准"""
+    from datetime import datetime
+    response = {**SAMPLE_RESPONSE, "timestamp": datetime.utcnow()}
+
+    def legacy():
+        VisitCreate.model_validate(json.loads(SAMPLE_BODY))
+        model = VisitResponse.model_validate(VisitResponse(**response), from_attributes=True)
+        json.dumps(jsonable_encoder(model), ensure_ascii=False, separators=(",", ":")).encode()
+
+    def fast():
+        VisitCreate.model_validate_json(SAMPLE_BODY)
+        orjson.dumps(response)
+
+    print(f"[INFO] 解析基准（{number} 次）...")
+    results = {}
+    for name, func in (("原实现", legacy), ("快速路径", fast)):
+        elapsed = min(timeit.repeat(func, number=number, repeat=3))
+        results[name] = elapsed
+        print(f"  {name}: {elapsed / number * 1e6:.1f} µs/次")
+    print(f"  提升: {results['原实现'] / results['快速路径']:.1f}x")
+
+
+def build_app() -> FastAPI:
+    """正式路由挂在 /fast，按改动前写法重建的路由挂在 /legacy"""
+    app = FastAPI()
+    app.include_router(tracker.router, prefix="/fast")
+
+    @app.post("/legacy/track/", response_model=VisitResponse)
+    async def legacy_track_visit(
+        visit_data: VisitCreate,
+        request: Request,
+        background_tasks: BackgroundTasks,
+        db: AsyncSession = Depends(get_db)
+    ):
+        visit = await visit_crud.create_visit(db, visit_data, get_client_ip(request))
+        after_visit(visit, background_tasks)
+        return VisitResponse(
+            visit_id=visit.visit_id,
+            timestamp=visit.timestamp,
+            ip_address=visit.ip_address,
+            device_type=visit.device_type,
+            authenticity_score=visit.authenticity_score
+        )
+
+    return app
+
+
+async def bench_route(client: httpx.AsyncClient, path: str, total: int, concurrency: int) -> float:
+    """并发发送请求，返回每秒请求数"""
+    headers = {"Content-Type": "application/json", "X-Forwarded-For": "127.0.0.1"}
+    remaining = iter(range(total))
+
+    async def worker():
+        for _ in remaining:
+            response = await client.post(path, content=SAMPLE_BODY, headers=headers)
+            assert response.status_code == 200, response.text
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return total / (time.perf_counter() - started)
+
+
+async def bench_routes(total: int, concurrency: int):
+    """接口基准"""
+    await init_db()
+    transport = httpx.ASGITransport(app=build_app())
+
+    print(f"[INFO] 接口基准（{total} 个请求，并发 {concurrency}）...")
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # 屏蔽请求路径上的调试输出
+        with contextlib.redirect_stdout(io.StringIO()):
+            # 预热
+            for path in ("/legacy/track/", "/fast/track/"):
+                await bench_route(client, path, 50, concurrency)
+            # 交替运行两轮，减少数据库增长带来的偏差
+            for _ in range(2):
+                for name, path in (("原实现", "/legacy/track/"), ("快速路径", "/fast/track/")):
+                    rps = await bench_route(client, path, total // 2, concurrency)
+                    results[name] = results.get(name, 0.0) + rps / 2
+
+    for name, rps in results.items():
+        print(f"  {name}: {rps:.0f} req/s")
+    print(f"  提升: {results['快速路径'] / results['原实现']:.2f}x")
+
+
+if __name__ == "__main__":
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+    bench_parsing()
+    asyncio.run(bench_routes(total, concurrency))
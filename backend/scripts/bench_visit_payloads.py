@@ -0,0 +1,154 @@
+"""
+visits 表行宽基准：对比大字段内联存放（拆分前）与拆分到 visit_payloads 后的查询耗时
+
+在临时 SQLite 数据库中生成模拟数据（User-Agent、来源页面、鼠标轨迹、原始数据的大小与线上相当），
+拆分后的布局按当前模型建表，拆分前的布局用 CREATE TABLE AS 把两张表连接后重建为 visits_inline
+
+对比的查询：
+- 访问列表：select(Visit) 按时间倒序翻页（拆分前 select(Visit) 会读取全部字段）
+- 统计扫描：按操作系统分组计数（全表扫描，耗时取决于表占用的页数）
+
+每次查询使用新连接并限制页缓存，接近冷缓存下的表现
+
+用法：
+    python scripts/bench_visit_payloads.py [记录数]
+"""
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy import create_engine, select, desc
+from sqlalchemy.dialects import sqlite
+from app.core.database import Base
+from app.models.visit import Visit, VisitPayload
+from app.utils.trajectory import encode_points
+
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+OS_NAMES = ["Windows", "Mac OS X", "Android", "iOS", "Linux"]
+
+# 每种查询重复次数（取中位数）
+REPEAT = 7
+
+
+def random_trajectory(rng: random.Random):
+    """模拟一次访问的鼠标轨迹（200~800 个点）"""
+    x = y = t = 0
+    points = []
+    for _ in range(rng.randint(200, 800)):
+        x += rng.randint(-30, 30)
+        y += rng.randint(-30, 30)
+        t += rng.randint(16, 120)
+        points.append((x, y, t))
+    return points
+
+
+def populate(path: str, total: int):
+    """按当前模型建表并写入模拟数据，再重建拆分前的内联布局"""
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine, tables=[Visit.__table__, VisitPayload.__table__])
+    engine.dispose()
+
+    rng = random.Random(42)
+    conn = sqlite3.connect(path)
+    visit_rows = []
+    payload_rows = []
+    for i in range(1, total + 1):
+        visit_rows.append((
+            i, f"visit-{i:08d}", f"2026-01-{1 + i % 28:02d} {i % 24:02d}:00:00", f"10.0.{i % 256}.{i % 250}",
+            f"{USER_AGENT} {i}", f"https://www.google.com/search?q=keyword+{i}",
+            "https://example.com/landing", rng.choice(OS_NAMES), "pc", 60.0 + i % 40, f"{i:064x}", 0
+        ))
+        raw_data = json.dumps({"extra": "x" * rng.randint(200, 1200), "index": i})
+        payload_rows.append((i, encode_points(random_trajectory(rng)), raw_data))
+
+    conn.executemany(
+        "INSERT INTO visits (id, visit_id, timestamp, ip_address, user_agent, referrer, page_url, os, "
+        "device_type, authenticity_score, fingerprint_hash, mouse_seq_next) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        visit_rows
+    )
+    conn.executemany(
+        "INSERT INTO visit_payloads (visit_pk, mouse_trajectory, raw_data) VALUES (?, ?, ?)",
+        payload_rows
+    )
+    conn.execute(
+        "CREATE TABLE visits_inline AS "
+        "SELECT v.*, p.mouse_trajectory, p.mouse_movements, p.raw_data "
+        "FROM visits v LEFT JOIN visit_payloads p ON p.visit_pk = v.id ORDER BY v.id"
+    )
+    conn.execute("CREATE INDEX idx_inline_timestamp ON visits_inline (timestamp)")
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+
+
+def table_bytes(conn: sqlite3.Connection, table: str) -> int:
+    """表（不含索引）占用的字节数；没有 dbstat 时返回 0"""
+    try:
+        row = conn.execute("SELECT SUM(pgsize) FROM dbstat WHERE name = ?", (table,)).fetchone()
+        return row[0] or 0
+    except sqlite3.OperationalError:
+        return 0
+
+
+def compile_sql(stmt) -> str:
+    return str(stmt.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+def timed(path: str, sql: str) -> float:
+    """冷缓存下执行查询并读取全部结果，返回中位数耗时（毫秒）"""
+    samples = []
+    for _ in range(REPEAT):
+        conn = sqlite3.connect(path)
+        conn.execute("PRAGMA cache_size = -256")
+        started = time.perf_counter()
+        conn.execute(sql).fetchall()
+        samples.append((time.perf_counter() - started) * 1000)
+        conn.close()
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def main(total: int):
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    print(f"[INFO] 生成 {total} 条模拟访问记录...")
+    populate(path, total)
+
+    conn = sqlite3.connect(path)
+    for table in ("visits_inline", "visits"):
+        size = table_bytes(conn, table)
+        if size:
+            print(f"  {table}: {size / 1024 / 1024:.1f} MB，平均每行 {size / total:.0f} 字节")
+    conn.close()
+
+    # 访问列表：拆分后 select(Visit) 不含 User-Agent / 来源页面（deferred），拆分前读取全部字段
+    page = select(Visit).order_by(desc(Visit.timestamp)).limit(50).offset(total // 10)
+    split_list = compile_sql(page)
+    inline_list = compile_sql(page).replace("FROM visits", "FROM visits_inline AS visits", 1).replace(
+        "SELECT ", "SELECT visits.user_agent, visits.referrer, visits.mouse_trajectory, "
+        "visits.mouse_movements, visits.raw_data, ", 1
+    )
+
+    scan = "SELECT os, COUNT(*), AVG(authenticity_score), SUM(stay_duration) FROM {table} GROUP BY os"
+
+    results = [
+        ("访问列表（50 条）", timed(path, inline_list), timed(path, split_list)),
+        ("统计扫描（全表）", timed(path, scan.format(table="visits_inline")), timed(path, scan.format(table="visits"))),
+    ]
+
+    print(f"[INFO] 查询耗时（冷缓存，{REPEAT} 次中位数）:")
+    for name, inline_ms, split_ms in results:
+        print(f"  {name}: 拆分前 {inline_ms:.2f} ms，拆分后 {split_ms:.2f} ms（{inline_ms / split_ms:.1f}x）")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
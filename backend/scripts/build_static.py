@@ -0,0 +1,138 @@
+"""
+前端静态资源构建
+把 frontend 下的 static / public / admin 构建到 frontend/dist，应用启动时检测到 dist/manifest.json 即改用构建结果：
+
+- static 下的每个文件另存一份带内容哈希的文件名（tracker.js -> tracker.<hash>.js），
+  哈希文件返回一年的 immutable 缓存头；原文件名保留（外部页面可能直接引用），返回 no-cache
+- public / admin 页面中引用的 /static/... 改为带哈希的地址
+- 文本类文件生成 .gz（以及安装了 brotli 时的 .br）预压缩文件，请求时直接发送
+
+修改前端文件后需重新执行本脚本（未构建时直接使用 frontend 下的源文件）
+
+用法：
+    python scripts/build_static.py
+"""
+import gzip
+import hashlib
+import json
+import re
+import shutil
+import sys
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.core.compression import brotli
+from app.core.static_files import MANIFEST_NAME
+
+FRONTEND_DIR = project_root.parent / "frontend"
+DIST_DIR = FRONTEND_DIR / "dist"
+PAGE_DIRS = ("public", "admin")
+
+COMPRESS_SUFFIXES = {".js", ".css", ".html", ".json", ".svg", ".txt", ".map"}
+HASH_LENGTH = 10
+
+# 页面中引用的本站静态资源
+STATIC_REF = re.compile(r"""(?P<prefix>["'(])/static/(?P<path>[^"'()?#\s]+)""")
+
+
+def hashed_name(path: Path, content: bytes) -> str:
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    return f"{path.stem}.{digest}{path.suffix}"
+
+
+def build_static(manifest: dict) -> int:
+    """复制 static 目录并生成带哈希的文件，返回文件数"""
+    source = FRONTEND_DIR / "static"
+    count = 0
+    for path in sorted(source.rglob("*")):
+        if not path.is_file():
+            continue
+        relative = path.relative_to(source)
+        content = path.read_bytes()
+
+        target = DIST_DIR / "static" / relative
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(content)
+
+        hashed = relative.with_name(hashed_name(relative, content))
+        (DIST_DIR / "static" / hashed).write_bytes(content)
+
+        manifest[relative.as_posix()] = hashed.as_posix()
+        print(f"  [ADD] static/{relative.as_posix()} -> {hashed.as_posix()}")
+        count += 1
+    return count
+
+
+def build_pages(manifest: dict) -> int:
+    """复制页面并把静态资源引用改为带哈希的地址，返回改写的引用数"""
+    rewritten = 0
+
+    def replace(match):
+        nonlocal rewritten
+        hashed = manifest.get(match.group("path"))
+        if hashed is None:
+            return match.group(0)
+        rewritten += 1
+        return f"{match.group('prefix')}/static/{hashed}"
+
+    for name in PAGE_DIRS:
+        source = FRONTEND_DIR / name
+        if not source.exists():
+            continue
+        for path in sorted(source.rglob("*")):
+            if not path.is_file():
+                continue
+            target = DIST_DIR / name / path.relative_to(source)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            if path.suffix == ".html":
+                target.write_text(STATIC_REF.sub(replace, path.read_text(encoding="utf-8")), encoding="utf-8")
+            else:
+                shutil.copyfile(path, target)
+    return rewritten
+
+
+def precompress() -> int:
+    """生成预压缩文件（压缩后没有变小的跳过），返回生成的文件数"""
+    count = 0
+    for path in sorted(DIST_DIR.rglob("*")):
+        if not path.is_file() or path.suffix not in COMPRESS_SUFFIXES:
+            continue
+        content = path.read_bytes()
+
+        variants = {".gz": gzip.compress(content, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants[".br"] = brotli.compress(content, quality=11)
+
+        for suffix, data in variants.items():
+            if len(data) < len(content):
+                Path(str(path) + suffix).write_bytes(data)
+                count += 1
+    return count
+
+
+def main():
+    print("[INFO] 构建前端静态资源...")
+
+    if DIST_DIR.exists():
+        shutil.rmtree(DIST_DIR)
+    DIST_DIR.mkdir(parents=True)
+
+    manifest = {}
+    assets = build_static(manifest)
+    rewritten = build_pages(manifest)
+    compressed = precompress()
+
+    with open(DIST_DIR / MANIFEST_NAME, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+    if brotli is None:
+        print("[SKIP] 未安装 brotli，只生成 .gz 预压缩文件")
+    print(f"\n[SUCCESS] 静态资源 {assets} 个，页面引用改写 {rewritten} 处，预压缩文件 {compressed} 个")
+    print(f"[INFO] 输出目录: {DIST_DIR}")
+
+
+if __name__ == "__main__":
+    main()
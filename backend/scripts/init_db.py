@@ -1,6 +1,7 @@
 """
 Database initialization script
-Creates all database tables
+Creates all database tables and marks all migrations as applied
+(existing databases are upgraded with scripts/migrate.py instead)
 """
 import asyncio
 import sys
@@ -11,7 +12,12 @@ import os
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from app.core.database import engine, Base
-from app.models.visit import Visit  # Import all models
+from app.models.visit import Visit, VisitPayload  # Import all models
+from app.models.sketch import DistinctSketch
+from app.models.device import Device, DeviceIP, DeviceSignature, DeviceLSHBucket
+from app.models.event import CustomEvent
+from app.models.ratelimit import RateLimitCounter
+from app.migrations import migration_runner
 
 
 async def init_database():
@@ -32,9 +38,9 @@ async def init_database():
         await conn.run_sync(Base.metadata.drop_all)
         print("[OK] All tables dropped")
 
-        # Create all tables
-        print("[INFO] Creating tables...")
-        await conn.run_sync(Base.metadata.create_all)
+    # Create all tables and record the schema version
+    print("[INFO] Creating tables...")
+    await migration_runner.init_schema()
 
     print("[OK] Database initialized successfully!")
     print(f"[INFO] Created tables: {', '.join(Base.metadata.tables.keys())}")
@@ -0,0 +1,56 @@
+"""
+数据库迁移命令
+按版本顺序执行 app/migrations/versions 中未完成的迁移（应用启动时默认也会执行，见 MIGRATE_ON_STARTUP）
+
+用法：
+    python scripts/migrate.py status    # 查看各版本状态
+    python scripts/migrate.py upgrade   # 前台执行全部迁移（中断后重新执行从断点继续）
+
+SQLite 上建索引、删字段期间会持有写锁：服务运行中建议由应用启动时执行（期间追踪数据暂存到写入日志），
+或在低峰期执行本命令
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from app.migrations import migration_runner
+
+
+async def status():
+    """打印各版本状态"""
+    await migration_runner.prepare()
+    versions = await migration_runner.status()
+    for item in versions:
+        progress = f"{item['step']}/{item['steps']}" if item["status"] == "expanded" else ""
+        print(f"  {item['version']:04d} {item['name']:<20} {item['status']:<10} {progress}")
+
+    pending = [item for item in versions if item["status"] != "done"]
+    print(f"\n[INFO] 最新版本: {migration_runner.head:04d}，未完成: {len(pending)}")
+
+
+async def migrate():
+    """执行数据库迁移"""
+    print("[INFO] 开始数据库迁移...")
+
+    try:
+        await migration_runner.upgrade()
+        print(f"\n[SUCCESS] 数据库迁移完成！当前版本: {migration_runner.head:04d}")
+
+    except Exception as e:
+        print(f"[ERROR] 迁移失败: {str(e)}")
+        raise
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "upgrade"
+    if command == "status":
+        asyncio.run(status())
+    elif command == "upgrade":
+        asyncio.run(migrate())
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,83 @@
+"""
+近似重复设备索引重建脚本
+为尚未建立索引的设备计算 MinHash 签名和 LSH 分段桶（取每个设备最早的一次访问）
+
+修改 LSH_BANDS / LSH_ROWS 后需加 --reset 参数清空旧索引后重建
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy import select, func, delete
+from app.core.database import engine, async_session_maker, Base
+from app.models.visit import Visit
+from app.models.device import Device, DeviceSignature, DeviceLSHBucket
+from app.services.similarity import index_device
+
+# 每批处理的设备数
+BATCH_SIZE = 500
+
+
+async def rebuild(reset: bool = False):
+    """重建近似重复设备索引"""
+    print("[INFO] 开始重建近似重复设备索引...")
+
+    # 确保索引表存在
+    async with engine.begin() as conn:
+        await conn.run_sync(
+            Base.metadata.create_all,
+            tables=[DeviceSignature.__table__, DeviceLSHBucket.__table__]
+        )
+
+    if reset:
+        async with async_session_maker() as db:
+            await db.execute(delete(DeviceLSHBucket))
+            await db.execute(delete(DeviceSignature))
+            await db.commit()
+        print("[INFO] 已清空旧索引")
+
+    last_device_id = ""
+    indexed = 0
+
+    while True:
+        async with async_session_maker() as db:
+            # 尚未建立索引的设备
+            stmt = select(Device.device_id).outerjoin(
+                DeviceSignature, DeviceSignature.device_id == Device.device_id
+            ).where(
+                DeviceSignature.device_id.is_(None),
+                Device.device_id > last_device_id
+            ).order_by(Device.device_id).limit(BATCH_SIZE)
+            result = await db.execute(stmt)
+            device_ids = result.scalars().all()
+
+            if not device_ids:
+                break
+
+            # 每个设备最早的一次访问
+            first_visit = select(
+                Visit.device_id,
+                func.min(Visit.id).label('visit_pk')
+            ).where(Visit.device_id.in_(device_ids)).group_by(Visit.device_id).subquery()
+
+            visits_stmt = select(Visit).join(first_visit, Visit.id == first_visit.c.visit_pk)
+            visits = (await db.execute(visits_stmt)).scalars().all()
+
+            for visit in visits:
+                await index_device(db, visit.device_id, visit)
+
+            await db.commit()
+
+        last_device_id = device_ids[-1]
+        indexed += len(visits)
+        print(f"  [INDEX] 已处理 {indexed} 个设备")
+
+    print(f"\n[SUCCESS] 索引重建完成！共处理 {indexed} 个设备")
+
+
+if __name__ == "__main__":
+    asyncio.run(rebuild(reset="--reset" in sys.argv))
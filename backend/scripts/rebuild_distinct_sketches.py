@@ -0,0 +1,69 @@
+"""
+去重草图重建脚本
+扫描已有访问记录，重建按小时存储的 HyperLogLog 草图
+
+草图合并按寄存器取最大值，重复执行不会重复计数
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from sqlalchemy import select
+from app.core.database import engine, async_session_maker, Base
+from app.models.visit import Visit
+from app.models.sketch import DistinctSketch  # noqa: F401
+from app.services.distinct import distinct_counter
+
+# 每批读取的记录数
+BATCH_SIZE = 5000
+
+
+async def rebuild():
+    """重建去重草图"""
+    print("[INFO] 开始重建去重草图...")
+
+    # 确保草图表存在
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    last_id = 0
+    processed = 0
+
+    while True:
+        async with async_session_maker() as db:
+            stmt = select(
+                Visit.id,
+                Visit.timestamp,
+                Visit.ip_address,
+                Visit.fingerprint_hash,
+                Visit.canvas_fingerprint
+            ).where(Visit.id > last_id).order_by(Visit.id).limit(BATCH_SIZE)
+
+            result = await db.execute(stmt)
+            rows = result.all()
+
+        if not rows:
+            break
+
+        for row_id, timestamp, ip_address, fingerprint_hash, canvas_fingerprint in rows:
+            if timestamp is None:
+                continue
+            if timestamp.tzinfo is not None:
+                timestamp = timestamp.replace(tzinfo=None)
+            distinct_counter.record(ip_address, fingerprint_hash, canvas_fingerprint, when=timestamp)
+
+        await distinct_counter.flush()
+
+        last_id = rows[-1][0]
+        processed += len(rows)
+        print(f"  [REBUILD] 已处理 {processed} 条记录")
+
+    print(f"\n[SUCCESS] 去重草图重建完成！共处理 {processed} 条记录")
+
+
+if __name__ == "__main__":
+    asyncio.run(rebuild())
@@ -114,8 +114,18 @@ const API = {
       return await API.get('/admin/stats/referrers', { days });
     },
 
-    async getHourlyAdmin() {
-      return await API.get('/admin/stats/hourly-admin');
+    async getHourlyAdmin(interval = 60) {
+      // getTimezoneOffset() 返回 UTC - 本地时间，服务端需要的是东正西负
+      const tz_offset = -new Date().getTimezoneOffset();
+      return await API.get('/admin/stats/hourly-admin', { tz_offset, interval });
+    },
+
+    async getUnique(days = 7) {
+      return await API.get('/admin/stats/unique', { days });
+    },
+
+    async getRealtime() {
+      return await API.get('/admin/stats/realtime');
     },
 
     async getHourlyVisitor(country = null) {
@@ -124,6 +134,76 @@ const API = {
     }
   },
 
+  // 实时推送 API（SSE over fetch，以便携带 Authorization 头）
+  live: {
+    /**
+     * 订阅实时事件，断开后自动重连
+     * @param {Object} handlers - 事件处理函数，如 { visit(data) {}, behavior(data) {}, counters(data) {} }
+     * @returns {Function} 取消订阅函数
+     */
+    connect(handlers = {}) {
+      let stopped = false;
+      let controller = null;
+
+      const dispatch = (block) => {
+        let event = 'message';
+        let data = '';
+        block.split('\n').forEach(line => {
+          if (line.startsWith('event:')) event = line.slice(6).trim();
+          else if (line.startsWith('data:')) data += line.slice(5).trim();
+        });
+        if (data && handlers[event]) {
+          handlers[event](JSON.parse(data));
+        }
+      };
+
+      const run = async () => {
+        while (!stopped) {
+          controller = new AbortController();
+          try {
+            const response = await fetch(`${API_BASE}/admin/live`, {
+              headers: getAuthHeaders(),
+              signal: controller.signal
+            });
+            handleAuthError(response);
+            if (!response.ok) {
+              throw new Error(`HTTP error! status: ${response.status}`);
+            }
+
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+
+            while (true) {
+              const { value, done } = await reader.read();
+              if (done) break;
+              buffer += decoder.decode(value, { stream: true });
+
+              let index;
+              while ((index = buffer.indexOf('\n\n')) >= 0) {
+                dispatch(buffer.slice(0, index));
+                buffer = buffer.slice(index + 2);
+              }
+            }
+          } catch (error) {
+            if (stopped) return;
+            console.warn('实时推送连接断开:', error);
+          }
+
+          // 等待后重连
+          await new Promise(resolve => setTimeout(resolve, 3000));
+        }
+      };
+
+      run();
+
+      return () => {
+        stopped = true;
+        if (controller) controller.abort();
+      };
+    }
+  },
+
   // 访问记录相关 API
   visits: {
     async getList(params = {}) {
@@ -9,14 +9,21 @@
   // 配置
   const API_BASE = window.location.origin + '/api/v1';
   const MOUSE_SAMPLE_INTERVAL = 200; // 鼠标移动采样间隔（毫秒）
-  const MAX_MOUSE_SAMPLES = 50; // 最大鼠标轨迹采样数
+  const MAX_MOUSE_SAMPLES = 500; // 最大未确认鼠标轨迹采样数（超出时丢弃最早的采样）
+  const USE_PACKED_TRAJECTORY = true; // 鼠标轨迹使用紧凑编码上报（false 时使用 JSON）
+  const TRAJECTORY_FORMAT_VERSION = 1;
+  const EVENT_FLUSH_DELAY = 5000; // 自定义事件合并发送的等待时间（毫秒）
+  const MAX_PENDING_EVENTS = 40; // 最多缓存的待发送自定义事件数（超出时丢弃最早的事件）
 
   // 状态变量
   let visitId = null;
   let startTime = Date.now();
   let maxScrollDepth = 0;
-  let mouseMoves = [];
+  let mouseMoves = []; // 服务端尚未确认的采样
+  let mouseSeqBase = 0; // mouseMoves[0] 在整条轨迹中的序号
   let isTracking = false;
+  let pendingEvents = []; // 待发送的自定义事件
+  let eventFlushTimer = null;
 
   /**
    * 初始化追踪器
@@ -31,25 +38,34 @@
       // 收集浏览器指纹
       const fingerprint = await FingerprintCollector.collect();
 
-      // 发送初始追踪请求
-      const response = await fetch(`${API_BASE}/track/`, {
+      // 发送初始追踪请求（初始化前记录的自定义事件一起发送）
+      const events = takePendingEvents().map(event => ({ ...event, visit_ref: 'page' }));
+      const response = await fetch(`${API_BASE}/track/batch`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
         },
-        body: JSON.stringify({
-          user_agent: navigator.userAgent,
-          referrer: document.referrer || null,
-          page_url: window.location.href,
-          ...fingerprint
-        })
+        body: JSON.stringify([
+          {
+            type: 'visit',
+            ref: 'page',
+            data: {
+              user_agent: navigator.userAgent,
+              referrer: document.referrer || null,
+              page_url: window.location.href,
+              ...fingerprint
+            }
+          },
+          ...events
+        ])
       });
 
       if (!response.ok) {
+        requeueEvents(events.map(({ visit_ref, ...event }) => event));
         throw new Error(`HTTP error! status: ${response.status}`);
       }
 
-      const data = await response.json();
+      const data = (await response.json()).results[0];
       visitId = data.visit_id;
 
       console.log('✅ 追踪初始化成功');
@@ -126,14 +142,117 @@
     const time = Date.now() - startTime;
     mouseMoves.push({ x, y, t: time });
 
-    // 限制数组大小
+    // 限制数组大小（丢弃的采样序号照常前移，服务端会接受这段空缺）
     if (mouseMoves.length > MAX_MOUSE_SAMPLES) {
-      mouseMoves = mouseMoves.slice(-MAX_MOUSE_SAMPLES);
+      const dropped = mouseMoves.length - MAX_MOUSE_SAMPLES;
+      mouseMoves = mouseMoves.slice(dropped);
+      mouseSeqBase += dropped;
     }
   }
 
   /**
-   * 发送行为数据到服务器
+   * 处理服务端确认，丢弃已接收的采样
+   * @param {number} ack - 服务端已接收的采样数
+   */
+  function acknowledgeMouseMoves(ack) {
+    const acked = ack - mouseSeqBase;
+    if (acked > 0) {
+      mouseMoves = mouseMoves.slice(acked);
+      mouseSeqBase = ack;
+    }
+  }
+
+  /**
+   * zigzag 编码（有符号整数映射为无符号整数）
+   * @param {number} n
+   */
+  function zigzag(n) {
+    return n >= 0 ? n * 2 : -n * 2 - 1;
+  }
+
+  /**
+   * 写入 varint
+   * @param {number[]} out - 字节数组
+   * @param {number} n - 非负整数
+   */
+  function writeVarint(out, n) {
+    while (n >= 0x80) {
+      out.push((n % 0x80) | 0x80);
+      n = Math.floor(n / 0x80);
+    }
+    out.push(n);
+  }
+
+  /**
+   * 鼠标轨迹紧凑编码：相邻点差值的 zigzag varint，base64url 输出
+   * 格式与服务端 app/utils/trajectory.py 一致
+   * @param {Array<{x:number,y:number,t:number}>} points
+   * @returns {string}
+   */
+  function packTrajectory(points) {
+    const bytes = [TRAJECTORY_FORMAT_VERSION];
+    writeVarint(bytes, points.length);
+
+    let px = 0, py = 0, pt = 0;
+    for (const p of points) {
+      const x = Math.round(p.x), y = Math.round(p.y), t = Math.round(p.t);
+      writeVarint(bytes, zigzag(x - px));
+      writeVarint(bytes, zigzag(y - py));
+      writeVarint(bytes, zigzag(t - pt));
+      px = x; py = y; pt = t;
+    }
+
+    let binary = '';
+    for (const b of bytes) {
+      binary += String.fromCharCode(b);
+    }
+    return btoa(binary).replace(/\+/g, '-').replace(/\//g, '_').replace(/=+$/, '');
+  }
+
+  /**
+   * 记录自定义事件，等待一段时间后与行为数据合并发送
+   * @param {string} name - 事件名称
+   * @param {Object} properties - 事件属性
+   */
+  function trackEvent(name, properties) {
+    pendingEvents.push({
+      type: 'custom',
+      name: String(name),
+      properties: properties || null,
+      t: Date.now() - startTime
+    });
+    if (pendingEvents.length > MAX_PENDING_EVENTS) {
+      pendingEvents = pendingEvents.slice(-MAX_PENDING_EVENTS);
+    }
+
+    if (visitId && !eventFlushTimer) {
+      eventFlushTimer = setTimeout(() => sendBehaviorData(false), EVENT_FLUSH_DELAY);
+    }
+  }
+
+  /**
+   * 取出全部待发送的自定义事件
+   */
+  function takePendingEvents() {
+    if (eventFlushTimer) {
+      clearTimeout(eventFlushTimer);
+      eventFlushTimer = null;
+    }
+    const events = pendingEvents;
+    pendingEvents = [];
+    return events;
+  }
+
+  /**
+   * 发送失败的自定义事件放回队列，下次一起发送
+   * @param {Array} events - 发送失败的事件
+   */
+  function requeueEvents(events) {
+    pendingEvents = events.concat(pendingEvents).slice(-MAX_PENDING_EVENTS);
+  }
+
+  /**
+   * 发送行为数据到服务器（与待发送的自定义事件合并为一次批量请求）
    * @param {boolean} isFinal - 是否为最终数据
    */
   function sendBehaviorData(isFinal = true) {
@@ -142,26 +261,48 @@
     const duration = Math.round((Date.now() - startTime) / 1000);
 
     const data = {
+      type: 'behavior',
       visit_id: visitId,
       stay_duration: duration,
-      scroll_depth: maxScrollDepth,
-      mouse_movements: JSON.stringify(mouseMoves.slice(-20)) // 只发送最后 20 个采样
+      scroll_depth: maxScrollDepth
     };
 
+    // 增量上报：发送上次确认之后的全部采样，重复或乱序到达由服务端按序号去重
+    if (mouseMoves.length > 0) {
+      data.mouse_seq = mouseSeqBase;
+      if (USE_PACKED_TRAJECTORY) {
+        data.mouse_packed = packTrajectory(mouseMoves);
+      } else {
+        data.mouse_movements = JSON.stringify(mouseMoves);
+      }
+    }
+
+    const events = takePendingEvents().map(event => ({ ...event, visit_id: visitId }));
+    const body = JSON.stringify(events.concat([data]));
+
     // 使用 sendBeacon 确保数据发送（即使页面卸载）
     if (isFinal && navigator.sendBeacon) {
-      const blob = new Blob([JSON.stringify(data)], { type: 'application/json' });
-      navigator.sendBeacon(`${API_BASE}/track/behavior`, blob);
+      const blob = new Blob([body], { type: 'application/json' });
+      navigator.sendBeacon(`${API_BASE}/track/batch`, blob);
     } else {
       // 使用 fetch（异步，不阻塞）
-      fetch(`${API_BASE}/track/behavior`, {
+      fetch(`${API_BASE}/track/batch`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
         },
-        body: JSON.stringify(data),
+        body: body,
         keepalive: true // 即使页面卸载也继续请求
+      }).then(response => {
+        if (!response.ok) throw new Error(`HTTP error! status: ${response.status}`);
+        return response.json();
+      }).then(result => {
+        const behavior = result.results[result.results.length - 1];
+        if (behavior && typeof behavior.mouse_ack === 'number') {
+          acknowledgeMouseMoves(behavior.mouse_ack);
+        }
       }).catch(err => {
+        requeueEvents(events.map(({ visit_id, ...event }) => event));
         console.warn('行为数据发送失败:', err);
       });
     }
@@ -170,7 +311,7 @@
       console.log('📤 最终行为数据已发送');
       console.log(`⏱️  停留时间: ${duration}秒`);
       console.log(`📜 滚动深度: ${maxScrollDepth}%`);
-      console.log(`🖱️  鼠标移动: ${mouseMoves.length} 次采样`);
+      console.log(`🖱️  鼠标移动: ${mouseSeqBase + mouseMoves.length} 次采样`);
     }
   }
 
@@ -183,16 +324,18 @@
     init();
   }
 
-  // 暴露 API（用于调试）
+  // 暴露 API（调试和自定义事件上报）
   window.AdAllianceTracker = {
     getVisitId: () => visitId,
     getStats: () => ({
       visitId,
       duration: Math.round((Date.now() - startTime) / 1000),
       scrollDepth: maxScrollDepth,
-      mouseSamples: mouseMoves.length
+      mouseSamples: mouseSeqBase + mouseMoves.length,
+      mousePending: mouseMoves.length
     }),
-    sendData: () => sendBehaviorData(false)
+    sendData: () => sendBehaviorData(false),
+    track: trackEvent
   };
 
 })();